@@ -38,6 +38,7 @@ dag = DAG(
         'end_date': None,                # None = today, can override via UI
         'epochs': 20,
         'batch_size': 32,
+        'incremental': False,            # True = fine-tune saved models on new bars, full retrain fallback
     }
 )
 
@@ -83,6 +84,7 @@ def create_training_tasks(**context):
     end_date = params.get('end_date', None)
     epochs = params.get('epochs', 20)
     batch_size = params.get('batch_size', 32)
+    incremental = params.get('incremental', False)
 
     if isinstance(companies, str):
         companies = [c.strip() for c in companies.split(',')]
@@ -97,6 +99,7 @@ def create_training_tasks(**context):
     print(f"Period: {start_date} to {end_date or 'today'}")
     print(f"Epochs: {epochs}")
     print(f"Batch Size: {batch_size}")
+    print(f"Strategy: {'incremental (full retrain fallback)' if incremental else 'full retrain'}")
     print("=" * 60)
 
     # Store config for downstream tasks
@@ -107,6 +110,7 @@ def create_training_tasks(**context):
     ti.xcom_push(key='end_date', value=end_date or '')
     ti.xcom_push(key='epochs', value=epochs)
     ti.xcom_push(key='batch_size', value=batch_size)
+    ti.xcom_push(key='incremental', value=incremental)
 
 
 def train_company_model(**context):
@@ -123,6 +127,7 @@ def train_company_model(**context):
     end_date = ti.xcom_pull(key='end_date', task_ids='create_training_config')
     epochs = ti.xcom_pull(key='epochs', task_ids='create_training_config')
     batch_size = ti.xcom_pull(key='batch_size', task_ids='create_training_config')
+    incremental = ti.xcom_pull(key='incremental', task_ids='create_training_config')
 
     # Build command
     cmd = [
@@ -137,6 +142,8 @@ def train_company_model(**context):
 
     if end_date:
         cmd.extend(['--end', end_date])
+    if incremental:
+        cmd.append('--incremental')
 
     print(f"Executing: {' '.join(cmd)}")
 
@@ -0,0 +1,129 @@
+"""
+Cross-request micro-batching for model inference
+Collects windows that target the same model for a few milliseconds and runs
+them through one forward pass instead of many batch-of-one calls
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from prometheus_client import Histogram
+
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# Prometheus metrics
+BATCH_SIZE = Histogram(
+    'inference_batch_size', 'Number of windows per batched forward pass', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+BATCH_QUEUE_WAIT = Histogram('inference_batch_wait_seconds', 'Time a window waited for its batch to run', ['model'])
+BATCH_INFERENCE_LATENCY = Histogram('inference_batch_latency_seconds', 'Forward pass latency per batch', ['model'])
+
+
+def _stack(inputs):
+    """Stack per-request inputs along the batch axis (supports multi-input models)"""
+    if isinstance(inputs[0], (list, tuple)):
+        return [np.concatenate(parts, axis=0) for parts in zip(*inputs)]
+    return np.concatenate(inputs, axis=0)
+
+
+def _rows(inputs):
+    """Number of batch rows contributed by one request"""
+    first = inputs[0] if isinstance(inputs, (list, tuple)) else inputs
+    return first.shape[0]
+
+
+class _PendingBatch:
+    def __init__(self, predict_fn):
+        self.predict_fn = predict_fn
+        self.items = []          # (inputs, future, enqueued_at)
+        self.rows = 0
+        self.timer = None
+
+
+class MicroBatcher:
+    """Groups concurrent predictions per model key into batched forward passes
+
+    A key identifies one set of weights, e.g. (ticker, model_type). Windows for
+    the same key are stacked into one batch; different keys run as independent
+    batches on the inference thread pool so they no longer queue behind each other
+    on the event loop.
+    """
+
+    def __init__(self, max_batch_size: int = PREDICT_BATCH_MAX_SIZE, max_wait_ms: float = PREDICT_BATCH_MAX_WAIT_MS,
+                 workers: int = INFERENCE_WORKERS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._pending = {}
+
+    async def predict(self, key, predict_fn, inputs):
+        """Queue inputs of shape (n, ...) for key and wait for their n output rows
+
+        predict_fn receives the stacked batch and must return an array (or a list
+        of arrays for multi-output models) with one row per input row.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch(predict_fn)
+            self._pending[key] = batch
+            batch.timer = loop.call_later(self.max_wait, self._flush, key)
+
+        batch.items.append((inputs, future, time.time()))
+        batch.rows += _rows(inputs)
+        if batch.rows >= self.max_batch_size:
+            self._flush(key)
+
+        return await future
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key, batch):
+        label = key[-1] if isinstance(key, tuple) else str(key)
+        now = time.time()
+        for _, _, enqueued_at in batch.items:
+            BATCH_QUEUE_WAIT.labels(model=label).observe(now - enqueued_at)
+        BATCH_SIZE.labels(model=label).observe(batch.rows)
+
+        loop = asyncio.get_running_loop()
+        try:
+            stacked = _stack([inputs for inputs, _, _ in batch.items])
+            start_time = time.time()
+            outputs = await loop.run_in_executor(self.executor, batch.predict_fn, stacked)
+            BATCH_INFERENCE_LATENCY.labels(model=label).observe(time.time() - start_time)
+        except Exception as e:
+            for _, future, _ in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Scatter rows back to the requests that contributed them
+        offset = 0
+        for inputs, future, _ in batch.items:
+            n = _rows(inputs)
+            if isinstance(outputs, (list, tuple)):
+                result = [np.asarray(out)[offset:offset + n] for out in outputs]
+            else:
+                result = np.asarray(outputs)[offset:offset + n]
+            offset += n
+            if not future.done():
+                future.set_result(result)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+micro_batcher = MicroBatcher()
@@ -0,0 +1,69 @@
+"""
+Server-side downsampling for chart payloads
+Largest-Triangle-Three-Buckets (LTTB) keeps the points that shape a line
+chart; for OHLCV bars each kept point also carries the high/low/volume of the
+bars it stands for, so visual extremes survive
+"""
+import numpy as np
+
+
+def lttb_indices(y, max_points: int, x=None):
+    """Indices of the points LTTB keeps from series `y`
+
+    The first and last points are always kept. Returns every index when the
+    series already fits.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # max_points - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # Mean of each bucket, used as the third triangle vertex for the previous bucket
+    next_lo = edges[1:]
+    next_hi = np.append(edges[2:], n)
+    counts = next_hi - next_lo
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[next_hi] - cum_x[next_lo]) / counts
+    avg_y = (cum_y[next_hi] - cum_y[next_lo]) / counts
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area (a, candidate, next-bucket average)
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_frame(df, max_points: int, column='Close'):
+    """Downsample an OHLCV frame for charting
+
+    Rows are chosen by LTTB on `column`. Each kept row reports the high, low
+    and summed volume of every bar up to the next kept row.
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    indices = lttb_indices(df[column].to_numpy(), max_points)
+    result = df.iloc[indices].copy()
+    if 'High' in df:
+        result['High'] = np.maximum.reduceat(df['High'].to_numpy(), indices)
+    if 'Low' in df:
+        result['Low'] = np.minimum.reduceat(df['Low'].to_numpy(), indices)
+    if 'Volume' in df:
+        result['Volume'] = np.add.reduceat(df['Volume'].to_numpy(), indices)
+    return result
+
+
+def downsample_series(values, labels, max_points: int):
+    """LTTB over a single series with matching labels (e.g. forecast prices and dates)"""
+    if max_points is None or len(values) <= max_points:
+        return values, labels
+    indices = lttb_indices(values, max_points)
+    return [values[i] for i in indices], [labels[i] for i in indices]
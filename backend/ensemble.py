@@ -0,0 +1,80 @@
+"""
+Fused ensemble graph for multi-model predictions
+Assembles the per-ticker LSTM/GRU/Transformer models into one Keras model with
+a shared raw-price input, so model="all" costs a single forward pass
+"""
+import numpy as np
+
+ENSEMBLE_MODEL_NAME = "ensemble"
+
+
+def ensemble_weights(model_names, catalog_models):
+    """Inverse-RMSE weights from the model catalog's metrics, equal weights when metrics are missing
+
+    catalog_models is ModelCatalog.models(ticker): {model_name: {"metrics": {...}, ...}}
+    """
+    inverse_rmse = []
+    for model_name in model_names:
+        try:
+            rmse = float(((catalog_models or {})[model_name]['metrics'])['rmse'])
+            inverse_rmse.append(1.0 / rmse if rmse > 0 else 0.0)
+        except Exception:
+            inverse_rmse.append(0.0)
+
+    weights = np.array(inverse_rmse, dtype=np.float32)
+    if weights.sum() <= 0:
+        weights = np.ones(len(model_names), dtype=np.float32)
+    return weights / weights.sum()
+
+
+def weighted_average(prices, weights):
+    """Combine per-model prices with ensemble weights"""
+    return float(np.dot(np.asarray(prices, dtype=np.float64), np.asarray(weights, dtype=np.float64)))
+
+
+def build_ensemble_model(entries, weights=None):
+    """Build one Keras model running every entry on a shared raw-price window
+
+    Each branch applies its own MinMaxScaler as an affine layer before the model
+    and inverts it afterwards, so all outputs are prices. With weights, a final
+    output holds the weighted average of the branch predictions.
+    """
+    import tensorflow as tf
+    from tensorflow.keras import Input, Model
+
+    sequence_length = entries[0].model.input_shape[1]
+    inputs = Input(shape=(sequence_length, 1), name="close_window")
+
+    outputs = []
+    for entry in entries:
+        scale = np.float32(entry.scaler.scale_[0])
+        offset = np.float32(entry.scaler.min_[0])
+
+        # Re-wrap the loaded model so nested branch names are unique
+        branch = Model(inputs=entry.model.inputs, outputs=entry.model.outputs, name=f"{entry.model_name}_branch")
+        predicted_scaled = branch(inputs * scale + offset, training=False)
+        outputs.append((predicted_scaled - offset) / scale)
+
+    if weights is not None:
+        stacked = tf.concat(outputs, axis=-1)
+        outputs.append(tf.reduce_sum(stacked * np.asarray(weights, dtype=np.float32), axis=-1, keepdims=True))
+
+    return Model(inputs=inputs, outputs=outputs, name=f"{entries[0].ticker.lower()}_ensemble")
+
+
+def get_ensemble_model(entries, weights=None):
+    """Return the fused model for these registry entries, rebuilding it when any artifact changed"""
+    cache_key = (
+        ENSEMBLE_MODEL_NAME,
+        tuple((entry.model_name, entry.version) for entry in entries),
+        None if weights is None else tuple(np.round(weights, 6).tolist())
+    )
+    owner = entries[0].extras
+    fused = owner.get(cache_key)
+    if fused is None:
+        # Drop fused graphs built from older versions of the other models
+        for key in [k for k in owner if isinstance(k, tuple) and k and k[0] == ENSEMBLE_MODEL_NAME]:
+            del owner[key]
+        fused = build_ensemble_model(entries, weights)
+        owner[cache_key] = fused
+    return fused
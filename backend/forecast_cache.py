@@ -0,0 +1,75 @@
+"""
+Forecast trajectory cache
+Keeps the longest forecast computed per (ticker, model, data version) as a
+float32 array on the model registry entry. Shorter horizons are prefixes of
+it; longer horizons only roll the missing suffix forward when the rollout is
+exact, and are recomputed from history otherwise.
+"""
+import asyncio
+
+import numpy as np
+from prometheus_client import Counter
+
+# Prometheus metrics
+TRAJECTORY_REQUESTS = Counter(
+    'forecast_trajectory_requests_total', 'Forecast trajectory lookups by outcome', ['model', 'result']
+)
+TRAJECTORY_STEPS_COMPUTED = Counter(
+    'forecast_trajectory_steps_computed_total', 'Forecast steps actually rolled forward', ['model']
+)
+TRAJECTORY_STEPS_SERVED = Counter(
+    'forecast_trajectory_steps_served_total', 'Forecast steps returned to callers', ['model']
+)
+
+
+def data_version(df):
+    """Identity of the input bars: last bar date and its close (revised until the bar is final)"""
+    return str(df.index[-1].date()), float(df['Close'].values[-1])
+
+
+async def get_trajectory(entry, df, horizon: int, rollout, extend: bool = True):
+    """First `horizon` forecast steps for the bars in `df`
+
+    Args:
+        entry: model registry entry; the trajectory lives in entry.extras
+        df: recent bars with a Close column
+        horizon: number of future steps wanted
+        rollout: async rollout(entry, closes, steps) -> 1-D array of prices
+        extend: continue a cached prefix from history plus that prefix. Only
+            valid for exact rollouts (each step depends only on the window
+            before it); otherwise a longer horizon is rolled from history
+            alone, so a response never depends on what was cached before
+
+    Returns:
+        (float32 array of length horizon, number of steps computed for this call)
+    """
+    lock = entry.extras.setdefault('trajectory_lock', asyncio.Lock())
+    version = data_version(df)
+
+    async with lock:
+        cached = entry.extras.get('trajectory')
+        if cached is not None and cached[0] == version:
+            trajectory = cached[1]
+        else:
+            trajectory = np.empty(0, dtype=np.float32)
+
+        missing = horizon - len(trajectory)
+        if missing > 0:
+            history = df['Close'].values.astype(np.float64)
+            if extend:
+                # Continue from the window formed by history plus the cached prefix
+                closes = np.concatenate([history, trajectory.astype(np.float64)])
+                suffix = np.asarray(await rollout(entry, closes, missing), dtype=np.float32)
+                trajectory = np.concatenate([trajectory, suffix])
+            else:
+                missing = horizon
+                trajectory = np.asarray(await rollout(entry, history, horizon), dtype=np.float32)
+            entry.extras['trajectory'] = (version, trajectory)
+            extended = extend and cached is not None and cached[0] == version
+            TRAJECTORY_REQUESTS.labels(model=entry.model_name, result='extend' if extended else 'miss').inc()
+            TRAJECTORY_STEPS_COMPUTED.labels(model=entry.model_name).inc(missing)
+        else:
+            TRAJECTORY_REQUESTS.labels(model=entry.model_name, result='hit').inc()
+
+    TRAJECTORY_STEPS_SERVED.labels(model=entry.model_name).inc(horizon)
+    return trajectory[:horizon], max(missing, 0)
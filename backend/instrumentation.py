@@ -0,0 +1,82 @@
+"""
+Request and stage latency instrumentation
+Middleware times every endpoint; `stage()` blocks inside the hot path add a
+per-stage breakdown that is exported to Prometheus and, optionally, returned
+to the client in a Server-Timing header
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+from starlette.middleware.base import BaseHTTPMiddleware
+
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() == "true"
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Prometheus metrics
+REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['method', 'endpoint'])
+REQUEST_LATENCY = Histogram('api_request_latency_seconds', 'Request latency', ['endpoint'])
+RESPONSE_COUNT = Counter('api_responses_total', 'API responses by status code', ['endpoint', 'status'])
+STAGE_LATENCY = Histogram(
+    'api_stage_latency_seconds', 'Time spent in each stage of a request', ['endpoint', 'stage'],
+    buckets=STAGE_BUCKETS
+)
+
+# Stage timings of the current request: {stage: seconds}; None outside requests
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block of the current request (works around awaits)
+
+    Outside a request (background jobs) the time is exported under
+    endpoint="background".
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        timings = _request_timings.get()
+        if timings is None:
+            STAGE_LATENCY.labels(endpoint='background', stage=name).observe(elapsed)
+        else:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def _endpoint_label(request):
+    # Route template (/models/{ticker}) keeps label cardinality bounded
+    route = request.scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class TimingMiddleware(BaseHTTPMiddleware):
+    """Request count, latency and stage breakdown for every endpoint"""
+
+    async def dispatch(self, request, call_next):
+        timings = {}
+        token = _request_timings.set(timings)
+        start_time = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            _request_timings.reset(token)
+            elapsed = time.perf_counter() - start_time
+            endpoint = _endpoint_label(request)
+            REQUEST_COUNT.labels(method=request.method, endpoint=endpoint).inc()
+            REQUEST_LATENCY.labels(endpoint=endpoint).observe(elapsed)
+            RESPONSE_COUNT.labels(endpoint=endpoint, status=str(status)).inc()
+            for name, seconds in timings.items():
+                STAGE_LATENCY.labels(endpoint=endpoint, stage=name).observe(seconds)
+
+        if SERVER_TIMING_HEADER:
+            parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+            parts.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers['Server-Timing'] = ", ".join(parts)
+        return response
@@ -1,20 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Path, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+from datetime import datetime
 import numpy as np
-import yfinance as yf
-import pickle
 import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import redis
 import json
-from pymongo import MongoClient
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import Response
-import time
+from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+from model_registry import MODELS_DIR, model_registry
+from model_catalog import TICKER_PATTERN, model_catalog
+from batching import micro_batcher
+from market_data import market_data
+from persistence import persistence
+from write_behind import prediction_writer
+from singleflight import SingleFlight
+from market_calendar import next_trading_day, seconds_until_next_bar, trading_days_after
+from warmup import WARMUP_FUTURE_HORIZONS, WarmupScheduler
+from forecast_cache import get_trajectory
+from downsampling import downsample_frame, downsample_series
+from instrumentation import TimingMiddleware, stage
+from training_jobs import MODEL_CHOICES, create_job_tables, get_job, list_jobs, training_jobs
+from serialization import (RESPONSE_FORMATS, FastJSONResponse, StreamingPassthroughMiddleware, epoch_seconds,
+                           frame_columns)
+from ensemble import ENSEMBLE_MODEL_NAME, ensemble_weights, get_ensemble_model, weighted_average
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -32,33 +44,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses for clients that send Accept-Encoding: gzip; NDJSON streams are
+# left uncompressed so each result reaches the client as soon as it is ready
+app.add_middleware(StreamingPassthroughMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")))
+
+# Request count/latency and per-stage breakdown for every endpoint
+app.add_middleware(TimingMiddleware)
+
+MODEL_NAMES = ['lstm', 'gru', 'transformer']
+
+# Upper bound on (ticker, model) pairs in one /predict/batch call
+PREDICT_BATCH_MAX_ITEMS = int(os.getenv("PREDICT_BATCH_MAX_ITEMS", "500"))
+
 # Prometheus metrics
-REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['method', 'endpoint'])
-REQUEST_LATENCY = Histogram('api_request_latency_seconds', 'Request latency', ['endpoint'])
 PREDICTION_COUNT = Counter('predictions_total', 'Total predictions made', ['model'])
 
-# Database connections
-def get_db_connection():
-    """Get PostgreSQL connection"""
-    return psycopg2.connect(
-        host="db",
-        database="fintech",
-        user="fintech",
-        password="fintech"
-    )
+# Identical concurrent cache misses share one computation
+predict_flight = SingleFlight('predict')
+future_flight = SingleFlight('predict_future')
 
+# Database connections (pools are created once in the startup hook)
 def get_redis_client():
-    """Get Redis client"""
-    return redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
-
-def get_mongo_client():
-    """Get MongoDB client"""
-    return MongoClient('mongodb://mongo:27017/')
+    """Get pooled async Redis client"""
+    return persistence.redis
 
 # Initialize database tables
 def init_db():
     """Initialize PostgreSQL tables"""
-    conn = get_db_connection()
+    with persistence.pg_connection() as conn:
+        create_tables(conn)
+    print("Database initialized successfully")
+
+def create_tables(conn):
     cur = conn.cursor()
 
     # Create predictions table
@@ -101,16 +119,30 @@ def init_db():
         )
     """)
 
-    conn.commit()
     cur.close()
-    conn.close()
-    print("Database initialized successfully")
+
+    create_job_tables(conn)
+
+# Response field -> DataFrame column for /stock/{symbol}
+STOCK_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+# Longest forecast in daily steps (three years); trajectories stay cached on the model entry
+MAX_FORECAST_DAYS = int(os.getenv("MAX_FORECAST_DAYS", "1095"))
 
 # Pydantic models
 class PredictionRequest(BaseModel):
     symbol: str = "TSLA"
     model: Optional[str] = "all"  # lstm, gru, transformer, or all
-    days_ahead: int = 1
+    days_ahead: int = Field(1, le=MAX_FORECAST_DAYS)  # >1 is sliced from the cached multi-step forecast
+    ensemble: bool = False  # with model="all", also return the weighted ensemble price
+
+class BatchPredictionItem(BaseModel):
+    symbol: str
+    model: str = "gru"  # lstm, gru, transformer
+
+class BatchPredictionRequest(BaseModel):
+    items: List[BatchPredictionItem]
+    stream: bool = False  # NDJSON, one line per result as soon as it is ready
 
 class PredictionResponse(BaseModel):
     symbol: str
@@ -133,50 +165,81 @@ class StockData(BaseModel):
     close: float
     volume: int
 
+class StockSeries(BaseModel):
+    """format=columnar: one array per field, dates as Unix seconds"""
+    symbol: str
+    dates: List[int]
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    volume: List[int]
+
 # Helper functions
-def load_model_and_scaler(model_name: str, ticker: str):
-    """Load trained model and scaler from files"""
-    models_dir = f"/app/models/{ticker}"
-    ticker_lower = ticker.lower()
-    model_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_model.h5")
-    scaler_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_scaler.pkl")
-
-    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+def warm_rollout_engine(entry):
+    """Build and trace the compiled multi-step rollout when a model is loaded"""
+    # Shared with predict_future.py; jupyter/scripts is mounted at /app/scripts
+    # Serving always uses the exact windowed rollout; the incremental engine
+    # drifts from it after the first step and stays an offline option
+    from scripts.stock_prediction.rollout import build_rollout_engine
+    entry.extras['rollout'] = build_rollout_engine(entry.model, mode='windowed')
+
+model_registry.add_load_hook(warm_rollout_engine)
+
+async def get_model_entry(ticker: str, model_name: str):
+    """Registry lookup off the event loop: a miss loads the .h5 and traces the rollout engine"""
+    with stage('model_load'):
+        return await asyncio.to_thread(model_registry.get, ticker, model_name)
+
+async def load_model_entry(model_name: str, ticker: str):
+    """Get the trained model and scaler entry from the in-process model registry"""
+    try:
+        entry = await get_model_entry(ticker, model_name)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Model {model_name} for {ticker} not found. Please train the model first.")
 
-    from tensorflow.keras.models import load_model
-    model = load_model(model_path)
-    with open(scaler_path, 'rb') as f:
-        scaler = pickle.load(f)
+    return entry
+
+async def get_latest_stock_data(symbol: str = "TSLA", days: int = 60):
+    """Get latest stock data from the in-memory market data buffers"""
+    with stage('market_data'):
+        return await market_data.get_frame(symbol, days + 30)
 
-    return model, scaler
+def prediction_cache_key(symbol: str, model_name: str, version: float, last_bar: str):
+    """Cache key that only changes when the model artifact or the input bars change
+
+    last_bar carries the newest bar's close, so a revised intraday bar gets a new key.
+    """
+    return f"prediction:{symbol}:{model_name}:{int(version)}:{last_bar}"
 
-def get_latest_stock_data(symbol: str = "TSLA", days: int = 60):
-    """Fetch latest stock data from yfinance"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days + 30)
-    df = yf.download(symbol, start=start_date, end=end_date, progress=False)
-    return df
+def next_prediction_date(df):
+    """Trading day the next-bar prediction refers to"""
+    return next_trading_day(df.index[-1].date()).strftime('%Y-%m-%d')
 
-def make_prediction(model_name: str, symbol: str = "TSLA"):
+async def make_prediction(model_name: str, symbol: str = "TSLA"):
     """Make prediction using specified model"""
+    try:
+        version = model_registry.artifact_version(symbol, model_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} for {symbol} not found. Please train the model first.")
+
     # Check Redis cache first
     redis_client = get_redis_client()
-    cache_key = f"prediction:{symbol}:{model_name}:{datetime.now().strftime('%Y-%m-%d')}"
+    cache_key = prediction_cache_key(symbol, model_name, version, await market_data.last_bar(symbol))
 
-    cached = redis_client.get(cache_key)
+    with stage('redis'):
+        cached = await redis_client.get(cache_key)
     if cached:
         return json.loads(cached), True
 
-    # Load model and scaler
-    model, scaler = load_model_and_scaler(model_name, symbol)
-
-    # Get latest stock data
-    df = get_latest_stock_data(symbol, days=90)
-    data = df[['Close']].values
+    # Followers share the leader's dict: hand each caller its own copy
+    result = await predict_flight.do(cache_key, lambda: compute_prediction(model_name, symbol, cache_key))
+    return dict(result), False
 
-    # Scale data
-    scaled_data = scaler.transform(data)
+async def predict_next_close(entry, df):
+    """Next-bar price from one model"""
+    with stage('scaling'):
+        scaled_data = entry.scaler.transform(df[['Close']].values)
 
     # Prepare sequence (last 60 days)
     sequence_length = 60
@@ -185,82 +248,537 @@ def make_prediction(model_name: str, symbol: str = "TSLA"):
 
     X = scaled_data[-sequence_length:].reshape(1, sequence_length, 1)
 
-    # Make prediction
-    predicted_scaled = model.predict(X, verbose=0)
-    predicted_price = scaler.inverse_transform(predicted_scaled)[0][0]
+    # Make prediction (batched with concurrent requests for the same model; a global model batches across tickers)
+    with stage('inference'):
+        predicted_scaled = await micro_batcher.predict(entry.batch_key, entry.model.predict_on_batch, X)
+    with stage('scaling'):
+        return float(entry.scaler.inverse_transform(predicted_scaled)[0][0])
+
+async def compute_prediction(model_name: str, symbol: str, cache_key: str):
+    """Cache-miss path of make_prediction: run the model, then cache and persist the result"""
+    redis_client = get_redis_client()
+
+    # Load model and scaler
+    entry = await load_model_entry(model_name, symbol)
+
+    # Get latest stock data
+    df = await get_latest_stock_data(symbol, days=90)
 
     result = {
         "symbol": symbol,
         "model": model_name,
-        "predicted_price": float(predicted_price),
-        "prediction_date": (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        "predicted_price": await predict_next_close(entry, df),
+        "prediction_date": next_prediction_date(df)
     }
 
-    # Cache for 1 hour
-    redis_client.setex(cache_key, 3600, json.dumps(result))
-
-    # Save to database
-    save_prediction_to_db(result)
+    # Cache until the next bar is expected
+    with stage('redis'):
+        await redis_client.setex(cache_key, seconds_until_next_bar(), json.dumps(result))
 
-    # Log to MongoDB
-    log_prediction_to_mongo(result)
+    # Save to PostgreSQL and log to MongoDB in the background
+    with stage('enqueue'):
+        await prediction_writer.put([result])
 
     # Update Prometheus metrics
     PREDICTION_COUNT.labels(model=model_name).inc()
 
-    return result, False
+    return result
 
-def save_prediction_to_db(prediction: dict):
-    """Save prediction to PostgreSQL"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+async def make_ahead_prediction(model_name: str, symbol: str, days_ahead: int):
+    """Prediction `days_ahead` trading days out, sliced from the cached forecast trajectory"""
+    try:
+        entry = await get_model_entry(symbol, model_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {model_name} for {symbol} not found. Please train the model first.")
 
-    cur.execute("""
-        INSERT INTO stock_predictions (symbol, model_name, prediction_date, predicted_price)
-        VALUES (%s, %s, %s, %s)
-    """, (prediction['symbol'], prediction['model'], prediction['prediction_date'], prediction['predicted_price']))
+    df = await get_latest_stock_data(symbol, days=90)
+    trajectory, computed = await get_trajectory(entry, df, days_ahead, run_rollout,
+                                                extend=entry.extras['rollout'].exact)
 
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def log_prediction_to_mongo(prediction: dict):
-    """Log prediction to MongoDB"""
-    mongo_client = get_mongo_client()
-    db = mongo_client['fintech']
-    collection = db['prediction_logs']
-
-    log_entry = {
-        **prediction,
-        'timestamp': datetime.now(),
-        'cached': False
+    prediction_date = trading_days_after(df.index[-1].date(), days_ahead)[-1]
+
+    result = {
+        "symbol": symbol,
+        "model": model_name,
+        "predicted_price": round(float(trajectory[-1]), 4),
+        "prediction_date": prediction_date.strftime('%Y-%m-%d')
     }
+    if computed:
+        with stage('enqueue'):
+            await prediction_writer.put([result])
+        PREDICTION_COUNT.labels(model=model_name).inc()
+
+    return result, not computed
+
+async def make_multi_prediction(model_names: List[str], symbol: str = "TSLA", include_ensemble: bool = False):
+    """Predict with several models through one fused forward pass
+
+    Cache lookups and writes are pipelined, and fresh predictions are handed to
+    the write-behind queue.
+    """
+    redis_client = get_redis_client()
+    last_bar = await market_data.last_bar(symbol)
+    cache_keys = {}
+    for model_name in model_names:
+        try:
+            version = model_registry.artifact_version(symbol, model_name)
+        except FileNotFoundError:
+            print(f"Model {model_name} for {symbol} not found, skipping")
+            continue
+        cache_keys[model_name] = prediction_cache_key(symbol, model_name, version, last_bar)
+
+    if not cache_keys:
+        return []
+
+    with stage('redis'):
+        values = await redis_client.mget(list(cache_keys.values()))
+    results = {}
+    for model_name, cached in zip(cache_keys, values):
+        if cached:
+            prediction = json.loads(cached)
+            prediction['cached'] = True
+            results[model_name] = prediction
+
+    # Weights come from the catalog's in-memory metrics, not a pickle read per request
+    weights = ensemble_weights(model_names, await model_catalog.models(symbol)) if include_ensemble else None
+    misses = [model_name for model_name in cache_keys if model_name not in results]
+
+    fresh = {}
+    if misses:
+        flight_key = "|".join(cache_keys[model_name] for model_name in misses) + f"|{int(include_ensemble)}"
+        fresh = await predict_flight.do(
+            flight_key, lambda: compute_multi_prediction(symbol, model_names, misses, results, weights, cache_keys)
+        )
+        for prediction in fresh['predictions']:
+            results[prediction['model']] = {**prediction, 'cached': False}
+
+    ordered = [results[model_name] for model_name in model_names if model_name in results]
+
+    if include_ensemble and len(ordered) == len(model_names):
+        ensemble_prediction = fresh.get('ensemble')
+        if ensemble_prediction is None:
+            ensemble_prediction = {
+                "symbol": symbol,
+                "model": ENSEMBLE_MODEL_NAME,
+                "predicted_price": weighted_average([p['predicted_price'] for p in ordered], weights),
+                "prediction_date": ordered[0]['prediction_date']
+            }
+        ordered.append({**ensemble_prediction, 'cached': not fresh.get('predictions')})
+
+    return ordered
+
+async def run_fused_prediction(symbol: str, entries, fuse_weights=None):
+    """Next-bar predictions for several models of one ticker in one fused forward pass
+
+    Returns (predictions, ensemble_price); ensemble_price is None without fuse_weights.
+    """
+    with stage('model_load'):
+        fused = await asyncio.to_thread(get_ensemble_model, entries, fuse_weights)
+
+    df = await get_latest_stock_data(symbol, days=90)
+    data = df[['Close']].values
+
+    sequence_length = fused.input_shape[1]
+    if len(data) < sequence_length:
+        raise HTTPException(status_code=400, detail="Insufficient data for prediction")
+
+    X = data[-sequence_length:].reshape(1, sequence_length, 1).astype(np.float32)
+    # Only requests for the very same fused graph (models, versions and ensemble weights) share a batch
+    label = ENSEMBLE_MODEL_NAME + ":" + ",".join(entry.model_name for entry in entries)
+    key = (symbol, id(fused), label + (":weighted" if fuse_weights is not None else ""))
+    with stage('inference'):
+        outputs = await micro_batcher.predict(key, fused.predict_on_batch, X)
+    if not isinstance(outputs, list):
+        outputs = [outputs]
+
+    predictions = []
+    prediction_date = next_prediction_date(df)
+    for entry, output in zip(entries, outputs):
+        predictions.append({
+            "symbol": symbol,
+            "model": entry.model_name,
+            "predicted_price": float(output[0][0]),
+            "prediction_date": prediction_date
+        })
+        PREDICTION_COUNT.labels(model=entry.model_name).inc()
+
+    ensemble_price = float(outputs[-1][0][0]) if fuse_weights is not None else None
+    return predictions, ensemble_price
+
+async def compute_multi_prediction(symbol: str, model_names: List[str], misses: List[str], cached: dict,
+                                   weights, cache_keys: dict):
+    """Cache-miss path of make_multi_prediction
+
+    Runs the fused model for the missing models, caches and queues the fresh
+    predictions, and returns {"predictions": [...], "ensemble": {...} or None}.
+    """
+    redis_client = get_redis_client()
+
+    entries = []
+    for model_name in misses:
+        try:
+            entries.append(await get_model_entry(symbol, model_name))
+        except FileNotFoundError:
+            print(f"Model {model_name} for {symbol} not found, skipping")
+        except Exception as e:
+            print(f"Error with model {model_name}: {str(e)}")
+
+    fresh = []
+    ensemble_price = None
+    if entries:
+        # Weighted ensemble output is only fused in when every model is recomputed
+        fuse_weights = weights if weights is not None and not cached and len(entries) == len(misses) else None
+        try:
+            fresh, ensemble_price = await run_fused_prediction(symbol, entries, fuse_weights)
+        except Exception as e:
+            # One bad model must not take the others down: run them one by one and skip failures
+            print(f"Fused prediction for {symbol} failed, predicting per model: {str(e)}")
+            for entry in entries:
+                try:
+                    predictions, _ = await run_fused_prediction(symbol, [entry])
+                    fresh.extend(predictions)
+                except Exception as e:
+                    print(f"Error with model {entry.model_name}: {str(e)}")
+
+        # Cache until the next bar is expected
+        ttl = seconds_until_next_bar()
+        with stage('redis'):
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for prediction in fresh:
+                    pipe.setex(cache_keys[prediction['model']], ttl, json.dumps(prediction))
+                await pipe.execute()
+
+    ensemble_prediction = None
+    prices = {**{m: p['predicted_price'] for m, p in cached.items()},
+              **{p['model']: p['predicted_price'] for p in fresh}}
+    if weights is not None and fresh and all(m in prices for m in model_names):
+        if ensemble_price is None:
+            ensemble_price = weighted_average([prices[m] for m in model_names], weights)
+        ensemble_prediction = {
+            "symbol": symbol,
+            "model": ENSEMBLE_MODEL_NAME,
+            "predicted_price": ensemble_price,
+            "prediction_date": fresh[0]['prediction_date']
+        }
+
+    if fresh:
+        with stage('enqueue'):
+            await prediction_writer.put(fresh + ([ensemble_prediction] if ensemble_prediction else []))
+
+    return {"predictions": fresh, "ensemble": ensemble_prediction}
+
+async def resolve_batch_cache(pairs):
+    """Cache keys for (symbol, model) pairs and every hit, with a single MGET
+
+    Returns (cache_keys, hits, errors) where cache_keys/hits/errors are keyed by pair.
+    """
+    symbols = sorted({symbol for symbol, _ in pairs})
+    last_bars = dict(zip(symbols, await asyncio.gather(*(market_data.last_bar(s) for s in symbols))))
+
+    cache_keys, errors = {}, {}
+    for symbol, model_name in pairs:
+        try:
+            version = model_registry.artifact_version(symbol, model_name)
+        except FileNotFoundError:
+            errors[(symbol, model_name)] = f"Model {model_name} for {symbol} not found"
+            continue
+        cache_keys[(symbol, model_name)] = prediction_cache_key(symbol, model_name, version, last_bars[symbol])
+
+    hits = {}
+    if cache_keys:
+        with stage('redis'):
+            values = await get_redis_client().mget(list(cache_keys.values()))
+        for pair, cached in zip(cache_keys, values):
+            if cached:
+                hits[pair] = {**json.loads(cached), 'cached': True}
+    return cache_keys, hits, errors
+
+async def resolve_batch_entry(symbol: str, model_name: str):
+    """(entry, error) for one missing batch item; errors are returned, not raised"""
+    try:
+        return await get_model_entry(symbol, model_name), None
+    except HTTPException as e:
+        return None, e.detail
+    except Exception as e:
+        return None, str(e)
+
+async def predict_batch_group(symbol: str, entries):
+    """Fused forward pass for one ticker's own models; errors are returned, not raised"""
+    model_names = [entry.model_name for entry in entries]
+    try:
+        predictions, _ = await run_fused_prediction(symbol, entries)
+        return symbol, model_names, predictions, None
+    except HTTPException as e:
+        return symbol, model_names, [], e.detail
+    except Exception as e:
+        return symbol, model_names, [], str(e)
+
+async def predict_batch_view(symbol: str, entry):
+    """One global-model ticker view, batched on entry.batch_key with every other ticker of that model"""
+    try:
+        df = await get_latest_stock_data(symbol, days=90)
+        prediction = {
+            "symbol": symbol,
+            "model": entry.model_name,
+            "predicted_price": await predict_next_close(entry, df),
+            "prediction_date": next_prediction_date(df)
+        }
+        PREDICTION_COUNT.labels(model=entry.model_name).inc()
+        return symbol, [entry.model_name], [prediction], None
+    except HTTPException as e:
+        return symbol, [entry.model_name], [], e.detail
+    except Exception as e:
+        return symbol, [entry.model_name], [], str(e)
+
+async def iter_batch_predictions(pairs):
+    """Yield batch results as they become available: cache hits first, then each computed group
 
-    collection.insert_one(log_entry)
+    All fresh predictions are cached with one pipeline and queued with one bulk write at the end.
+    """
+    cache_keys, hits, errors = await resolve_batch_cache(pairs)
+    for (symbol, model_name), error in errors.items():
+        yield {"symbol": symbol, "model": model_name, "error": error}
+    for prediction in hits.values():
+        yield prediction
+
+    misses = [pair for pair in cache_keys if pair not in hits]
+    resolved = await asyncio.gather(*(resolve_batch_entry(symbol, model_name) for symbol, model_name in misses))
+
+    # Global-model views share the global model's micro-batch across tickers. Per-ticker
+    # weights cannot share a batch across tickers: fuse each ticker's own models instead.
+    groups, tasks = {}, []
+    for (symbol, model_name), (entry, error) in zip(misses, resolved):
+        if error is not None:
+            yield {"symbol": symbol, "model": model_name, "error": error}
+        elif entry.base_key is not None:
+            tasks.append(predict_batch_view(symbol, entry))
+        else:
+            groups.setdefault(symbol, []).append(entry)
+    tasks.extend(predict_batch_group(symbol, entries) for symbol, entries in groups.items())
+
+    fresh = []
+    for task in asyncio.as_completed(tasks):
+        symbol, model_names, predictions, error = await task
+        if error is not None:
+            for model_name in model_names:
+                yield {"symbol": symbol, "model": model_name, "error": error}
+            continue
+        for prediction in predictions:
+            fresh.append(prediction)
+            yield {**prediction, 'cached': False}
+
+    if fresh:
+        ttl = seconds_until_next_bar()
+        with stage('redis'):
+            async with get_redis_client().pipeline(transaction=False) as pipe:
+                for prediction in fresh:
+                    pipe.setex(cache_keys[(prediction['symbol'], prediction['model'])], ttl, json.dumps(prediction))
+                await pipe.execute()
+        with stage('enqueue'):
+            await prediction_writer.put(fresh)
+
+def horizon_days(periods: int, period_type: str):
+    """Convert a forecast horizon to daily steps"""
+    if period_type == "week":
+        return periods * 7
+    elif period_type == "month":
+        return periods * 30
+    elif period_type == "year":
+        return periods * 365
+    return periods  # day
+
+def future_cache_key(ticker: str, model: str, version: float, last_bar: str, periods: int, period_type: str):
+    return f"prediction_future:{ticker}:{model}:{int(version)}:{last_bar}:{periods}:{period_type}"
+
+async def get_future_prediction(ticker: str, model: str, periods: int, period_type: str):
+    """Forecast from the cache, or from one shared rollout on a miss"""
+    try:
+        version = model_registry.artifact_version(ticker, model)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model {model} for {ticker} not found. Please train the model first using /train/{ticker}"
+        )
+
+    redis_client = get_redis_client()
+    cache_key = future_cache_key(ticker, model, version, await market_data.last_bar(ticker), periods, period_type)
+    with stage('redis'):
+        cached = await redis_client.get(cache_key)
+    if cached:
+        return json.loads(cached)
+
+    # Concurrent identical forecasts share one rollout
+    return await future_flight.do(
+        cache_key, lambda: compute_future_prediction(ticker, model, periods, period_type, cache_key)
+    )
+
+async def run_rollout(entry, data, total_days: int):
+    """Roll the model forward inside one compiled graph, off the event loop"""
+    from scripts.stock_prediction.rollout import forecast_prices
+    loop = asyncio.get_running_loop()
+    with stage('rollout'):
+        predicted = await loop.run_in_executor(
+            micro_batcher.executor, forecast_prices, entry.extras['rollout'], entry.scaler, data, total_days
+        )
+    return predicted
+
+def build_future_response(ticker: str, model: str, periods: int, period_type: str, df, trajectory):
+    """/predict/future response body for a forecast trajectory"""
+    predictions = np.round(np.asarray(trajectory, dtype=np.float64), 4).tolist()
+    total_days = len(predictions)
+
+    # Step i is the i-th trading day after the last bar, as in /predict with days_ahead
+    future_dates = [day.strftime('%Y-%m-%d') for day in trading_days_after(df.index[-1].date(), total_days)]
+
+    # Calculate trend
+    first_price = predictions[0]
+    last_price = predictions[-1]
+    trend = "Bullish" if last_price > first_price else "Bearish"
+    change_percent = ((last_price - first_price) / first_price) * 100
+
+    return {
+        "ticker": ticker,
+        "model": model,
+        "period_type": period_type,
+        "periods": periods,
+        "total_days": total_days,
+        "predictions": predictions,
+        "dates": future_dates,
+        "current_price": float(df['Close'].values[-1]),
+        "predicted_price_at_end": predictions[-1],
+        "trend": trend,
+        "change_percent": round(change_percent, 2)
+    }
+
+async def compute_future_prediction(ticker: str, model: str, periods: int, period_type: str, cache_key: str):
+    """Roll one model forward over the requested horizon and cache the response"""
+    # Load model and scaler
+    try:
+        entry = await get_model_entry(ticker, model)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model {model} for {ticker} not found. Please train the model first using /train/{ticker}"
+        )
+
+    # Get latest stock data
+    df = await get_latest_stock_data(ticker, days=90)
+
+    # Shorter horizons are prefixes of the cached trajectory; only a missing suffix is rolled
+    trajectory, _ = await get_trajectory(entry, df, horizon_days(periods, period_type), run_rollout,
+                                         extend=entry.extras['rollout'].exact)
+    response = build_future_response(ticker, model, periods, period_type, df, trajectory)
+
+    # Cache until the next bar is expected
+    with stage('redis'):
+        await get_redis_client().setex(cache_key, seconds_until_next_bar(), json.dumps(response))
+    return response
+
+def trained_tickers():
+    """Tickers with at least one trained model"""
+    return model_catalog.tickers()
+
+async def warm_ticker(ticker: str):
+    """Precompute the next-day predictions and standard forecasts for one ticker
+
+    Next-day predictions use the fused multi-model pass. Forecasts fill the
+    trajectory cache once per model at the longest horizon; shorter horizons
+    are prefixes of it.
+    """
+    models = []
+    for model_name in MODEL_NAMES:
+        try:
+            models.append((model_name, model_registry.artifact_version(ticker, model_name)))
+        except FileNotFoundError:
+            continue
+    if not models:
+        return {}
+
+    next_day = await make_multi_prediction([m for m, _ in models], ticker)
+
+    last_bar = await market_data.last_bar(ticker)
+    df = await get_latest_stock_data(ticker, days=90)
+    max_days = max(horizon_days(periods, period_type) for periods, period_type in WARMUP_FUTURE_HORIZONS)
+
+    ttl = seconds_until_next_bar()
+    forecasts = 0
+    async with get_redis_client().pipeline(transaction=False) as pipe:
+        for model_name, version in models:
+            entry = await get_model_entry(ticker, model_name)
+            trajectory, _ = await get_trajectory(entry, df, max_days, run_rollout,
+                                                 extend=entry.extras['rollout'].exact)
+            for periods, period_type in WARMUP_FUTURE_HORIZONS:
+                response = build_future_response(
+                    ticker, model_name, periods, period_type, df,
+                    trajectory[:horizon_days(periods, period_type)]
+                )
+                pipe.setex(future_cache_key(ticker, model_name, version, last_bar, periods, period_type),
+                           ttl, json.dumps(response))
+                forecasts += 1
+        await pipe.execute()
+
+    return {"next_day": len(next_day), "future": forecasts}
+
+async def refresh_market_data():
+    await market_data.refresh()
+
+prediction_warmup = WarmupScheduler(trained_tickers, warm_ticker, before_run=refresh_market_data)
+
+async def on_training_finished(job):
+    """Make freshly trained models visible without waiting for the catalog poll"""
+    await asyncio.to_thread(model_catalog.refresh)
+    market_data.track([job['ticker']])
+
+training_jobs.on_success = on_training_finished
 
 # API Endpoints
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_db()
+    """Open database pools, initialize tables and start background market data refresh on startup"""
+    persistence.start()
+    await persistence.run('postgres', init_db)
+    prediction_writer.start()
+
+    # Index trained artifacts, then keep recent bars in memory for every trained ticker
+    await model_catalog.start()
+    market_data.start(trained_tickers())
+
+    # Precompute predictions after every session close
+    prediction_warmup.start()
+
+    # Drain the persistent training queue with a bounded worker pool
+    await training_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs, drain queued writes, release worker threads and close database pools"""
+    await training_jobs.stop()
+    await prediction_warmup.stop()
+    await model_catalog.stop()
+    await market_data.stop()
+    await prediction_writer.stop()
+    micro_batcher.shutdown()
+    await persistence.close()
 
 @app.get("/")
 def root():
     """Root endpoint"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/').inc()
     return {
         "message": "Multi-Company Stock Prediction API",
         "version": "1.0.0",
         "supported_tickers": ["TSLA", "AAPL", "GOOGL", "MSFT", "AMZN"],
         "endpoints": {
             "predictions": "/predict",
+            "batch_predictions": "/predict/batch",
             "future_predictions": "/predict/future",
             "train_model": "/train/{ticker}",
+            "training_jobs": "/train/jobs",
             "tickers": "/tickers",
             "models": "/models/{ticker}",
             "metrics": "/metrics/models/{ticker}",
             "stock_data": "/stock/{symbol}",
             "history": "/predictions/history",
+            "warmup": "/warmup",
             "prometheus": "/metrics"
         }
     }
@@ -268,16 +786,38 @@ def root():
 @app.post("/predict", response_model=List[PredictionResponse])
 async def predict_stock(request: PredictionRequest):
     """Predict stock price using ML models"""
-    start_time = time.time()
-    REQUEST_COUNT.labels(method='POST', endpoint='/predict').inc()
-
     try:
+        if request.days_ahead < 1:
+            raise HTTPException(status_code=400, detail="days_ahead must be at least 1")
+
+        if request.days_ahead > 1:
+            # Further out than the next bar: slice the cached multi-step forecast
+            results = []
+            for model_name in MODEL_NAMES if request.model == 'all' else [request.model]:
+                try:
+                    prediction, cached = await make_ahead_prediction(model_name, request.symbol, request.days_ahead)
+                    results.append({**prediction, 'cached': cached})
+                except Exception as e:
+                    print(f"Error with model {model_name}: {str(e)}")
+            if not results:
+                raise HTTPException(status_code=500, detail="All models failed to make predictions")
+
+            return results
+
+        if request.model == 'all':
+            # Dashboard default: one fused forward pass for all three models
+            results = await make_multi_prediction(MODEL_NAMES, request.symbol, request.ensemble)
+            if not results:
+                raise HTTPException(status_code=500, detail="All models failed to make predictions")
+
+            return results
+
         results = []
-        models = ['lstm', 'gru', 'transformer'] if request.model == 'all' else [request.model]
+        models = [request.model]
 
         for model_name in models:
             try:
-                prediction, cached = make_prediction(model_name, request.symbol)
+                prediction, cached = await make_prediction(model_name, request.symbol)
                 prediction['cached'] = cached
                 results.append(prediction)
             except Exception as e:
@@ -287,56 +827,57 @@ async def predict_stock(request: PredictionRequest):
         if not results:
             raise HTTPException(status_code=500, detail="All models failed to make predictions")
 
-        REQUEST_LATENCY.labels(endpoint='/predict').observe(time.time() - start_time)
         return results
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/metrics/models/{ticker}", response_model=List[ModelMetrics])
-async def get_model_metrics(ticker: str):
-    """Get metrics for all trained models for a specific ticker"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/metrics/models').inc()
+@app.post("/predict/batch")
+async def predict_batch(request: BatchPredictionRequest):
+    """Predict many (ticker, model) pairs in one call
+
+    Cache hits are resolved with one MGET, misses run as one fused forward
+    pass per ticker, and fresh results are persisted with one bulk write.
+    """
+    if len(request.items) > PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {PREDICT_BATCH_MAX_ITEMS} items per batch")
+
+    # Unique pairs, in request order
+    pairs = list(dict.fromkeys((item.symbol.upper(), item.model) for item in request.items))
 
-    models_dir = f"/app/models/{ticker}"
-    ticker_lower = ticker.lower()
-    metrics_list = []
+    if request.stream:
+        async def ndjson():
+            async for result in iter_batch_predictions(pairs):
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-    for model_name in ['lstm', 'gru', 'transformer']:
-        metrics_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_metrics.pkl")
-        if os.path.exists(metrics_path):
-            with open(metrics_path, 'rb') as f:
-                metrics = pickle.load(f)
-                metrics_list.append(metrics)
+    by_pair = {}
+    async for result in iter_batch_predictions(pairs):
+        by_pair[(result['symbol'], result['model'])] = result
+    results = [by_pair[pair] for pair in pairs]
 
-    return metrics_list
+    return {
+        "results": results,
+        "count": len(results),
+        "cached": sum(1 for r in results if r.get('cached')),
+        "errors": sum(1 for r in results if 'error' in r)
+    }
+
+@app.get("/metrics/models/{ticker}", response_model=List[ModelMetrics])
+async def get_model_metrics(ticker: str = Path(..., pattern=TICKER_PATTERN)):
+    """Get metrics for all trained models for a specific ticker"""
+    models = await model_catalog.models(ticker) or {}
+    return [info['metrics'] for info in models.values() if 'metrics' in info]
 
 @app.get("/tickers")
 async def get_available_tickers():
     """Get list of tickers with trained models"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/tickers').inc()
-
-    models_base_dir = "/app/models"
-    available_tickers = []
-
-    # Check which ticker directories exist and have at least one model
-    for ticker in ['TSLA', 'AAPL', 'GOOGL', 'MSFT', 'AMZN']:
-        ticker_dir = os.path.join(models_base_dir, ticker)
-        if os.path.exists(ticker_dir):
-            # Check if at least one model file exists
-            ticker_lower = ticker.lower()
-            has_models = False
-            for model in ['lstm', 'gru', 'transformer']:
-                model_path = os.path.join(ticker_dir, f"{model}_{ticker_lower}_model.h5")
-                if os.path.exists(model_path):
-                    has_models = True
-                    break
-
-            if has_models:
-                available_tickers.append({
-                    "ticker": ticker,
-                    "directory": ticker_dir
-                })
+    available_tickers = [
+        {"ticker": ticker, "directory": os.path.join(MODELS_DIR, ticker)}
+        for ticker in model_catalog.tickers()
+    ]
 
     return {
         "available_tickers": available_tickers,
@@ -344,40 +885,16 @@ async def get_available_tickers():
     }
 
 @app.get("/models/{ticker}")
-async def get_available_models(ticker: str):
+async def get_available_models(ticker: str = Path(..., pattern=TICKER_PATTERN)):
     """Get list of available models for a specific ticker"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/models').inc()
-
-    models_dir = f"/app/models/{ticker}"
-    ticker_lower = ticker.lower()
-    available_models = []
-
-    if not os.path.exists(models_dir):
+    models = await model_catalog.models(ticker)
+    if models is None:
         raise HTTPException(status_code=404, detail=f"No models found for ticker {ticker}")
 
-    for model_name in ['lstm', 'gru', 'transformer']:
-        model_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_model.h5")
-        scaler_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_scaler.pkl")
-        metrics_path = os.path.join(models_dir, f"{model_name}_{ticker_lower}_metrics.pkl")
-
-        if os.path.exists(model_path):
-            model_info = {
-                "model_name": model_name,
-                "has_scaler": os.path.exists(scaler_path),
-                "has_metrics": os.path.exists(metrics_path),
-                "model_path": model_path
-            }
-
-            # Load metrics if available
-            if os.path.exists(metrics_path):
-                try:
-                    with open(metrics_path, 'rb') as f:
-                        metrics = pickle.load(f)
-                        model_info['metrics'] = metrics
-                except:
-                    pass
-
-            available_models.append(model_info)
+    available_models = [
+        {key: value for key, value in info.items() if key != 'metrics_mtime'}
+        for info in models.values()
+    ]
 
     return {
         "ticker": ticker,
@@ -385,47 +902,51 @@ async def get_available_models(ticker: str):
         "count": len(available_models)
     }
 
-@app.get("/stock/{symbol}", response_model=List[StockData])
-async def get_stock_data(symbol: str, days: int = 30):
-    """Get historical stock data"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/stock').inc()
+@app.get("/stock/{symbol}", response_model=Union[List[StockData], StockSeries],
+         response_class=FastJSONResponse)
+async def get_stock_data(symbol: str, days: int = 30, format: str = "rows",
+                         max_points: Optional[int] = Query(None, ge=3)):
+    """Get historical stock data
+
+    format=rows returns one object per day; format=columnar returns one array
+    per field with dates as Unix seconds. max_points caps the number of bars
+    (LTTB on close; high/low/volume cover the bars each point stands for).
+    """
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(RESPONSE_FORMATS)}")
 
     try:
-        df = get_latest_stock_data(symbol, days)
-
-        data = []
-        for idx, row in df.iterrows():
-            data.append({
-                "date": idx.strftime('%Y-%m-%d'),
-                "open": float(row['Open']),
-                "high": float(row['High']),
-                "low": float(row['Low']),
-                "close": float(row['Close']),
-                "volume": int(row['Volume'])
-            })
-
-        return data
+        df = await get_latest_stock_data(symbol, days)
+        df = downsample_frame(df, max_points)
+
+        if format == "columnar":
+            return FastJSONResponse({"symbol": symbol, **frame_columns(df, STOCK_COLUMNS)})
+
+        # Convert whole columns at once instead of row by row
+        columns = [df.index.strftime('%Y-%m-%d').tolist()] + [
+            df[column].to_numpy().astype(np.int64 if column == 'Volume' else np.float64).tolist()
+            for column in STOCK_COLUMNS.values()
+        ]
+        fields = ["date"] + list(STOCK_COLUMNS)
+        return FastJSONResponse([dict(zip(fields, row)) for row in zip(*columns)])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/predictions/history")
 async def get_predictions_history(limit: int = 100):
     """Get prediction history from database"""
-    REQUEST_COUNT.labels(method='GET', endpoint='/predictions/history').inc()
-
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT * FROM stock_predictions
-        ORDER BY created_at DESC
-        LIMIT %s
-    """, (limit,))
-
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
-
+    return await persistence.run('postgres', fetch_predictions_history, limit)
+
+def fetch_predictions_history(limit: int):
+    with persistence.pg_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT * FROM stock_predictions
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (limit,))
+        results = cur.fetchall()
+        cur.close()
     return results
 
 @app.get("/metrics")
@@ -442,8 +963,10 @@ async def health_check():
 async def predict_future(
     ticker: str,
     model: str = "gru",
-    periods: int = 30,
-    period_type: str = "day"
+    periods: int = Query(30, ge=1, le=MAX_FORECAST_DAYS),
+    period_type: str = "day",
+    format: str = "rows",
+    max_points: Optional[int] = Query(None, ge=3)
 ):
     """Predict future stock prices
 
@@ -452,128 +975,105 @@ async def predict_future(
         model: Model to use (lstm, gru, transformer)
         periods: Number of periods to predict
         period_type: Type of period (day, week, month, year)
+        format: rows (date strings) or columnar (dates as Unix seconds)
+        max_points: LTTB-downsample the trajectory to at most this many points
     """
-    REQUEST_COUNT.labels(method='POST', endpoint='/predict/future').inc()
+    if format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(RESPONSE_FORMATS)}")
+    if horizon_days(periods, period_type) > MAX_FORECAST_DAYS:
+        raise HTTPException(status_code=422, detail=f"Forecast horizon is limited to {MAX_FORECAST_DAYS} days")
 
     try:
-        # Check if model exists
-        models_dir = f"/app/models/{ticker}"
-        ticker_lower = ticker.lower()
-        model_path = os.path.join(models_dir, f"{model}_{ticker_lower}_model.h5")
-
-        if not os.path.exists(model_path):
-            raise HTTPException(
-                status_code=404,
-                detail=f"Model {model} for {ticker} not found. Please train the model first using /train/{ticker}"
-            )
-
-        # Load model and scaler
-        from tensorflow.keras.models import load_model as tf_load_model
-        model_obj = tf_load_model(model_path)
-
-        scaler_path = os.path.join(models_dir, f"{model}_{ticker_lower}_scaler.pkl")
-        with open(scaler_path, 'rb') as f:
-            scaler = pickle.load(f)
-
-        # Get latest stock data
-        df = get_latest_stock_data(ticker, days=90)
-        data = df[['Close']].values
-        scaled_data = scaler.transform(data)
-
-        # Convert periods based on type
-        if period_type == "week":
-            total_days = periods * 7
-        elif period_type == "month":
-            total_days = periods * 30
-        elif period_type == "year":
-            total_days = periods * 365
-        else:  # day
-            total_days = periods
-
-        # Make rolling predictions
-        sequence_length = 60
-        predictions = []
-        current_sequence = scaled_data[-sequence_length:].copy()
-
-        for _ in range(total_days):
-            X = current_sequence.reshape(1, sequence_length, 1)
-            pred_scaled = model_obj.predict(X, verbose=0)
-            pred_price = scaler.inverse_transform(pred_scaled)[0][0]
-            predictions.append(float(pred_price))
-
-            # Update sequence
-            current_sequence = np.append(current_sequence[1:], pred_scaled, axis=0)
-
-        # Generate dates
-        last_date = df.index[-1]
-        future_dates = [
-            (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d')
-            for i in range(total_days)
-        ]
-
-        # Calculate trend
-        first_price = predictions[0]
-        last_price = predictions[-1]
-        trend = "Bullish" if last_price > first_price else "Bearish"
-        change_percent = ((last_price - first_price) / first_price) * 100
-
-        return {
-            "ticker": ticker,
-            "model": model,
-            "period_type": period_type,
-            "periods": periods,
-            "total_days": total_days,
-            "predictions": predictions,
-            "dates": future_dates,
-            "current_price": float(data[-1][0]),
-            "predicted_price_at_end": predictions[-1],
-            "trend": trend,
-            "change_percent": round(change_percent, 2)
-        }
-
+        response = await get_future_prediction(ticker, model, periods, period_type)
+        if max_points is not None and len(response['predictions']) > max_points:
+            predictions, dates = downsample_series(response['predictions'], response['dates'], max_points)
+            response = {**response, "predictions": predictions, "dates": dates}
+        if format == "columnar":
+            response = {**response, "dates": epoch_seconds(response['dates'])}
+        return FastJSONResponse(response)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/warmup")
+async def run_warmup():
+    """Precompute next-day and standard forecast predictions for every trained ticker now"""
+    return await prediction_warmup.run()
+
 @app.post("/train/{ticker}")
-async def train_model(ticker: str, background_tasks=None):
-    """Train models for a specific ticker
+async def train_model(ticker: str, model: str = "ALL", start: str = "2018-01-01", epochs: int = 20):
+    """Queue a training job for a specific ticker
 
     Args:
         ticker: Stock ticker symbol to train
-    """
-    REQUEST_COUNT.labels(method='POST', endpoint='/train').inc()
+        model: LSTM, GRU, TRANSFORMER or ALL
+        start: First date of training data (YYYY-MM-DD)
+        epochs: Maximum training epochs per model
 
+    An identical job that is still queued or running is returned instead of a new one.
+    """
+    ticker = ticker.upper()
+    model = model.upper()
+    if model not in MODEL_CHOICES:
+        raise HTTPException(status_code=400, detail=f"model must be one of {', '.join(MODEL_CHOICES)}")
+    if not 1 <= epochs <= 500:
+        raise HTTPException(status_code=400, detail="epochs must be between 1 and 500")
     try:
-        import subprocess
-
-        # Check if training script exists
-        script_path = "/app/../jupyter/scripts/stock_prediction/train_multi_company.py"
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be a YYYY-MM-DD date")
 
-        # Run training in background
-        command = [
-            "python3",
-            script_path,
-            "--ticker", ticker,
-            "--start-date", "2018-01-01"
-        ]
-
-        # Start training process
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+    try:
+        job, created = await training_jobs.submit(ticker, model, start_date, epochs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not queue training: {str(e)}")
 
-        return {
-            "status": "training_started",
-            "ticker": ticker,
-            "message": f"Training started for {ticker}. This will take 30-60 minutes.",
-            "process_id": process.pid,
-            "note": "Check /models/{ticker} endpoint to see when models are available"
-        }
+    return {
+        "status": "training_queued" if created else f"training_{job['status']}",
+        "job_id": job['id'],
+        "ticker": ticker,
+        "model": model,
+        "deduplicated": not created,
+        "message": f"Training {'queued' if created else 'already ' + job['status']} for {ticker}. This will take 30-60 minutes.",
+        "note": f"Check /train/jobs/{job['id']} for progress and /models/{ticker} for the trained models"
+    }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
\ No newline at end of file
+@app.get("/train/jobs")
+async def list_training_jobs(status: Optional[str] = None, limit: int = 50):
+    """Recent training jobs, newest first"""
+    jobs = await persistence.run('postgres', list_jobs, status, min(limit, 500))
+    return {"jobs": [training_jobs.describe(job) for job in jobs]}
+
+@app.get("/train/jobs/{job_id}")
+async def get_training_job(job_id: int):
+    """Status of one training job"""
+    job = await persistence.run('postgres', get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return training_jobs.describe(job)
+
+@app.get("/train/jobs/{job_id}/progress")
+async def get_training_progress(job_id: int):
+    """Per-epoch progress written by the training callback"""
+    job = await persistence.run('postgres', get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    progress = training_jobs.read_progress(job_id) or job['progress']
+    return {"job_id": job_id, "status": job['status'], "progress": progress}
+
+@app.get("/train/jobs/{job_id}/log")
+async def get_training_log(job_id: int, lines: int = 100):
+    """Tail of a training job's captured output"""
+    log = training_jobs.read_log(job_id, min(max(lines, 1), 2000))
+    if log is None:
+        raise HTTPException(status_code=404, detail=f"No log for training job {job_id}")
+    return {"job_id": job_id, "lines": log}
+
+@app.delete("/train/jobs/{job_id}")
+async def cancel_training_job(job_id: int):
+    """Cancel a queued job or terminate a running one"""
+    job = await training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail=f"Training job {job_id} is not queued or running")
+    return training_jobs.describe(job)
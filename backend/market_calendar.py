@@ -0,0 +1,38 @@
+"""
+Exchange trading calendar (NYSE regular sessions)
+Holidays come from the shared rules in scripts/stock_prediction, so the
+backend and the training data store agree on which days have bars
+"""
+import os
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+from scripts.stock_prediction.market_calendar import (  # noqa: F401
+    holidays, is_trading_day, next_trading_day, trading_days_after
+)
+
+EXCHANGE_TZ = ZoneInfo(os.getenv("EXCHANGE_TZ", "America/New_York"))
+MARKET_CLOSE = dt_time(16, 0)
+# Daily bars are final upstream a little after the close
+BAR_SETTLE_MINUTES = int(os.getenv("BAR_SETTLE_MINUTES", "20"))
+
+
+def bar_final_at(day):
+    """Time at which the daily bar of a trading day is expected to be final"""
+    close = datetime.combine(day, MARKET_CLOSE, tzinfo=EXCHANGE_TZ)
+    return close + timedelta(minutes=BAR_SETTLE_MINUTES)
+
+
+def next_bar_at(now=None):
+    """When the next daily bar (or today's final bar) is expected upstream"""
+    now = now or datetime.now(EXCHANGE_TZ)
+    today = now.astimezone(EXCHANGE_TZ).date()
+    if is_trading_day(today) and now < bar_final_at(today):
+        return bar_final_at(today)
+    return bar_final_at(next_trading_day(today))
+
+
+def seconds_until_next_bar(now=None, minimum=60):
+    """Cache lifetime for anything derived from the current bars"""
+    now = now or datetime.now(EXCHANGE_TZ)
+    return max(minimum, int((next_bar_at(now) - now).total_seconds()))
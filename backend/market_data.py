@@ -0,0 +1,268 @@
+"""
+Serving-side market data layer
+Keeps the last N daily bars per active ticker in fixed-size NumPy ring buffers,
+refreshed by a background task so request handlers never wait on yfinance
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from prometheus_client import Counter, Gauge, Histogram
+
+from instrumentation import stage
+
+MARKET_BUFFER_BARS = int(os.getenv("MARKET_BUFFER_BARS", "512"))
+MARKET_REFRESH_SECONDS = int(os.getenv("MARKET_REFRESH_SECONDS", "300"))
+MARKET_ACTIVE_TTL_SECONDS = int(os.getenv("MARKET_ACTIVE_TTL_SECONDS", str(24 * 3600)))
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Prometheus metrics
+MARKET_DATA_STALENESS = Gauge('market_data_staleness_seconds', 'Seconds since the ticker buffer was last refreshed', ['symbol'])
+MARKET_DATA_LAST_BAR_AGE = Gauge('market_data_last_bar_age_seconds', 'Age of the newest bar in the ticker buffer', ['symbol'])
+MARKET_DATA_REFRESH_LATENCY = Histogram('market_data_refresh_latency_seconds', 'Latency of a batched upstream refresh')
+MARKET_DATA_REFRESH_FAILURES = Counter('market_data_refresh_failures_total', 'Failed upstream market data refreshes')
+MARKET_DATA_READS = Counter('market_data_reads_total', 'Market data reads by source', ['source'])
+MARKET_DATA_ACTIVE_TICKERS = Gauge('market_data_active_tickers', 'Tickers kept in memory and refreshed')
+
+
+def _normalize(df):
+    """yfinance frame -> float64 OHLCV frame indexed by calendar day"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    if isinstance(df.columns, pd.MultiIndex):
+        # Field names may sit on either level depending on the yfinance version
+        level = next((i for i in range(df.columns.nlevels) if 'Close' in df.columns.get_level_values(i)), 0)
+        df = df.copy()
+        df.columns = df.columns.get_level_values(level)
+    df = df[COLUMNS].dropna(subset=['Close']).astype(np.float64)
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = index.normalize()
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def _split_batch(df, symbols):
+    """Split a multi-ticker yf.download(group_by='ticker') frame per symbol"""
+    if len(symbols) == 1:
+        return {symbols[0]: _normalize(df)}
+    frames = {}
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex) and symbol in df.columns.get_level_values(0):
+            frames[symbol] = _normalize(df[symbol])
+    return frames
+
+
+class TickerBuffer:
+    """Fixed-capacity ring buffer of daily bars for one ticker"""
+
+    def __init__(self, capacity=MARKET_BUFFER_BARS):
+        self.capacity = capacity
+        self.dates = np.zeros(capacity, dtype='datetime64[D]')
+        self.ohlcv = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self.size = 0
+        self.head = 0            # next write position
+        self.refreshed_at = 0.0
+        self.accessed_at = time.time()
+
+    @property
+    def last_date(self):
+        if self.size == 0:
+            return None
+        return self.dates[(self.head - 1) % self.capacity]
+
+    def append(self, df):
+        """Append bars newer than the last stored one; the last bar may be revised in place"""
+        if df.empty:
+            return
+        dates = df.index.values.astype('datetime64[D]')
+        values = df[COLUMNS].values
+
+        last = self.last_date
+        if last is not None:
+            # Today's bar keeps changing until the close: overwrite it
+            same = dates == last
+            if same.any():
+                self.ohlcv[(self.head - 1) % self.capacity] = values[same][-1]
+            newer = dates > last
+            dates, values = dates[newer], values[newer]
+
+        for date, row in zip(dates[-self.capacity:], values[-self.capacity:]):
+            self.dates[self.head] = date
+            self.ohlcv[self.head] = row
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def ordered(self):
+        """(dates, ohlcv) oldest first, as copies"""
+        if self.size < self.capacity:
+            return self.dates[:self.size].copy(), self.ohlcv[:self.size].copy()
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.dates[order], self.ohlcv[order]
+
+
+class MarketDataCache:
+    """In-memory recent bars for active tickers with batched background refresh"""
+
+    def __init__(self, capacity=MARKET_BUFFER_BARS, refresh_seconds=MARKET_REFRESH_SECONDS,
+                 active_ttl=MARKET_ACTIVE_TTL_SECONDS):
+        self.capacity = capacity
+        self.refresh_seconds = refresh_seconds
+        self.active_ttl = active_ttl
+        self._buffers = {}
+        self._tracked = set()
+        self._cold_fills = {}
+        self._task = None
+
+    def _lookback_days(self):
+        # Calendar days needed to cover `capacity` trading days
+        return int(self.capacity * 7 / 5) + 10
+
+    async def _download(self, symbols, start):
+        """Batched upstream fetch in a worker thread"""
+        start_time = time.time()
+        try:
+            with stage('yfinance'):
+                df = await asyncio.to_thread(
+                    yf.download, symbols if len(symbols) > 1 else symbols[0],
+                    start=start, end=datetime.now() + timedelta(days=1),
+                    progress=False, group_by='ticker'
+                )
+        except Exception:
+            MARKET_DATA_REFRESH_FAILURES.inc()
+            raise
+        finally:
+            MARKET_DATA_REFRESH_LATENCY.observe(time.time() - start_time)
+        return _split_batch(df, symbols)
+
+    async def _cold_fill(self, symbol):
+        start = datetime.now() - timedelta(days=self._lookback_days())
+        frames = await self._download([symbol], start)
+        buffer = TickerBuffer(self.capacity)
+        buffer.append(frames.get(symbol, pd.DataFrame(columns=COLUMNS)))
+        buffer.refreshed_at = time.time()
+        self._buffers[symbol] = buffer
+        MARKET_DATA_ACTIVE_TICKERS.set(len(self._buffers))
+        return buffer
+
+    async def _get_buffer(self, symbol):
+        buffer = self._buffers.get(symbol)
+        if buffer is not None:
+            return buffer
+
+        # First request for a ticker: one fetch shared by concurrent callers
+        fill = self._cold_fills.get(symbol)
+        if fill is None:
+            fill = asyncio.ensure_future(self._cold_fill(symbol))
+            self._cold_fills[symbol] = fill
+            fill.add_done_callback(lambda _: self._cold_fills.pop(symbol, None))
+        return await fill
+
+    async def get_frame(self, symbol: str, calendar_days: int):
+        """Bars from the last `calendar_days` days as a DataFrame
+
+        Served from memory when the window fits in the buffer; longer windows
+        fall back to a direct upstream fetch.
+        """
+        start = pd.Timestamp(datetime.now() - timedelta(days=calendar_days)).normalize()
+
+        if calendar_days > self._lookback_days():
+            MARKET_DATA_READS.labels(source='upstream').inc()
+            frames = await self._download([symbol], start.to_pydatetime())
+            return frames.get(symbol, pd.DataFrame(columns=COLUMNS))
+
+        buffer = await self._get_buffer(symbol)
+        buffer.accessed_at = time.time()
+        MARKET_DATA_READS.labels(source='memory').inc()
+
+        dates, ohlcv = buffer.ordered()
+        lo = np.searchsorted(dates, np.datetime64(start.date(), 'D'), side='left')
+        return pd.DataFrame(ohlcv[lo:], index=pd.DatetimeIndex(dates[lo:]), columns=COLUMNS)
+
+    async def last_bar(self, symbol: str):
+        """Identity of the newest bar held for a ticker ('YYYY-MM-DD:close'), or None
+
+        The close is part of it because today's bar is revised in place until
+        it settles: anything keyed on it changes with every revision.
+        """
+        buffer = await self._get_buffer(symbol)
+        last = buffer.last_date
+        if last is None:
+            return None
+        return f"{last}:{buffer.ohlcv[(buffer.head - 1) % buffer.capacity][COLUMNS.index('Close')]:.4f}"
+
+    def track(self, symbols):
+        """Register tickers to be loaded by the next background refresh"""
+        self._tracked.update(s for s in symbols if s not in self._buffers)
+
+    async def refresh(self):
+        """Fetch new bars for every active ticker in one batched request"""
+        now = time.time()
+        for symbol in [s for s, b in self._buffers.items() if now - b.accessed_at > self.active_ttl]:
+            del self._buffers[symbol]
+
+        symbols = sorted(set(self._buffers) | self._tracked)
+        if not symbols:
+            MARKET_DATA_ACTIVE_TICKERS.set(0)
+            return
+
+        if self._tracked or any(b.last_date is None for b in self._buffers.values()):
+            start = datetime.now() - timedelta(days=self._lookback_days())
+        else:
+            start = pd.Timestamp(min(b.last_date for b in self._buffers.values())).to_pydatetime()
+
+        frames = await self._download(symbols, start)
+        refreshed_at = time.time()
+        for symbol, df in frames.items():
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                buffer = TickerBuffer(self.capacity)
+                self._buffers[symbol] = buffer
+            buffer.append(df)
+            buffer.refreshed_at = refreshed_at
+        self._tracked.clear()
+
+        MARKET_DATA_ACTIVE_TICKERS.set(len(self._buffers))
+        self._update_gauges()
+
+    def _update_gauges(self):
+        now = time.time()
+        for symbol, buffer in self._buffers.items():
+            if buffer.refreshed_at:
+                MARKET_DATA_STALENESS.labels(symbol=symbol).set(now - buffer.refreshed_at)
+            if buffer.last_date is not None:
+                last_bar = pd.Timestamp(buffer.last_date).timestamp()
+                MARKET_DATA_LAST_BAR_AGE.labels(symbol=symbol).set(now - last_bar)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Market data refresh failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, symbols=()):
+        """Start the background refresh task, pre-tracking the given tickers"""
+        self.track(symbols)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+market_data = MarketDataCache()
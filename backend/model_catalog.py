@@ -0,0 +1,337 @@
+"""
+Model artifact catalog
+In-memory index of every trained artifact under the models directory (sizes,
+versions and metrics), persisted as a JSON manifest and refreshed
+incrementally by mtime polling. Global cross-ticker models are listed under
+every ticker they were trained on.
+"""
+import asyncio
+import json
+import os
+import pickle
+import re
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from model_registry import GLOBAL_MODEL_DIR, GLOBAL_MODEL_MODE, MODELS_DIR
+
+MODEL_CATALOG_MANIFEST = os.getenv("MODEL_CATALOG_MANIFEST", os.path.join(MODELS_DIR, "catalog.json"))
+MODEL_CATALOG_POLL_SECONDS = int(os.getenv("MODEL_CATALOG_POLL_SECONDS", "30"))
+MODEL_CATALOG_NEGATIVE_TTL = int(os.getenv("MODEL_CATALOG_NEGATIVE_TTL", "30"))
+MODEL_CATALOG_NEGATIVE_MAX = int(os.getenv("MODEL_CATALOG_NEGATIVE_MAX", "1024"))
+
+# Ticker names as they appear in URLs and model directory names (TSLA, BRK-B, BRK.B)
+TICKER_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9.\-]{0,15}$"
+TICKER_RE = re.compile(TICKER_PATTERN)
+
+ARTIFACT_SUFFIXES = {'model.h5': 'model', 'scaler.pkl': 'scaler', 'metrics.pkl': 'metrics'}
+GLOBAL_ARTIFACT = re.compile(r"^(?P<model>.+)_global_(?P<suffix>model\.h5|scalers\.pkl|metrics\.pkl)$")
+
+# Prometheus metrics
+CATALOG_TICKERS = Gauge('model_catalog_tickers', 'Tickers with at least one trained model')
+CATALOG_MODELS = Gauge('model_catalog_models', 'Trained models in the catalog')
+CATALOG_REFRESH_LATENCY = Histogram('model_catalog_refresh_seconds', 'Time to rescan the models directory')
+CATALOG_TICKERS_REINDEXED = Counter('model_catalog_tickers_reindexed_total', 'Ticker directories re-read after a change')
+CATALOG_LOOKUPS = Counter('model_catalog_lookups_total', 'Catalog lookups by outcome', ['result'])
+
+
+def _plain(value):
+    """Metrics values as JSON-friendly Python types"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    return value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+
+
+def _scan_ticker_dir(path):
+    """{file name: [mtime, size]} for the files in a ticker directory"""
+    signature = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                signature[entry.name] = [stat.st_mtime, stat.st_size]
+    return signature
+
+
+class ModelCatalog:
+    """Index of trained models per ticker, answered from memory"""
+
+    def __init__(self, models_dir=MODELS_DIR, manifest_path=MODEL_CATALOG_MANIFEST,
+                 poll_seconds=MODEL_CATALOG_POLL_SECONDS, negative_ttl=MODEL_CATALOG_NEGATIVE_TTL,
+                 global_dir=GLOBAL_MODEL_DIR, global_mode=GLOBAL_MODEL_MODE,
+                 negative_max=MODEL_CATALOG_NEGATIVE_MAX):
+        self.models_dir = models_dir
+        self.manifest_path = manifest_path
+        self.poll_seconds = poll_seconds
+        self.negative_ttl = negative_ttl
+        self.negative_max = negative_max
+        self.global_dir = global_dir
+        self.global_mode = global_mode
+        self._tickers = {}       # ticker -> {"signature": {...}, "models": {model_name: info}}
+        self._global = {"signature": {}, "models": {}}   # model_name -> info with per-ticker metrics
+        self._negative = OrderedDict()   # ticker -> time of the failed lookup, oldest first
+        self._task = None
+
+    def _index_ticker(self, ticker, signature, previous=None):
+        """Build the model entries of one ticker; unchanged metrics files are not re-read"""
+        ticker_dir = os.path.join(self.models_dir, ticker)
+        pattern = re.compile(rf"^(?P<model>.+)_{re.escape(ticker.lower())}_(?P<suffix>model\.h5|scaler\.pkl|metrics\.pkl)$")
+
+        files = {}
+        for name, stat in signature.items():
+            match = pattern.match(name)
+            if match:
+                files.setdefault(match.group('model'), {})[ARTIFACT_SUFFIXES[match.group('suffix')]] = (name, stat)
+
+        old_models = (previous or {}).get('models', {})
+        models = {}
+        for model_name, artifacts in sorted(files.items()):
+            if 'model' not in artifacts:
+                continue
+            model_file, model_stat = artifacts['model']
+            info = {
+                "model_name": model_name,
+                "model_path": os.path.join(ticker_dir, model_file),
+                "has_scaler": 'scaler' in artifacts,
+                "has_metrics": 'metrics' in artifacts,
+                "size_bytes": model_stat[1],
+                "version": max(model_stat[0], artifacts['scaler'][1][0]) if 'scaler' in artifacts else model_stat[0],
+            }
+
+            if 'metrics' in artifacts:
+                metrics_file, metrics_stat = artifacts['metrics']
+                old = old_models.get(model_name)
+                if old is not None and old.get('metrics_mtime') == metrics_stat[0] and 'metrics' in old:
+                    info['metrics'] = old['metrics']
+                else:
+                    try:
+                        with open(os.path.join(ticker_dir, metrics_file), 'rb') as f:
+                            info['metrics'] = {k: _plain(v) for k, v in pickle.load(f).items()}
+                    except Exception as e:
+                        print(f"Could not read metrics {metrics_file}: {e}")
+                info['metrics_mtime'] = metrics_stat[0]
+
+            models[model_name] = info
+        return {"signature": signature, "models": models}
+
+    def _index_global(self, signature, previous=None):
+        """Build the global model entries; the metrics file lists the tickers each model covers"""
+        files = {}
+        for name, stat in signature.items():
+            match = GLOBAL_ARTIFACT.match(name)
+            if match:
+                files.setdefault(match.group('model'), {})[match.group('suffix')] = (name, stat)
+
+        old_models = (previous or {}).get('models', {})
+        models = {}
+        for model_name, artifacts in sorted(files.items()):
+            if 'model.h5' not in artifacts or 'scalers.pkl' not in artifacts or 'metrics.pkl' not in artifacts:
+                continue
+            model_file, model_stat = artifacts['model.h5']
+            metrics_file, metrics_stat = artifacts['metrics.pkl']
+            old = old_models.get(model_name)
+            if old is not None and old.get('metrics_mtime') == metrics_stat[0]:
+                models[model_name] = old
+                continue
+            try:
+                with open(os.path.join(self.global_dir, metrics_file), 'rb') as f:
+                    metrics = pickle.load(f)
+            except Exception as e:
+                print(f"Could not read metrics {metrics_file}: {e}")
+                continue
+            models[model_name] = {
+                "model_name": model_name,
+                "model_path": os.path.join(self.global_dir, model_file),
+                "global": True,
+                "embedding": bool(metrics.get('embedding')),
+                "size_bytes": model_stat[1],
+                "version": max(model_stat[0], artifacts['scalers.pkl'][1][0]),
+                "tickers": {
+                    ticker: {k: _plain(v) for k, v in ticker_metrics.items()}
+                    for ticker, ticker_metrics in metrics.get('tickers', {}).items()
+                },
+                "metrics_mtime": metrics_stat[0],
+            }
+        return {"signature": signature, "models": models}
+
+    def _global_models(self, ticker):
+        """{model_name: info} of the global models that serve a ticker"""
+        if self.global_mode == 'off':
+            return {}
+        models = {}
+        for model_name, info in self._global['models'].items():
+            if ticker in info['tickers']:
+                entry = {k: v for k, v in info.items() if k != 'tickers'}
+                entry['metrics'] = info['tickers'][ticker]
+                models[model_name] = entry
+        return models
+
+    def refresh(self):
+        """Rescan the models directory, re-reading only ticker directories that changed"""
+        start_time = time.time()
+        if not os.path.isdir(self.models_dir):
+            self._tickers = {}
+            self._update_gauges()
+            return False
+
+        # Work on a copy and swap it in, so readers never see a half-updated index
+        tickers = dict(self._tickers)
+        changed = False
+        seen = set()
+        with os.scandir(self.models_dir) as entries:
+            for entry in entries:
+                # '_global' and other '_' directories are not tickers
+                if not entry.is_dir() or entry.name.startswith(('.', '_')):
+                    continue
+                ticker = entry.name
+                seen.add(ticker)
+                try:
+                    signature = _scan_ticker_dir(entry.path)
+                except OSError:
+                    continue
+                previous = tickers.get(ticker)
+                if previous is not None and previous['signature'] == signature:
+                    continue
+                tickers[ticker] = self._index_ticker(ticker, signature, previous)
+                self._negative.pop(ticker, None)
+                CATALOG_TICKERS_REINDEXED.inc()
+                changed = True
+
+        for ticker in set(tickers) - seen:
+            del tickers[ticker]
+            changed = True
+
+        try:
+            global_signature = _scan_ticker_dir(self.global_dir)
+        except OSError:
+            global_signature = {}
+        if global_signature != self._global['signature']:
+            self._global = self._index_global(global_signature, self._global)
+            changed = True
+
+        self._tickers = tickers
+        if changed:
+            self._save_manifest()
+        self._update_gauges()
+        CATALOG_REFRESH_LATENCY.observe(time.time() - start_time)
+        return changed
+
+    def load_manifest(self):
+        """Seed the index from the persisted manifest so startup skips unpickling"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self._tickers = manifest.get('tickers', {})
+            self._global = manifest.get('global', {"signature": {}, "models": {}})
+        except (OSError, ValueError):
+            self._tickers = {}
+
+    def _save_manifest(self):
+        manifest = {"updated_at": time.time(), "tickers": self._tickers, "global": self._global}
+        tmp_path = self.manifest_path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"Could not write model catalog manifest: {e}")
+
+    def _update_gauges(self):
+        CATALOG_TICKERS.set(len(self.tickers()))
+        CATALOG_MODELS.set(sum(len(t['models']) for t in self._tickers.values()) + len(self._global['models']))
+
+    def tickers(self):
+        """Tickers with at least one trained model, their own or a global one"""
+        tickers = {ticker for ticker, indexed in self._tickers.items() if indexed['models']}
+        if self.global_mode != 'off':
+            for info in self._global['models'].values():
+                tickers.update(info['tickers'])
+        return sorted(tickers)
+
+    async def models(self, ticker):
+        """{model_name: info} for a ticker, or None if it has no trained models
+
+        Unknown tickers are checked on disk once, in a worker thread (a model
+        may have just been trained), and then remembered as missing for
+        negative_ttl seconds. At most negative_max misses are remembered.
+        Names that are not ticker-shaped never reach the filesystem.
+        """
+        if not TICKER_RE.match(ticker):
+            CATALOG_LOOKUPS.labels(result='invalid').inc()
+            return None
+        global_models = self._global_models(ticker)
+        indexed = self._tickers.get(ticker)
+        if indexed is not None and indexed['models']:
+            CATALOG_LOOKUPS.labels(result='hit').inc()
+            return self._merge(indexed['models'], global_models)
+        if global_models:
+            CATALOG_LOOKUPS.labels(result='hit').inc()
+            return global_models
+
+        missed_at = self._negative.get(ticker)
+        if missed_at is not None and time.time() - missed_at < self.negative_ttl:
+            CATALOG_LOOKUPS.labels(result='negative').inc()
+            return None
+
+        CATALOG_LOOKUPS.labels(result='miss').inc()
+        own_models = await asyncio.to_thread(self._index_from_disk, ticker, indexed)
+        if own_models:
+            return self._merge(own_models, global_models)
+        self._remember_miss(ticker)
+        return None
+
+    def _index_from_disk(self, ticker, previous):
+        """Index one ticker directory outside the poll cycle; blocking"""
+        ticker_dir = os.path.join(self.models_dir, ticker)
+        if not os.path.isdir(ticker_dir):
+            return None
+        indexed = self._index_ticker(ticker, _scan_ticker_dir(ticker_dir), previous)
+        self._tickers[ticker] = indexed
+        self._update_gauges()
+        return indexed['models']
+
+    def _remember_miss(self, ticker):
+        """Negative cache entry, dropping expired and then oldest entries beyond negative_max"""
+        now = time.time()
+        self._negative.pop(ticker, None)
+        self._negative[ticker] = now
+        while self._negative:
+            oldest, missed_at = next(iter(self._negative.items()))
+            if len(self._negative) <= self.negative_max and now - missed_at < self.negative_ttl:
+                break
+            del self._negative[oldest]
+
+    def _merge(self, own_models, global_models):
+        """A ticker's own models plus the global ones, following the registry's global model mode"""
+        if self.global_mode == 'prefer':
+            return {**own_models, **global_models}
+        return {**global_models, **own_models}
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Model catalog refresh failed: {e}")
+
+    async def start(self):
+        """Load the manifest, catch up with the directory and start polling"""
+        self.load_manifest()
+        await asyncio.to_thread(self.refresh)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+model_catalog = ModelCatalog()
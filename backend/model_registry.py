@@ -0,0 +1,331 @@
+"""
+In-process model registry for the prediction API
+Keeps loaded Keras models and scalers resident, keyed by (ticker, model_type).
+Tickers without their own artifact can be served by a global cross-ticker
+model: one resident model per architecture plus a per-ticker scaler.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+MODELS_DIR = os.getenv("MODELS_DIR", "/app/models")
+MODEL_REGISTRY_MAX_MB = int(os.getenv("MODEL_REGISTRY_MAX_MB", "512"))
+GLOBAL_MODEL_DIR = os.getenv("GLOBAL_MODEL_DIR", os.path.join(MODELS_DIR, "_global"))
+# fallback: global model for tickers without their own; prefer: global model whenever it covers the ticker; off
+GLOBAL_MODEL_MODE = os.getenv("GLOBAL_MODEL_MODE", "fallback")
+
+# Estimated memory of one ticker view on a global model (traced rollout engine, fused graphs, trajectory)
+GLOBAL_VIEW_MB = float(os.getenv("GLOBAL_VIEW_MB", "4"))
+
+GLOBAL_KEY = '_global'
+
+# Prometheus metrics
+REGISTRY_HITS = Counter('model_registry_hits_total', 'Model registry lookups served from memory', ['model'])
+REGISTRY_MISSES = Counter('model_registry_misses_total', 'Model registry lookups that loaded from disk', ['model'])
+REGISTRY_RELOADS = Counter('model_registry_reloads_total', 'Models reloaded after their artifact changed', ['model'])
+REGISTRY_EVICTIONS = Counter('model_registry_evictions_total', 'Models evicted to stay under the memory budget', ['model'])
+REGISTRY_LOAD_TIME = Histogram('model_registry_load_seconds', 'Time to load a model and scaler from disk', ['model'])
+REGISTRY_RESIDENT_MODELS = Gauge('model_registry_resident_models', 'Models currently resident in memory')
+REGISTRY_RESIDENT_BYTES = Gauge('model_registry_resident_bytes', 'Estimated memory used by resident models')
+
+
+def artifact_paths(ticker: str, model_name: str, models_dir: str = MODELS_DIR):
+    """Return (model_path, scaler_path) for a ticker/model pair"""
+    ticker_lower = ticker.lower()
+    ticker_dir = os.path.join(models_dir, ticker)
+    model_path = os.path.join(ticker_dir, f"{model_name}_{ticker_lower}_model.h5")
+    scaler_path = os.path.join(ticker_dir, f"{model_name}_{ticker_lower}_scaler.pkl")
+    return model_path, scaler_path
+
+
+def global_artifact_paths(model_name: str, global_dir: str = GLOBAL_MODEL_DIR):
+    """Return (model_path, scalers_path) of the global model for an architecture"""
+    model_path = os.path.join(global_dir, f"{model_name}_global_model.h5")
+    scalers_path = os.path.join(global_dir, f"{model_name}_global_scalers.pkl")
+    return model_path, scalers_path
+
+
+def ticker_view(global_model, ticker_index: int):
+    """Single-input model for one ticker that shares the weights of an embedding global model"""
+    import tensorflow as tf
+
+    window = tf.keras.Input(shape=global_model.inputs[0].shape[1:])
+    ticker_ids = tf.keras.layers.Lambda(lambda x: tf.fill([tf.shape(x)[0], 1], ticker_index))(window)
+    return tf.keras.Model(window, global_model([window, ticker_ids]))
+
+
+class ModelEntry:
+    """A resident model, its scaler and anything derived from them"""
+
+    def __init__(self, ticker, model_name, model, scaler, version, size_bytes):
+        self.ticker = ticker
+        self.model_name = model_name
+        self.model = model
+        self.scaler = scaler
+        self.version = version          # artifact mtime, changes after a retrain
+        self.size_bytes = size_bytes
+        self.loaded_at = time.time()
+        # Requests with the same batch key share forward passes; tickers served
+        # by the same global weights share one key
+        self.batch_key = (ticker, model_name)
+        self.base_key = None            # registry key of the global model behind a ticker view
+        # Objects built from this model (rollout engines, fused graphs, ...).
+        # They are dropped together with the entry when the artifact changes.
+        self.extras = {}
+
+
+class ModelRegistry:
+    """LRU cache of loaded models bounded by an estimated memory budget"""
+
+    def __init__(self, models_dir: str = MODELS_DIR, max_bytes: int = MODEL_REGISTRY_MAX_MB * 1024 * 1024,
+                 global_dir: str = GLOBAL_MODEL_DIR, global_mode: str = GLOBAL_MODEL_MODE):
+        self.models_dir = models_dir
+        self.max_bytes = max_bytes
+        self.global_dir = global_dir
+        self.global_mode = global_mode
+        self._global_meta = {}          # model_name -> (version, {"scalers": ..., "ticker_index": ...})
+        self._entries = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._load_hooks = []
+
+    def add_load_hook(self, hook):
+        """Run hook(entry) after every (re)load, e.g. to build and warm derived graphs"""
+        self._load_hooks.append(hook)
+
+    def _artifact_version(self, ticker, model_name):
+        model_path, scaler_path = artifact_paths(ticker, model_name, self.models_dir)
+        try:
+            model_stat = os.stat(model_path)
+            scaler_stat = os.stat(scaler_path)
+        except FileNotFoundError:
+            return None, model_path, scaler_path, 0
+        version = max(model_stat.st_mtime, scaler_stat.st_mtime)
+        return version, model_path, scaler_path, model_stat.st_size
+
+    def _global_version(self, model_name):
+        model_path, scalers_path = global_artifact_paths(model_name, self.global_dir)
+        try:
+            model_stat = os.stat(model_path)
+            scalers_stat = os.stat(scalers_path)
+        except FileNotFoundError:
+            return None, model_path, 0
+        return max(model_stat.st_mtime, scalers_stat.st_mtime), model_path, model_stat.st_size
+
+    def global_meta(self, model_name: str):
+        """Per-ticker scalers and ticker index of the global model, or None if there is none"""
+        if self.global_mode == 'off':
+            return None
+        version = self._global_version(model_name)[0]
+        if version is None:
+            return None
+        cached = self._global_meta.get(model_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with open(global_artifact_paths(model_name, self.global_dir)[1], 'rb') as f:
+                meta = pickle.load(f)
+        except Exception as e:
+            print(f"Could not read global {model_name} scalers: {e}")
+            return cached[1] if cached is not None else None
+        self._global_meta[model_name] = (version, meta)
+        return meta
+
+    def _uses_global(self, ticker, model_name, ticker_version):
+        """Whether (ticker, model_name) is served by the global model"""
+        if self.global_mode == 'off' or (ticker_version is not None and self.global_mode != 'prefer'):
+            return False
+        meta = self.global_meta(model_name)
+        return meta is not None and ticker in meta['scalers']
+
+    def artifact_version(self, ticker: str, model_name: str):
+        """Current on-disk artifact version without loading the model
+
+        Raises FileNotFoundError when the model or scaler artifact does not exist.
+        """
+        version = self._artifact_version(ticker, model_name)[0]
+        if self._uses_global(ticker, model_name, version):
+            return self._global_version(model_name)[0]
+        if version is None:
+            raise FileNotFoundError(f"Model {model_name} for {ticker} not found")
+        return version
+
+    def get(self, ticker: str, model_name: str) -> ModelEntry:
+        """Return the resident entry, loading or reloading it from disk when needed
+
+        Raises FileNotFoundError when the model or scaler artifact does not exist.
+        """
+        key = (ticker, model_name)
+        version, model_path, scaler_path, size_bytes = self._artifact_version(ticker, model_name)
+        if self._uses_global(ticker, model_name, version):
+            base = self._get_global(model_name)
+            return self._get_or_load(key, base.version, lambda: self._global_view(ticker, model_name, base))
+        if version is None:
+            self.invalidate(ticker, model_name)
+            raise FileNotFoundError(f"Model {model_name} for {ticker} not found")
+
+        return self._get_or_load(
+            key, version, lambda: self._load(ticker, model_name, model_path, scaler_path, version, size_bytes)
+        )
+
+    def _get_global(self, model_name):
+        """Resident global model of an architecture (no load hooks: it is only used through ticker views)"""
+        version, model_path, size_bytes = self._global_version(model_name)
+        if version is None:
+            raise FileNotFoundError(f"Global model {model_name} not found")
+        return self._get_or_load(
+            (GLOBAL_KEY, model_name), version,
+            lambda: self._load(GLOBAL_KEY, model_name, model_path, None, version, size_bytes)
+        )
+
+    def _get_or_load(self, key, version, load):
+        """Entry for key at version, calling load() at most once per key at a time"""
+        ticker, model_name = key
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._touch(key, entry)
+                REGISTRY_HITS.labels(model=model_name).inc()
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; the others wait and reuse its result
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == version:
+                    self._touch(key, entry)
+                    REGISTRY_HITS.labels(model=model_name).inc()
+                    return entry
+            stale = entry
+
+            REGISTRY_MISSES.labels(model=model_name).inc()
+            try:
+                new_entry = load()
+            except Exception as e:
+                # A retrain may still be writing the artifact: keep serving the old model
+                if stale is not None:
+                    print(f"Reload of {model_name} for {ticker} failed, keeping previous version: {e}")
+                    return stale
+                raise
+
+            if stale is not None:
+                REGISTRY_RELOADS.labels(model=model_name).inc()
+            self._insert(key, new_entry)
+            return new_entry
+
+    def _load(self, ticker, model_name, model_path, scaler_path, version, size_bytes):
+        from tensorflow.keras.models import load_model
+
+        start_time = time.time()
+        model = load_model(model_path, compile=False)
+        if scaler_path is None:
+            # Global model: scalers are per ticker and live in the ticker views
+            entry = ModelEntry(ticker, model_name, model, None, version, size_bytes)
+        else:
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+            entry = ModelEntry(ticker, model_name, model, scaler, version, size_bytes)
+            for hook in self._load_hooks:
+                hook(entry)
+        REGISTRY_LOAD_TIME.labels(model=model_name).observe(time.time() - start_time)
+
+        return entry
+
+    def _global_view(self, ticker, model_name, base):
+        """Entry for one ticker on top of the resident global model
+
+        Its weights are not counted again, but what is built per ticker is:
+        each view is charged GLOBAL_VIEW_MB against the memory budget.
+        """
+        meta = self.global_meta(model_name)
+        if meta is None or ticker not in meta['scalers']:
+            raise FileNotFoundError(f"Global model {model_name} does not cover {ticker}")
+
+        ticker_index = (meta.get('ticker_index') or {}).get(ticker)
+        model = base.model if ticker_index is None else ticker_view(base.model, ticker_index)
+        entry = ModelEntry(ticker, model_name, model, meta['scalers'][ticker], base.version,
+                           int(GLOBAL_VIEW_MB * 1024 * 1024))
+        entry.base_key = (GLOBAL_KEY, model_name)
+        if ticker_index is None:
+            # Same weights and inputs for every ticker: batch them together
+            entry.batch_key = entry.base_key
+        for hook in self._load_hooks:
+            hook(entry)
+        return entry
+
+    def _touch(self, key, entry):
+        """Mark an entry (and the global model behind it) most recently used; call with the lock held"""
+        self._entries.move_to_end(key)
+        if entry.base_key is not None and entry.base_key in self._entries:
+            self._entries.move_to_end(entry.base_key)
+
+    def _drop(self, key):
+        """Remove an entry and, for a global model, every ticker view on it; call with the lock held"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._resident_bytes -= entry.size_bytes
+        REGISTRY_EVICTIONS.labels(model=key[1]).inc()
+        self._drop_views(key)
+
+    def _drop_views(self, key):
+        """Remove the ticker views on a global model; call with the lock held"""
+        if key[0] != GLOBAL_KEY:
+            return
+        for view_key in [k for k, e in self._entries.items() if e.base_key == key]:
+            self._resident_bytes -= self._entries.pop(view_key).size_bytes
+
+    def _insert(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._resident_bytes -= old.size_bytes
+            self._entries[key] = entry
+            self._resident_bytes += entry.size_bytes
+            self._touch(key, entry)
+
+            # Evict least recently used models, but always keep the one just loaded and its base
+            protected = {key, entry.base_key}
+            while self._resident_bytes > self.max_bytes:
+                evictable = [k for k in self._entries if k not in protected]
+                if not evictable:
+                    break
+                self._drop(evictable[0])
+
+            self._update_gauges()
+
+    def _update_gauges(self):
+        REGISTRY_RESIDENT_MODELS.set(len(self._entries))
+        REGISTRY_RESIDENT_BYTES.set(self._resident_bytes)
+
+    def invalidate(self, ticker: str, model_name: str = None):
+        """Drop one model (or every model of a ticker) from memory"""
+        with self._lock:
+            for key in list(self._entries):
+                if key in self._entries and key[0] == ticker and (model_name is None or key[1] == model_name):
+                    self._resident_bytes -= self._entries.pop(key).size_bytes
+                    # Ticker views share the dropped weights
+                    self._drop_views(key)
+            self._update_gauges()
+
+    def stats(self):
+        """Snapshot of what is currently resident"""
+        with self._lock:
+            return {
+                "resident_models": len(self._entries),
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self.max_bytes,
+                "entries": [
+                    {"ticker": ticker, "model": model_name, "version": entry.version, "size_bytes": entry.size_bytes}
+                    for (ticker, model_name), entry in self._entries.items()
+                ]
+            }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,114 @@
+"""
+Pooled persistence layer for the prediction API
+Long-lived PostgreSQL, Redis and MongoDB pools created at startup. Blocking
+drivers run on a bounded thread pool so handlers never stall the event loop.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import redis.asyncio as aioredis
+from psycopg2.pool import ThreadedConnectionPool
+from pymongo import MongoClient
+from prometheus_client import Gauge, Histogram
+
+from instrumentation import stage
+
+POSTGRES_DSN = dict(host="db", database="fintech", user="fintech", password="fintech")
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017/")
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+REDIS_POOL_MAX = int(os.getenv("REDIS_POOL_MAX", "50"))
+MONGO_POOL_MAX = int(os.getenv("MONGO_POOL_MAX", str(DB_WORKERS)))
+
+# Prometheus metrics
+DB_POOL_IN_USE = Gauge('db_pool_in_use', 'Connections or workers currently in use', ['store'])
+DB_POOL_SIZE = Gauge('db_pool_size', 'Configured pool capacity', ['store'])
+DB_POOL_WAIT = Histogram('db_pool_wait_seconds', 'Time spent waiting for a free database worker', ['store'])
+DB_OPERATION_LATENCY = Histogram('db_operation_latency_seconds', 'Database operation latency', ['store', 'operation'])
+
+
+class Persistence:
+    """Process-wide database pools and the thread pool that drives blocking drivers"""
+
+    def __init__(self, workers: int = DB_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.pg_pool = None
+        self.redis = None
+        self.mongo = None
+        self._in_use = {'postgres': 0, 'mongo': 0}
+        self._in_use_lock = threading.Lock()
+
+    def start(self):
+        """Create the pools; call once from the startup hook"""
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="db")
+
+        # One Postgres connection per worker, so getconn() never runs dry
+        self.pg_pool = ThreadedConnectionPool(POSTGRES_POOL_MIN, self.workers, **POSTGRES_DSN)
+        self.redis = aioredis.Redis(
+            connection_pool=aioredis.ConnectionPool.from_url(
+                REDIS_URL, max_connections=REDIS_POOL_MAX, decode_responses=True
+            )
+        )
+        self.mongo = MongoClient(MONGO_URL, maxPoolSize=MONGO_POOL_MAX)
+
+        DB_POOL_SIZE.labels(store='postgres').set(self.workers)
+        DB_POOL_SIZE.labels(store='mongo').set(MONGO_POOL_MAX)
+        DB_POOL_SIZE.labels(store='redis').set(REDIS_POOL_MAX)
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+        if self.mongo is not None:
+            self.mongo.close()
+        if self.pg_pool is not None:
+            self.pg_pool.closeall()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    @contextmanager
+    def pg_connection(self):
+        """Borrow a pooled Postgres connection; commits on success, rolls back on error"""
+        conn = self.pg_pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pg_pool.putconn(conn)
+
+    def mongo_collection(self, name: str, database: str = 'fintech'):
+        return self.mongo[database][name]
+
+    async def run(self, store: str, fn, *args):
+        """Run a blocking database call on the bounded worker pool"""
+        loop = asyncio.get_running_loop()
+        queued_at = time.time()
+
+        def call():
+            started_at = time.time()
+            DB_POOL_WAIT.labels(store=store).observe(started_at - queued_at)
+            with self._in_use_lock:
+                self._in_use[store] = self._in_use.get(store, 0) + 1
+                DB_POOL_IN_USE.labels(store=store).set(self._in_use[store])
+            try:
+                return fn(*args)
+            finally:
+                with self._in_use_lock:
+                    self._in_use[store] -= 1
+                    DB_POOL_IN_USE.labels(store=store).set(self._in_use[store])
+                DB_OPERATION_LATENCY.labels(store=store, operation=fn.__name__).observe(time.time() - started_at)
+
+        with stage(store):
+            return await loop.run_in_executor(self.executor, call)
+
+
+persistence = Persistence()
@@ -0,0 +1,82 @@
+"""
+Fast JSON responses for large payloads
+Uses orjson (with native NumPy support) when it is installed and falls back
+to the standard library encoder otherwise
+"""
+import json
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+# Streamed media types: gzip would buffer them instead of passing each chunk on
+UNCOMPRESSED_MEDIA_TYPES = ('application/x-ndjson', 'text/event-stream')
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that serializes NumPy arrays without per-element Python conversion"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def epoch_seconds(dates):
+    """DatetimeIndex / datetime64 / 'YYYY-MM-DD' strings -> int64 Unix seconds"""
+    return np.asarray(dates, dtype='datetime64[s]').astype(np.int64)
+
+
+def frame_columns(df, columns):
+    """Columnar payload for an OHLCV frame: epoch dates plus one array per field"""
+    payload = {"dates": epoch_seconds(df.index.values)}
+    for name, column in columns.items():
+        values = df[column].to_numpy()
+        payload[name] = values.astype(np.int64) if column == 'Volume' else values.astype(np.float64)
+    return payload
+
+
+class StreamingPassthroughMiddleware:
+    """Keep streamed responses out of GZipMiddleware (install it inside the gzip middleware)
+
+    Marks responses of UNCOMPRESSED_MEDIA_TYPES as Content-Encoding: identity;
+    the gzip middleware forwards responses that already declare an encoding
+    untouched, chunk by chunk.
+    """
+
+    def __init__(self, app, media_types=UNCOMPRESSED_MEDIA_TYPES):
+        self.app = app
+        self.media_types = tuple(t.encode('latin-1') for t in media_types)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                headers = dict(message.get('headers', []))
+                content_type = headers.get(b'content-type', b'').split(b';')[0].strip()
+                if content_type in self.media_types and b'content-encoding' not in headers:
+                    message = {**message, 'headers': [*message.get('headers', []), (b'content-encoding', b'identity')]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
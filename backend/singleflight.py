@@ -0,0 +1,142 @@
+"""
+Single-flight request coalescing
+Concurrent identical computations share one in-flight result: in-process via a
+shared future, and across replicas via a short Redis lock plus a result key
+that late arrivals poll instead of recomputing
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from prometheus_client import Counter, Histogram
+
+from persistence import persistence
+
+SINGLEFLIGHT_LOCK_MS = int(os.getenv("SINGLEFLIGHT_LOCK_MS", "30000"))
+SINGLEFLIGHT_POLL_MS = int(os.getenv("SINGLEFLIGHT_POLL_MS", "50"))
+
+# Prometheus metrics
+SINGLEFLIGHT_COALESCED = Counter(
+    'singleflight_coalesced_total', 'Requests served by another in-flight computation', ['flight', 'scope']
+)
+SINGLEFLIGHT_LEADERS = Counter('singleflight_leader_total', 'Computations actually executed', ['flight'])
+SINGLEFLIGHT_WAIT = Histogram('singleflight_wait_seconds', 'Time followers waited for the leader result', ['flight', 'scope'])
+
+# Delete the lock only if we still own it
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _LeaderCancelled(Exception):
+    """The local leader was cancelled (e.g. client disconnect): a follower takes over"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key
+
+    `compute` must be an async callable returning a JSON-serializable result,
+    which is what followers on other replicas receive.
+    """
+
+    def __init__(self, name: str, lock_ms: int = SINGLEFLIGHT_LOCK_MS, poll_ms: int = SINGLEFLIGHT_POLL_MS):
+        self.name = name
+        self.lock_ms = lock_ms
+        self.poll_seconds = poll_ms / 1000.0
+        self._inflight = {}
+
+    def _keys(self, key):
+        return f"singleflight:{self.name}:{key}:lock", f"singleflight:{self.name}:{key}:result"
+
+    async def do(self, key: str, compute):
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            SINGLEFLIGHT_COALESCED.labels(flight=self.name, scope='local').inc()
+            start_time = time.time()
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # The first follower to wake up leads; the others follow it
+                inflight = self._inflight.get(key)
+            finally:
+                SINGLEFLIGHT_WAIT.labels(flight=self.name, scope='local').observe(time.time() - start_time)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting: mark a failure as retrieved to avoid asyncio warnings
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._distributed(key, compute)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only this caller went away: hand the computation to a waiting follower
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _distributed(self, key, compute):
+        redis_client = persistence.redis
+        lock_key, result_key = self._keys(key)
+        token = uuid.uuid4().hex
+
+        try:
+            acquired = await redis_client.set(lock_key, token, nx=True, px=self.lock_ms)
+        except Exception as e:
+            print(f"Single-flight lock unavailable for {key}: {e}")
+            return await self._lead(key, compute)
+
+        if not acquired:
+            result = await self._follow(lock_key, result_key)
+            if result is not None:
+                return json.loads(result)
+            # Leader failed or timed out without publishing: compute ourselves
+            return await self._lead(key, compute)
+
+        try:
+            result = await self._lead(key, compute)
+            try:
+                await redis_client.set(result_key, json.dumps(result), px=self.lock_ms)
+            except Exception as e:
+                # Remote followers recompute once the lock is released; this result still stands
+                print(f"Single-flight result publish failed for {key}: {e}")
+            return result
+        finally:
+            try:
+                await redis_client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                print(f"Single-flight lock release failed for {key}: {e}")
+
+    async def _lead(self, key, compute):
+        SINGLEFLIGHT_LEADERS.labels(flight=self.name).inc()
+        return await compute()
+
+    async def _follow(self, lock_key, result_key):
+        """Poll for the leader's result until it appears or the lock goes away"""
+        redis_client = persistence.redis
+        start_time = time.time()
+        deadline = start_time + self.lock_ms / 1000.0
+        try:
+            while time.time() < deadline:
+                result, locked = await redis_client.mget(result_key, lock_key)
+                if result is not None:
+                    SINGLEFLIGHT_COALESCED.labels(flight=self.name, scope='redis').inc()
+                    return result
+                if locked is None:
+                    return None
+                await asyncio.sleep(self.poll_seconds)
+        except Exception as e:
+            print(f"Single-flight wait failed for {lock_key}: {e}")
+        finally:
+            SINGLEFLIGHT_WAIT.labels(flight=self.name, scope='redis').observe(time.time() - start_time)
+        return None
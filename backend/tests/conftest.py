@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules are imported flat from /app, with jupyter/scripts mounted at /app/scripts
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, os.path.join(BACKEND_DIR, '..', 'jupyter'))
@@ -0,0 +1,60 @@
+"""LTTB downsampling: endpoints, output size and OHLCV aggregation"""
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from downsampling import downsample_frame, downsample_series, lttb_indices  # noqa: E402
+
+
+@pytest.mark.parametrize('n, max_points', [(10, 3), (1000, 50), (1001, 200), (252, 251)])
+def test_keeps_both_endpoints_and_exactly_max_points(n, max_points):
+    y = np.sin(np.linspace(0, 20, n)) + np.linspace(0, 1, n)
+
+    indices = lttb_indices(y, max_points)
+
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize('max_points', [100, 500])
+def test_series_that_already_fit_are_returned_whole(max_points):
+    assert lttb_indices(np.arange(100.0), max_points).tolist() == list(range(100))
+
+
+def test_keeps_an_isolated_spike():
+    y = np.zeros(1000)
+    y[437] = 50.0
+
+    assert 437 in lttb_indices(y, 20)
+
+
+def test_frame_rows_cover_the_extremes_and_volume_of_the_bars_they_replace():
+    n = 300
+    close = np.linspace(100, 130, n)
+    df = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                       'Volume': np.full(n, 10, dtype=np.int64)},
+                      index=pd.bdate_range('2024-01-02', periods=n))
+    df.iloc[123, df.columns.get_loc('High')] = 999.0
+    df.iloc[200, df.columns.get_loc('Low')] = -5.0
+
+    result = downsample_frame(df, 30)
+
+    assert len(result) == 30
+    assert result.index[0] == df.index[0] and result.index[-1] == df.index[-1]
+    assert result['High'].max() == 999.0
+    assert result['Low'].min() == -5.0
+    assert result['Volume'].sum() == df['Volume'].sum()
+
+
+def test_series_labels_follow_their_values():
+    values = [float(v) for v in np.cos(np.linspace(0, 6, 365))]
+    labels = [f'day-{i}' for i in range(365)]
+
+    kept_values, kept_labels = downsample_series(values, labels, 40)
+
+    assert len(kept_values) == len(kept_labels) == 40
+    assert kept_labels[0] == 'day-0' and kept_labels[-1] == 'day-364'
+    assert all(values[int(label.split('-')[1])] == value for value, label in zip(kept_values, kept_labels))
+    assert downsample_series(values, labels, None) == (values, labels)
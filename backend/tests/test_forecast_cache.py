@@ -0,0 +1,88 @@
+"""Trajectory prefix reuse in forecast_cache.get_trajectory"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+pytest.importorskip('prometheus_client')
+
+from forecast_cache import get_trajectory  # noqa: E402
+
+
+class FakeRollout:
+    """Exact rollout: each step adds one to the previous value"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, entry, closes, steps):
+        self.calls.append((len(closes), steps))
+        return closes[-1] + np.arange(1, steps + 1)
+
+
+def bars(last_close=100.0, days=30):
+    index = pd.bdate_range('2024-01-02', periods=days)
+    return pd.DataFrame({'Close': np.linspace(last_close - days + 1, last_close, days)}, index=index)
+
+
+def entry():
+    return SimpleNamespace(model_name='lstm', extras={})
+
+
+def test_shorter_horizon_is_served_from_the_cached_prefix():
+    model, df, rollout = entry(), bars(), FakeRollout()
+
+    long, computed = asyncio.run(get_trajectory(model, df, 10, rollout))
+    short, computed_again = asyncio.run(get_trajectory(model, df, 4, rollout))
+
+    assert (computed, computed_again) == (10, 0)
+    assert rollout.calls == [(30, 10)]
+    np.testing.assert_array_equal(short, long[:4])
+
+
+def test_longer_horizon_rolls_only_the_missing_suffix():
+    model, df, rollout = entry(), bars(), FakeRollout()
+
+    asyncio.run(get_trajectory(model, df, 4, rollout))
+    extended, computed = asyncio.run(get_trajectory(model, df, 10, rollout))
+    direct, _ = asyncio.run(get_trajectory(entry(), df, 10, FakeRollout()))
+
+    assert computed == 6
+    assert rollout.calls == [(30, 4), (34, 6)]
+    np.testing.assert_array_equal(extended, direct)
+
+
+def test_without_extend_longer_horizons_roll_from_history():
+    model, df, rollout = entry(), bars(), FakeRollout()
+
+    asyncio.run(get_trajectory(model, df, 4, rollout, extend=False))
+    trajectory, computed = asyncio.run(get_trajectory(model, df, 10, rollout, extend=False))
+    prefix, computed_again = asyncio.run(get_trajectory(model, df, 7, rollout, extend=False))
+
+    assert (computed, computed_again) == (10, 0)
+    assert rollout.calls == [(30, 4), (30, 10)]
+    np.testing.assert_array_equal(prefix, trajectory[:7])
+
+
+def test_new_bar_invalidates_the_trajectory():
+    model, rollout = entry(), FakeRollout()
+
+    asyncio.run(get_trajectory(model, bars(100.0), 10, rollout))
+    trajectory, computed = asyncio.run(get_trajectory(model, bars(101.0), 5, rollout))
+
+    assert computed == 5
+    assert trajectory[0] == pytest.approx(102.0)
+
+
+def test_concurrent_requests_share_one_rollout():
+    model, df, rollout = entry(), bars(), FakeRollout()
+
+    async def both():
+        return await asyncio.gather(get_trajectory(model, df, 8, rollout), get_trajectory(model, df, 8, rollout))
+
+    (first, _), (second, _) = asyncio.run(both())
+
+    assert rollout.calls == [(30, 8)]
+    np.testing.assert_array_equal(first, second)
@@ -0,0 +1,62 @@
+"""Model catalog lookups: disk misses, the negative cache and ticker validation"""
+import asyncio
+import os
+import pickle
+
+import pytest
+
+pytest.importorskip('prometheus_client')
+
+from model_catalog import ModelCatalog  # noqa: E402
+
+
+def write_model(models_dir, ticker, model_name='lstm', metrics=None):
+    ticker_dir = os.path.join(models_dir, ticker)
+    os.makedirs(ticker_dir, exist_ok=True)
+    prefix = os.path.join(ticker_dir, f'{model_name}_{ticker.lower()}')
+    for suffix, payload in (('model.h5', b'weights'), ('scaler.pkl', pickle.dumps({}))):
+        with open(f'{prefix}_{suffix}', 'wb') as f:
+            f.write(payload)
+    with open(f'{prefix}_metrics.pkl', 'wb') as f:
+        pickle.dump(metrics or {'mape': 1.5}, f)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ModelCatalog(models_dir=str(tmp_path / 'models'), manifest_path=str(tmp_path / 'catalog.json'),
+                        global_dir=str(tmp_path / 'models' / '_global'), global_mode='off',
+                        negative_ttl=60, negative_max=3)
+
+
+def test_models_trained_after_the_last_poll_are_found_on_disk(catalog):
+    write_model(catalog.models_dir, 'TSLA', metrics={'mape': 2.5})
+
+    models = asyncio.run(catalog.models('TSLA'))
+
+    assert list(models) == ['lstm']
+    assert models['lstm']['metrics'] == {'mape': 2.5}
+    assert catalog.tickers() == ['TSLA']
+
+
+def test_misses_are_remembered_until_the_ttl(catalog):
+    assert asyncio.run(catalog.models('AAPL')) is None
+    write_model(catalog.models_dir, 'AAPL')
+
+    assert asyncio.run(catalog.models('AAPL')) is None  # still negative-cached
+    catalog._negative['AAPL'] -= 120
+    assert list(asyncio.run(catalog.models('AAPL'))) == ['lstm']
+
+
+def test_negative_cache_is_bounded(catalog):
+    for index in range(10):
+        assert asyncio.run(catalog.models(f'NOPE{index}')) is None
+
+    assert list(catalog._negative) == ['NOPE7', 'NOPE8', 'NOPE9']
+
+
+@pytest.mark.parametrize('ticker', ['..', '../etc', 'TSLA/../AAPL', '.hidden', '', 'A' * 40])
+def test_names_that_are_not_tickers_never_touch_the_disk(catalog, ticker, monkeypatch):
+    monkeypatch.setattr(catalog, '_index_from_disk', lambda *args: pytest.fail('filesystem lookup'))
+
+    assert asyncio.run(catalog.models(ticker)) is None
+    assert ticker not in catalog._negative
@@ -0,0 +1,195 @@
+"""Single-flight coalescing: local followers, replicas sharing Redis, failures"""
+import asyncio
+
+import pytest
+
+for module in ('prometheus_client', 'redis', 'psycopg2', 'pymongo', 'starlette'):
+    pytest.importorskip(module)
+
+import singleflight  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+
+class FakeRedis:
+    """The few Redis calls single-flight makes, on a dict shared by 'replicas'"""
+
+    def __init__(self, down=False, fail_publish=False):
+        self.data = {}
+        self.down = down
+        self.fail_publish = fail_publish
+
+    async def set(self, key, value, nx=False, px=None):
+        if self.down or (self.fail_publish and key.endswith(':result')):
+            raise ConnectionError('redis unavailable')
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+class Computation:
+    """Counts calls; blocks until released so callers can pile up"""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result if result is not None else {'price': 1.0}
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(singleflight.persistence, 'redis', client)
+    return client
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_local_followers_share_one_computation(redis_client):
+    async def scenario():
+        flight, compute = SingleFlight('test'), Computation()
+        tasks = [asyncio.create_task(flight.do('k', compute)) for _ in range(5)]
+        await settle()
+        compute.release.set()
+        results = await asyncio.gather(*tasks)
+        return compute.calls, results
+
+    calls, results = asyncio.run(scenario())
+
+    assert calls == 1
+    assert results == [{'price': 1.0}] * 5
+
+
+def test_leader_failure_reaches_local_followers_and_clears_the_key(redis_client):
+    async def scenario():
+        flight, failing = SingleFlight('test'), Computation(error=ValueError('model missing'))
+        tasks = [asyncio.create_task(flight.do('k', failing)) for _ in range(3)]
+        await settle()
+        failing.release.set()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+        retry = Computation()
+        retry.release.set()
+        retried = await flight.do('k', retry)
+        return failing.calls, outcomes, retried, redis_client.data
+
+    calls, outcomes, retried, data = asyncio.run(scenario())
+
+    assert calls == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert retried == {'price': 1.0}
+    assert not any(key.endswith(':lock') for key in data)
+
+
+def test_cancelled_leader_hands_over_to_a_follower(redis_client):
+    async def scenario():
+        flight, compute = SingleFlight('test'), Computation()
+        leader = asyncio.create_task(flight.do('k', compute))
+        await settle()
+        followers = [asyncio.create_task(flight.do('k', compute)) for _ in range(2)]
+        await settle()
+
+        leader.cancel()  # e.g. the leader's client disconnected
+        await settle()
+        compute.release.set()
+        results = await asyncio.gather(*followers)
+        return compute.calls, results, leader
+
+    calls, results, leader = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    assert calls == 2  # the cancelled attempt, then one follower taking over
+    assert results == [{'price': 1.0}] * 2
+
+
+def test_replica_follower_reads_the_published_result(redis_client):
+    async def scenario():
+        replica_a, replica_b = SingleFlight('test', poll_ms=1), SingleFlight('test', poll_ms=1)
+        compute = Computation()
+        leader = asyncio.create_task(replica_a.do('k', compute))
+        await settle()
+        follower = asyncio.create_task(replica_b.do('k', compute))
+        await asyncio.sleep(0.01)
+        compute.release.set()
+        results = await leader, await follower
+        return (compute.calls,) + results
+
+    calls, leader_result, follower_result = asyncio.run(scenario())
+
+    assert calls == 1
+    assert leader_result == follower_result == {'price': 1.0}
+
+
+def test_replica_follower_recomputes_when_the_leader_fails(redis_client):
+    async def scenario():
+        replica_a, replica_b = SingleFlight('test', poll_ms=1), SingleFlight('test', poll_ms=1)
+        failing, fallback = Computation(error=RuntimeError('boom')), Computation()
+        fallback.release.set()
+        leader = asyncio.create_task(replica_a.do('k', failing))
+        await settle()
+        follower = asyncio.create_task(replica_b.do('k', fallback))
+        await asyncio.sleep(0.01)
+        failing.release.set()
+        with pytest.raises(RuntimeError):
+            await leader
+        result = await follower
+        return fallback.calls, result
+
+    calls, result = asyncio.run(scenario())
+
+    assert calls == 1
+    assert result == {'price': 1.0}
+
+
+def test_publish_failure_still_returns_the_computed_result(monkeypatch):
+    monkeypatch.setattr(singleflight.persistence, 'redis', FakeRedis(fail_publish=True))
+
+    async def scenario():
+        flight, compute = SingleFlight('test'), Computation()
+        tasks = [asyncio.create_task(flight.do('k', compute)) for _ in range(3)]
+        await settle()
+        compute.release.set()
+        results = await asyncio.gather(*tasks)
+        return compute.calls, results
+
+    calls, results = asyncio.run(scenario())
+
+    assert calls == 1
+    assert results == [{'price': 1.0}] * 3
+
+
+def test_redis_unavailable_still_coalesces_locally(monkeypatch):
+    monkeypatch.setattr(singleflight.persistence, 'redis', FakeRedis(down=True))
+
+    async def scenario():
+        flight, compute = SingleFlight('test'), Computation()
+        tasks = [asyncio.create_task(flight.do('k', compute)) for _ in range(3)]
+        await settle()
+        compute.release.set()
+        results = await asyncio.gather(*tasks)
+        return compute.calls, results
+
+    calls, results = asyncio.run(scenario())
+
+    assert calls == 1
+    assert results == [{'price': 1.0}] * 3
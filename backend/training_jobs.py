@@ -0,0 +1,445 @@
+"""
+Managed training jobs
+POST /train/{ticker} enqueues a job in PostgreSQL; a fixed pool of workers
+sized to the CPU count runs train_multi_company.py as capped, low-priority
+subprocesses with output captured to a log file and per-epoch progress
+written by a Keras callback
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+from psycopg2.extras import Json, RealDictCursor
+from prometheus_client import Counter, Gauge, Histogram
+
+from model_registry import MODELS_DIR
+from persistence import persistence
+
+TRAINING_SCRIPT = os.getenv("TRAINING_SCRIPT", "/app/scripts/stock_prediction/train_multi_company.py")
+TRAINING_JOBS_DIR = os.getenv("TRAINING_JOBS_DIR", os.path.join(MODELS_DIR, ".jobs"))
+# TensorFlow threads per job; workers default to the cores left after one is kept for the API
+TRAINING_THREADS_PER_JOB = int(os.getenv("TRAINING_THREADS_PER_JOB", "2"))
+TRAINING_WORKERS = int(os.getenv(
+    "TRAINING_WORKERS", str(max(1, ((os.cpu_count() or 2) - 1) // TRAINING_THREADS_PER_JOB))
+))
+TRAINING_NICE = int(os.getenv("TRAINING_NICE", "10"))
+TRAINING_POLL_SECONDS = int(os.getenv("TRAINING_POLL_SECONDS", "5"))
+TRAINING_CANCEL_GRACE_SECONDS = int(os.getenv("TRAINING_CANCEL_GRACE_SECONDS", "10"))
+# Running jobs are owned by one API instance, which refreshes their heartbeat;
+# jobs whose owner stopped heartbeating are requeued by the other instances
+TRAINING_WORKER_ID = os.getenv("TRAINING_WORKER_ID", socket.gethostname())
+TRAINING_HEARTBEAT_SECONDS = int(os.getenv("TRAINING_HEARTBEAT_SECONDS", "30"))
+TRAINING_STALE_SECONDS = int(os.getenv("TRAINING_STALE_SECONDS", str(TRAINING_HEARTBEAT_SECONDS * 4)))
+
+MODEL_CHOICES = ('LSTM', 'GRU', 'TRANSFORMER', 'ALL')
+
+# Prometheus metrics
+TRAINING_JOBS = Counter('training_jobs_total', 'Training jobs by final status', ['status'])
+TRAINING_JOBS_DEDUPLICATED = Counter('training_jobs_deduplicated_total', 'Submissions answered with an identical pending job')
+TRAINING_JOBS_QUEUED = Gauge('training_jobs_queued', 'Training jobs waiting for a worker')
+TRAINING_JOBS_RUNNING = Gauge('training_jobs_running', 'Training jobs currently running')
+TRAINING_JOB_DURATION = Histogram(
+    'training_job_duration_seconds', 'Wall time of finished training jobs',
+    buckets=(60, 300, 600, 1200, 1800, 3600, 7200, 14400)
+)
+
+
+def create_job_tables(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS training_jobs (
+            id SERIAL PRIMARY KEY,
+            ticker VARCHAR(10) NOT NULL,
+            model VARCHAR(20) NOT NULL,
+            start_date DATE NOT NULL,
+            epochs INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            pid INTEGER,
+            return_code INTEGER,
+            error TEXT,
+            progress JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    cur.execute("ALTER TABLE training_jobs ADD COLUMN IF NOT EXISTS worker VARCHAR(255)")
+    cur.execute("ALTER TABLE training_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP")
+    # At most one pending job per identical request
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS training_jobs_pending_unique
+        ON training_jobs (ticker, model, start_date, epochs)
+        WHERE status IN ('queued', 'running')
+    """)
+    cur.close()
+
+
+def _fetch_one(sql, params=()):
+    with persistence.pg_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+
+def _fetch_all(sql, params=()):
+    with persistence.pg_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+
+def insert_job(ticker, model, start_date, epochs):
+    """Insert a queued job; returns (job, created) and the pending twin when one exists"""
+    job = _fetch_one("""
+        INSERT INTO training_jobs (ticker, model, start_date, epochs)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (ticker, model, start_date, epochs) WHERE status IN ('queued', 'running')
+        DO NOTHING
+        RETURNING *
+    """, (ticker, model, start_date, epochs))
+    if job is not None:
+        return job, True
+    return _fetch_one("""
+        SELECT * FROM training_jobs
+        WHERE ticker = %s AND model = %s AND start_date = %s AND epochs = %s AND status IN ('queued', 'running')
+    """, (ticker, model, start_date, epochs)), False
+
+
+def claim_job(worker=TRAINING_WORKER_ID):
+    """Mark the oldest queued job running, skipping tickers already being trained
+
+    Claims for one ticker are serialized with a transaction-scoped advisory
+    lock, held until the 'running' row is committed, so two workers can never
+    start different jobs for the same ticker at once.
+    """
+    with persistence.pg_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT id, ticker FROM training_jobs
+            WHERE status = 'queued'
+              AND ticker NOT IN (SELECT ticker FROM training_jobs WHERE status = 'running')
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+        """)
+        candidates = cur.fetchall()
+        job = None
+        claimed_tickers = set()
+        for candidate in candidates:
+            ticker = candidate['ticker']
+            if ticker in claimed_tickers:
+                continue
+            claimed_tickers.add(ticker)
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (ticker,))
+            if not cur.fetchone()['locked']:
+                continue
+            # Re-check under the lock: a claim committed since our first read is visible now
+            cur.execute("SELECT 1 FROM training_jobs WHERE ticker = %s AND status = 'running' LIMIT 1", (ticker,))
+            if cur.fetchone() is not None:
+                continue
+            cur.execute("""
+                UPDATE training_jobs
+                SET status = 'running', started_at = NOW(), worker = %s, heartbeat_at = NOW()
+                WHERE id = %s
+                RETURNING *
+            """, (worker, candidate['id']))
+            job = cur.fetchone()
+            break
+        cur.close()
+    return job
+
+
+def set_job_pid(job_id, pid):
+    _fetch_one("UPDATE training_jobs SET pid = %s WHERE id = %s RETURNING id", (pid, job_id))
+
+
+def finish_job(job_id, status, return_code=None, error=None, progress=None):
+    return _fetch_one("""
+        UPDATE training_jobs
+        SET status = %s, return_code = %s, error = %s, progress = %s, finished_at = NOW()
+        WHERE id = %s
+        RETURNING *
+    """, (status, return_code, error, Json(progress) if progress is not None else None, job_id))
+
+
+def cancel_queued_job(job_id):
+    return _fetch_one("""
+        UPDATE training_jobs SET status = 'cancelled', finished_at = NOW()
+        WHERE id = %s AND status = 'queued'
+        RETURNING *
+    """, (job_id,))
+
+
+def heartbeat_jobs(worker=TRAINING_WORKER_ID):
+    """Mark this instance's running jobs as alive"""
+    return _fetch_all("""
+        UPDATE training_jobs SET heartbeat_at = NOW()
+        WHERE status = 'running' AND worker = %s
+        RETURNING id
+    """, (worker,))
+
+
+def requeue_orphaned_jobs(worker=TRAINING_WORKER_ID, include_own=False):
+    """Running jobs whose owner is gone go back to the queue
+
+    Owners are other instances that stopped heartbeating, plus this instance
+    itself with include_own (at startup, its previous process is gone).
+    """
+    return _fetch_all("""
+        UPDATE training_jobs
+        SET status = 'queued', pid = NULL, started_at = NULL, worker = NULL, heartbeat_at = NULL
+        WHERE status = 'running'
+          AND ((%s AND worker = %s)
+               OR worker IS NULL
+               OR heartbeat_at IS NULL
+               OR heartbeat_at < NOW() - make_interval(secs => %s))
+        RETURNING id
+    """, (include_own, worker, TRAINING_STALE_SECONDS))
+
+
+def count_pending():
+    return _fetch_all("""
+        SELECT status, COUNT(*) AS count FROM training_jobs
+        WHERE status IN ('queued', 'running')
+        GROUP BY status
+    """)
+
+
+def get_job(job_id):
+    return _fetch_one("SELECT * FROM training_jobs WHERE id = %s", (job_id,))
+
+
+def list_jobs(status, limit):
+    if status:
+        return _fetch_all(
+            "SELECT * FROM training_jobs WHERE status = %s ORDER BY id DESC LIMIT %s", (status, limit)
+        )
+    return _fetch_all("SELECT * FROM training_jobs ORDER BY id DESC LIMIT %s", (limit,))
+
+
+class TrainingJobQueue:
+    """Persistent training queue drained by a bounded pool of subprocess workers"""
+
+    def __init__(self, workers=TRAINING_WORKERS, jobs_dir=TRAINING_JOBS_DIR, on_success=None):
+        self.workers = workers
+        self.jobs_dir = jobs_dir
+        self.on_success = on_success   # async callback(job) after artifacts are written
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._processes = {}           # job id -> running subprocess
+        self._cancelled = set()
+
+    def log_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.log")
+
+    def progress_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.progress.json")
+
+    def read_progress(self, job_id):
+        """Latest progress written by the training callback, or None"""
+        try:
+            with open(self.progress_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def describe(self, job):
+        """Job row as JSON, with live progress while it runs"""
+        result = {k: (v.isoformat() if hasattr(v, 'isoformat') else v) for k, v in job.items()}
+        if job['status'] == 'running':
+            result['progress'] = self.read_progress(job['id'])
+        return result
+
+    def read_log(self, job_id, lines=100):
+        """Last `lines` lines of a job's captured output"""
+        try:
+            with open(self.log_path(job_id), 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - lines * 512))
+                return f.read().decode('utf-8', errors='replace').splitlines()[-lines:]
+        except OSError:
+            return None
+
+    async def submit(self, ticker, model='ALL', start_date='2018-01-01', epochs=20):
+        """Queue a job, or return the identical job that is already pending"""
+        job, created = await persistence.run('postgres', insert_job, ticker, model, start_date, epochs)
+        if created:
+            self._wakeup.set()
+        else:
+            TRAINING_JOBS_DEDUPLICATED.inc()
+        await self._update_gauges()
+        return job, created
+
+    async def cancel(self, job_id):
+        """Cancel a queued job, or terminate a running one; returns the job or None"""
+        job = await persistence.run('postgres', cancel_queued_job, job_id)
+        if job is not None:
+            TRAINING_JOBS.labels(status='cancelled').inc()
+            await self._update_gauges()
+            return job
+
+        process = self._processes.get(job_id)
+        if process is None:
+            return None
+        self._cancelled.add(job_id)
+        self._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), TRAINING_CANCEL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            self._signal(process, signal.SIGKILL)
+        return await persistence.run('postgres', get_job, job_id)
+
+    @staticmethod
+    def _signal(process, sig):
+        # Children run in their own session: signal the whole group
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _command(self, job):
+        # Lower the priority with nice(1): no preexec_fn in a process with live thread pools
+        return [
+            "nice", "-n", str(TRAINING_NICE),
+            sys.executable, TRAINING_SCRIPT,
+            "--ticker", job['ticker'],
+            "--model", job['model'],
+            "--start", str(job['start_date']),
+            "--epochs", str(job['epochs']),
+            "--progress-file", self.progress_path(job['id']),
+        ]
+
+    def _environment(self):
+        threads = str(TRAINING_THREADS_PER_JOB)
+        return {
+            **os.environ,
+            "TF_NUM_INTRAOP_THREADS": threads,
+            "TF_NUM_INTEROP_THREADS": "1",
+            "OMP_NUM_THREADS": threads,
+            "PYTHONUNBUFFERED": "1",
+            "MPLBACKEND": "Agg",
+        }
+
+    async def _run(self, job):
+        job_id = job['id']
+        started_at = time.time()
+        try:
+            with open(self.log_path(job_id), 'ab') as log:
+                # Output goes straight to the log file: no pipe for the child to fill up
+                process = await asyncio.create_subprocess_exec(
+                    *self._command(job),
+                    stdout=log, stderr=asyncio.subprocess.STDOUT, stdin=asyncio.subprocess.DEVNULL,
+                    env=self._environment(), start_new_session=True
+                )
+                self._processes[job_id] = process
+                await persistence.run('postgres', set_job_pid, job_id, process.pid)
+                return_code = await process.wait()
+        except asyncio.CancelledError:
+            process = self._processes.get(job_id)
+            if process is not None and process.returncode is None:
+                self._signal(process, signal.SIGKILL)
+            raise
+        except Exception as e:
+            return_code, error = None, str(e)
+        else:
+            error = None
+        finally:
+            self._processes.pop(job_id, None)
+
+        if job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            status = 'cancelled'
+        elif return_code == 0:
+            status = 'succeeded'
+        else:
+            status = 'failed'
+            error = error or f"Training exited with code {return_code}, see /train/jobs/{job_id}/log"
+
+        finished = await persistence.run(
+            'postgres', finish_job, job_id, status, return_code, error, self.read_progress(job_id)
+        )
+        TRAINING_JOBS.labels(status=status).inc()
+        TRAINING_JOB_DURATION.observe(time.time() - started_at)
+        print(f"Training job {job_id} ({job['ticker']} {job['model']}) {status}")
+
+        if status == 'succeeded' and self.on_success is not None:
+            try:
+                await self.on_success(finished)
+            except Exception as e:
+                print(f"Training job {job_id} post-processing failed: {e}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await persistence.run('postgres', claim_job)
+            except Exception as e:
+                print(f"Training queue claim failed: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), TRAINING_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._update_gauges()
+            await self._run(job)
+            await self._update_gauges()
+            # Another worker may be waiting for this ticker to finish
+            self._wakeup.set()
+
+    async def _heartbeat(self):
+        """Keep this instance's running jobs alive and take over jobs of instances that died"""
+        while True:
+            await asyncio.sleep(TRAINING_HEARTBEAT_SECONDS)
+            try:
+                await persistence.run('postgres', heartbeat_jobs)
+                orphaned = await persistence.run('postgres', requeue_orphaned_jobs)
+            except Exception as e:
+                print(f"Training queue heartbeat failed: {e}")
+                continue
+            if orphaned:
+                print(f"Requeued {len(orphaned)} training jobs of an unresponsive instance")
+                self._wakeup.set()
+
+    async def _update_gauges(self):
+        try:
+            counts = {row['status']: row['count'] for row in await persistence.run('postgres', count_pending)}
+        except Exception:
+            return
+        TRAINING_JOBS_QUEUED.set(counts.get('queued', 0))
+        TRAINING_JOBS_RUNNING.set(counts.get('running', 0))
+
+    async def start(self):
+        """Requeue jobs orphaned by a restart of this instance and start the workers"""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        orphaned = await persistence.run('postgres', requeue_orphaned_jobs, TRAINING_WORKER_ID, True)
+        if orphaned:
+            print(f"Requeued {len(orphaned)} interrupted training jobs")
+        await self._update_gauges()
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.ensure_future(self._heartbeat()))
+
+    async def stop(self):
+        """Stop the workers; running jobs are killed and requeued on the next start"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+training_jobs = TrainingJobQueue()
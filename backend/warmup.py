@@ -0,0 +1,128 @@
+"""
+Scheduled prediction warm-up
+After each trading session closes (and the final daily bar has settled),
+precompute the next-day and standard forecast predictions for every trained
+ticker so interactive traffic is served from the cache
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from market_calendar import EXCHANGE_TZ, next_bar_at
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_DELAY_MINUTES = int(os.getenv("WARMUP_DELAY_MINUTES", "10"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+# periods:period_type pairs precomputed for /predict/future
+WARMUP_FUTURE_HORIZONS = [
+    (int(periods), period_type)
+    for periods, period_type in (
+        item.split(":") for item in os.getenv("WARMUP_FUTURE_HORIZONS", "30:day,4:week,6:month,1:year").split(",")
+    )
+]
+
+# Prometheus metrics
+WARMUP_RUNS = Counter('warmup_runs_total', 'Prediction warm-up runs', ['status'])
+WARMUP_DURATION = Histogram(
+    'warmup_duration_seconds', 'Duration of a full warm-up run',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200)
+)
+WARMUP_PREDICTIONS = Counter('warmup_predictions_total', 'Predictions precomputed by the warm-up job', ['kind'])
+WARMUP_FAILURES = Counter('warmup_ticker_failures_total', 'Tickers that failed to warm up')
+WARMUP_LAST_SUCCESS = Gauge('warmup_last_success_timestamp_seconds', 'Unix time of the last successful warm-up')
+
+
+class WarmupScheduler:
+    """Runs `warm_ticker(ticker)` for every ticker once per session close
+
+    `tickers` returns the tickers to warm; `before_run` (optional) runs first,
+    e.g. to pull the final bars into memory.
+    """
+
+    def __init__(self, tickers, warm_ticker, before_run=None,
+                 delay_minutes=WARMUP_DELAY_MINUTES, concurrency=WARMUP_CONCURRENCY):
+        self.tickers = tickers
+        self.warm_ticker = warm_ticker
+        self.before_run = before_run
+        self.delay = timedelta(minutes=delay_minutes)
+        self.concurrency = concurrency
+        self.last_run = None
+        self._running = None
+        self._task = None
+
+    def next_run_at(self, now=None):
+        now = now or datetime.now(EXCHANGE_TZ)
+        return next_bar_at(now - self.delay) + self.delay
+
+    async def _warm_one(self, semaphore, ticker, summary):
+        async with semaphore:
+            try:
+                counts = await self.warm_ticker(ticker)
+                for kind, count in counts.items():
+                    WARMUP_PREDICTIONS.labels(kind=kind).inc(count)
+                    summary['predictions'][kind] = summary['predictions'].get(kind, 0) + count
+                summary['tickers'].append(ticker)
+            except Exception as e:
+                WARMUP_FAILURES.inc()
+                summary['failed'][ticker] = str(e)
+                print(f"Warm-up failed for {ticker}: {e}")
+
+    async def _run(self):
+        start_time = time.time()
+        summary = {
+            "started_at": datetime.now().isoformat(),
+            "tickers": [],
+            "failed": {},
+            "predictions": {}
+        }
+        try:
+            if self.before_run is not None:
+                await self.before_run()
+            semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*(self._warm_one(semaphore, t, summary) for t in self.tickers()))
+            WARMUP_RUNS.labels(status='failed' if summary['failed'] else 'success').inc()
+            if not summary['failed']:
+                WARMUP_LAST_SUCCESS.set(time.time())
+        except Exception as e:
+            WARMUP_RUNS.labels(status='error').inc()
+            summary['error'] = str(e)
+            print(f"Warm-up run failed: {e}")
+        finally:
+            summary['duration_seconds'] = round(time.time() - start_time, 3)
+            WARMUP_DURATION.observe(summary['duration_seconds'])
+            self.last_run = summary
+        print(f"Warm-up finished in {summary['duration_seconds']}s: {summary['predictions']}")
+        return summary
+
+    async def run(self):
+        """Warm every ticker now; concurrent callers share the run in progress"""
+        if self._running is None:
+            self._running = asyncio.ensure_future(self._run())
+            self._running.add_done_callback(lambda _: setattr(self, '_running', None))
+        return await asyncio.shield(self._running)
+
+    async def _loop(self, run_now):
+        if run_now:
+            await self.run()
+        while True:
+            run_at = self.next_run_at()
+            await asyncio.sleep(max(0.0, (run_at - datetime.now(EXCHANGE_TZ)).total_seconds()))
+            await self.run()
+
+    def start(self, run_now=WARMUP_ON_STARTUP):
+        """Schedule warm-ups after every session close; call from the startup hook"""
+        if WARMUP_ENABLED and self._task is None:
+            self._task = asyncio.ensure_future(self._loop(run_now))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
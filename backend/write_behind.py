@@ -0,0 +1,134 @@
+"""
+Write-behind pipeline for prediction records
+Request handlers enqueue fresh predictions and return immediately; a background
+task flushes them to PostgreSQL and MongoDB in batches
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import List
+
+from psycopg2.extras import execute_values
+from prometheus_client import Counter, Gauge, Histogram
+
+from persistence import persistence
+
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+
+# Prometheus metrics
+WRITE_BEHIND_QUEUE_DEPTH = Gauge('write_behind_queue_depth', 'Prediction records waiting to be written')
+WRITE_BEHIND_BATCH_SIZE_HIST = Histogram(
+    'write_behind_batch_size', 'Records per write-behind flush',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+WRITE_BEHIND_FLUSH_LATENCY = Histogram('write_behind_flush_latency_seconds', 'Write-behind flush latency', ['store'])
+WRITE_BEHIND_ENQUEUE_WAIT = Histogram('write_behind_enqueue_wait_seconds', 'Time handlers waited on a full queue')
+WRITE_BEHIND_WRITTEN = Counter('write_behind_records_written_total', 'Prediction records written', ['store'])
+WRITE_BEHIND_FAILED = Counter('write_behind_records_failed_total', 'Prediction records dropped after a failed flush', ['store'])
+
+
+def save_predictions_to_db(records: List[tuple]):
+    """Insert (prediction, timestamp) records into PostgreSQL with one multi-row INSERT"""
+    with persistence.pg_connection() as conn:
+        cur = conn.cursor()
+        execute_values(cur, """
+            INSERT INTO stock_predictions (symbol, model_name, prediction_date, predicted_price)
+            VALUES %s
+        """, [(p['symbol'], p['model'], p['prediction_date'], p['predicted_price']) for p, _ in records],
+            page_size=WRITE_BEHIND_BATCH_SIZE)
+        cur.close()
+
+
+def log_predictions_to_mongo(records: List[tuple]):
+    """Log (prediction, timestamp) records to MongoDB in one round trip"""
+    collection = persistence.mongo_collection('prediction_logs')
+    collection.insert_many(
+        [{**prediction, 'timestamp': timestamp, 'cached': False} for prediction, timestamp in records],
+        ordered=False
+    )
+
+
+class WriteBehindQueue:
+    """Bounded queue of prediction records flushed on size or time"""
+
+    def __init__(self, max_size=WRITE_BEHIND_MAX_QUEUE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_ms=WRITE_BEHIND_FLUSH_MS):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000.0
+        self.sinks = {'postgres': save_predictions_to_db, 'mongo': log_predictions_to_mongo}
+        self._queue = None
+        self._task = None
+
+    async def put(self, predictions: List[dict]):
+        """Enqueue predictions; waits (backpressure) while the queue is full"""
+        timestamp = datetime.now()
+        start_time = time.time()
+        for prediction in predictions:
+            await self._queue.put((prediction, timestamp))
+        WRITE_BEHIND_ENQUEUE_WAIT.observe(time.time() - start_time)
+        WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _next_batch(self):
+        # Block for the first record, then fill until batch_size or the flush deadline
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, store, batch):
+        start_time = time.time()
+        try:
+            await persistence.run(store, self.sinks[store], batch)
+            WRITE_BEHIND_WRITTEN.labels(store=store).inc(len(batch))
+        except Exception as e:
+            WRITE_BEHIND_FAILED.labels(store=store).inc(len(batch))
+            print(f"Write-behind flush to {store} failed ({len(batch)} records): {e}")
+        finally:
+            WRITE_BEHIND_FLUSH_LATENCY.labels(store=store).observe(time.time() - start_time)
+
+    async def flush(self, batch):
+        """Write one batch to every store concurrently"""
+        WRITE_BEHIND_BATCH_SIZE_HIST.observe(len(batch))
+        try:
+            await asyncio.gather(*(self._write(store, batch) for store in self.sinks))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self.flush(batch)
+
+    def start(self):
+        """Create the queue and start the flush task; call from the startup hook"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the flush task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+prediction_writer = WriteBehindQueue()
@@ -39,9 +39,13 @@ def get_stock_data(request):
     """Get historical stock data"""
     symbol = request.GET.get('symbol', 'TSLA')
     days = request.GET.get('days', 30)
+    max_points = request.GET.get('max_points')
 
     try:
-        response = requests.get(f"{FASTAPI_URL}/stock/{symbol}?days={days}")
+        params = {"days": days}
+        if max_points:
+            params["max_points"] = max_points
+        response = requests.get(f"{FASTAPI_URL}/stock/{symbol}", params=params)
         response.raise_for_status()
         data = response.json()
         return JsonResponse({"status": "success", "data": data})
@@ -86,17 +90,18 @@ def predict_future(request):
     model = request.GET.get('model', 'gru')
     periods = int(request.GET.get('periods', 30))
     period_type = request.GET.get('period_type', 'day')
+    max_points = request.GET.get('max_points')
 
     try:
-        response = requests.post(
-            f"{FASTAPI_URL}/predict/future",
-            params={
-                "ticker": ticker,
-                "model": model,
-                "periods": periods,
-                "period_type": period_type
-            }
-        )
+        params = {
+            "ticker": ticker,
+            "model": model,
+            "periods": periods,
+            "period_type": period_type
+        }
+        if max_points:
+            params["max_points"] = max_points
+        response = requests.post(f"{FASTAPI_URL}/predict/future", params=params)
         response.raise_for_status()
         predictions = response.json()
         return JsonResponse({"status": "success", "data": predictions})
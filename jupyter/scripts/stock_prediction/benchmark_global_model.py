@@ -0,0 +1,158 @@
+"""
+Global Model vs Per-Ticker Zoo Benchmark
+Trains the same universe both ways into a scratch directory (the served
+artifacts are not touched) and compares total training time, artifact size,
+parameter count, test MAPE and the memory needed to keep every model
+resident for serving
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from market_data_store import MarketDataStore
+from train_global_model import MODEL_TYPES, GlobalModelTrainer
+from train_multi_company import StockModelTrainer
+
+
+def resident_mb():
+    """Resident set size of this process"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _serving_memory(model_paths):
+    """RSS added by loading every model, measured in a fresh process"""
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    # Initialize the runtime first so only the models are counted
+    tf.constant(0.0).numpy()
+    baseline = resident_mb()
+    models = [load_model(path, compile=False) for path in model_paths]
+    for model in models:
+        inputs = [np.zeros((1,) + tuple(i.shape[1:]), dtype=i.dtype.as_numpy_dtype) for i in model.inputs]
+        model.predict_on_batch(inputs if len(inputs) > 1 else inputs[0])
+    return resident_mb() - baseline
+
+
+def serving_memory(model_paths):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(_serving_memory, (model_paths,))
+
+
+def train_zoo(tickers, models, options, output_dir, store):
+    """One model per (ticker, architecture); returns (seconds, mean MAPE, parameters)"""
+    mapes, parameters = [], 0
+    start_time = time.time()
+    for ticker in tickers:
+        for model_type in models:
+            trainer = StockModelTrainer(ticker, model_type, options['start'], options['end'], store=store)
+            trainer.model_dir = os.path.join(output_dir, ticker)
+            os.makedirs(trainer.model_dir, exist_ok=True)
+            if not trainer.run(epochs=options['epochs'], batch_size=options['zoo_batch_size']):
+                raise RuntimeError(f"Zoo training failed for {ticker} {model_type}")
+            mapes.append(trainer.metrics['mape'])
+            parameters += trainer.model.count_params()
+    return time.time() - start_time, float(np.mean(mapes)), parameters
+
+
+def train_global(tickers, models, options, output_dir, store):
+    """One shared model per architecture; returns (seconds, mean MAPE, parameters)"""
+    mapes, parameters = [], 0
+    start_time = time.time()
+    for model_type in models:
+        trainer = GlobalModelTrainer(tickers, model_type, options['start'], options['end'],
+                                     embedding=options['embedding'], store=store, output_dir=output_dir)
+        if not trainer.run(epochs=options['epochs'], batch_size=options['global_batch_size']):
+            raise RuntimeError(f"Global training failed for {model_type}")
+        mapes.extend(m['mape'] for m in trainer.metrics.values())
+        parameters += trainer.model.count_params()
+    return time.time() - start_time, float(np.mean(mapes)), parameters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark a global cross-ticker model against per-ticker models')
+    parser.add_argument('--tickers', type=str, nargs='+', required=True, help='Stock ticker symbols (e.g., TSLA AAPL)')
+    parser.add_argument('--models', type=str, nargs='+', default=['LSTM'],
+                        choices=MODEL_TYPES + ['ALL'], help='Model types to compare')
+    parser.add_argument('--start', type=str, default='2018-01-01', help='Start date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='End date (YYYY-MM-DD), defaults to today')
+    parser.add_argument('--epochs', type=int, default=5, help='Training epochs for both setups')
+    parser.add_argument('--zoo-batch-size', type=int, default=32, help='Batch size of the per-ticker models')
+    parser.add_argument('--global-batch-size', type=int, default=512, help='Mixed-ticker batch size of the global model')
+    parser.add_argument('--embedding', action='store_true', help='Give the global model a ticker embedding')
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    models = MODEL_TYPES if 'ALL' in args.models else args.models
+    # One end date for both setups, so they train on the same bars
+    end = args.end or datetime.now().strftime('%Y-%m-%d')
+    options = {
+        'start': args.start,
+        'end': end,
+        'epochs': args.epochs,
+        'zoo_batch_size': args.zoo_batch_size,
+        'global_batch_size': args.global_batch_size,
+        'embedding': args.embedding,
+    }
+    store = MarketDataStore()
+    for ticker in tickers:
+        store.update(ticker, args.start, end)
+
+    scratch_dir = tempfile.mkdtemp(prefix='global-benchmark-')
+    try:
+        zoo_dir = os.path.join(scratch_dir, 'zoo')
+        global_dir = os.path.join(scratch_dir, 'global')
+        zoo = train_zoo(tickers, models, options, zoo_dir, store)
+        shared = train_global(tickers, models, options, global_dir, store)
+
+        results = {}
+        for name, directory, (seconds, mape, parameters) in (('zoo', zoo_dir, zoo), ('global', global_dir, shared)):
+            model_paths = sorted(glob.glob(os.path.join(directory, '**', '*_model.h5'), recursive=True))
+            artifact_bytes = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, '**', '*.*'),
+                                                                            recursive=True))
+            results[name] = {
+                'seconds': seconds,
+                'mape': mape,
+                'parameters': parameters,
+                'resident_models': len(model_paths),
+                'artifact_mb': artifact_bytes / 1024 ** 2,
+                'serving_mb': serving_memory(model_paths),
+            }
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    rows = [
+        ("Training time (s)", 'seconds', "{:.1f}"),
+        ("Resident models", 'resident_models', "{:d}"),
+        ("Parameters", 'parameters', "{:,}"),
+        ("Artifacts on disk (MB)", 'artifact_mb', "{:.2f}"),
+        ("Serving memory (MB RSS)", 'serving_mb', "{:.1f}"),
+        ("Mean test MAPE (%)", 'mape', "{:.2f}"),
+    ]
+    print(f"\n{'='*72}")
+    print(f"Global model benchmark: {len(tickers)} tickers x {', '.join(models)}, {args.epochs} epochs"
+          f"{', ticker embedding' if args.embedding else ''}")
+    print(f"{'='*72}")
+    print(f"{'':<28}{'Per-ticker zoo':>16}{'Global':>14}{'Zoo / global':>14}")
+    print(f"{'-'*72}")
+    for label, key, fmt in rows:
+        zoo_value, global_value = results['zoo'][key], results['global'][key]
+        ratio = zoo_value / global_value if global_value else float('nan')
+        print(f"{label:<28}{fmt.format(zoo_value):>16}{fmt.format(global_value):>14}{ratio:>13.2f}x")
+    print(f"{'='*72}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Multi-Step Rollout Benchmark
+Times the windowed rollout (full model over the sliding window every step)
+against the incremental rollout for each architecture StockModelTrainer
+builds, and reports how far the incremental forecast drifts from the
+windowed one. Architectures without an incremental engine fall back to the
+windowed rollout and show a ratio of about 1x
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from rollout import IncrementalRecurrentEngine, build_rollout_engine, verify_incremental_rollout
+from train_multi_company import StockModelTrainer
+
+BUILDERS = {
+    'LSTM': StockModelTrainer.build_lstm_model,
+    'GRU': StockModelTrainer.build_gru_model,
+    'TRANSFORMER': StockModelTrainer.build_transformer_model,
+}
+
+
+def build_model(model_type, sequence_length):
+    """Same layers the trainer builds; only the input shape is read from X_train"""
+    return BUILDERS[model_type](SimpleNamespace(X_train=np.zeros((1, sequence_length, 1), dtype=np.float32)))
+
+
+def measure(engine, windows, horizon, repeat):
+    """Best wall time over `repeat` rollouts (the engine is already traced)"""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        engine.rollout(windows, horizon)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark windowed against incremental multi-step rollouts')
+    parser.add_argument('--models', type=str, nargs='+', default=list(BUILDERS),
+                        choices=list(BUILDERS), help='Architectures to benchmark')
+    parser.add_argument('--horizons', type=int, nargs='+', default=[30, 365], help='Forecast lengths in steps')
+    parser.add_argument('--batch', type=int, default=1, help='Windows rolled out together')
+    parser.add_argument('--sequence-length', type=int, default=60, help='Window length')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case (best is reported)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    windows = rng.random((args.batch, args.sequence_length, 1)).astype(np.float32)
+
+    print(f"\n{'='*78}")
+    print(f"Rollout benchmark: batch {args.batch}, sequence length {args.sequence_length}, "
+          f"best of {args.repeat}")
+    print(f"{'='*78}")
+    print(f"{'Model':<13}{'Incremental engine':<28}{'Horizon':>8}{'Windowed (s)':>14}"
+          f"{'Incr. (s)':>11}{'Speedup':>9}")
+    print(f"{'-'*78}")
+    drift = {}
+    for model_type in args.models:
+        model = build_model(model_type, args.sequence_length)
+        windowed = build_rollout_engine(model, mode='windowed')
+        incremental = build_rollout_engine(model, mode='incremental')
+        engine_name = type(incremental).__name__
+        for horizon in args.horizons:
+            windowed_s = measure(windowed, windows, horizon, args.repeat)
+            incremental_s = measure(incremental, windows, horizon, args.repeat)
+            print(f"{model_type:<13}{engine_name:<28}{horizon:>8}{windowed_s:>14.4f}"
+                  f"{incremental_s:>11.4f}{windowed_s / max(incremental_s, 1e-9):>8.1f}x")
+        if IncrementalRecurrentEngine.supports(model):
+            drift[model_type] = verify_incremental_rollout(model, windows[0], horizon=max(args.horizons))
+    print(f"{'-'*78}")
+    print(f"{'Drift vs windowed (untrained weights)':<41}{'first step':>12}{'max abs':>12}{'mean abs':>12}")
+    for model_type, result in drift.items():
+        print(f"{model_type:<41}{result['first_step_diff']:>12.2e}{result['max_abs_diff']:>12.2e}"
+              f"{result['mean_abs_diff']:>12.2e}")
+    print(f"{'='*78}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Windowing Benchmark
+Compares the list-append window loop previously used by the training scripts
+with the strided views in windowing.py: build time and peak memory for
+creating the windows, and for walking them in batches as training and
+evaluation do
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from windowing import iter_batches, split_windows, supervised_windows
+
+
+def loop_windows(scaled_data, sequence_length):
+    """The original per-window loop from StockModelTrainer.prepare_data()"""
+    X, y = [], []
+    for i in range(sequence_length, len(scaled_data)):
+        X.append(scaled_data[i-sequence_length:i, 0])
+        y.append(scaled_data[i, 0])
+    X, y = np.array(X), np.array(y)
+    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+    return X, y
+
+
+def measure(fn, repeat):
+    """Best wall time over `repeat` runs and peak traced memory of one run"""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 1024 ** 2
+
+
+def walk(X, y, batch_size):
+    """Touch every window once, batch by batch, like an epoch of training"""
+    total = 0.0
+    for X_batch, y_batch in iter_batches(X, y, batch_size=batch_size):
+        total += float(X_batch[:, -1, 0].sum()) + float(y_batch.sum())
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequence windowing for training and evaluation')
+    parser.add_argument('--rows', type=int, default=200_000, help='Series length (e.g. minute bars)')
+    parser.add_argument('--sequence-length', type=int, default=60, help='Window length')
+    parser.add_argument('--batch-size', type=int, default=256, help='Batch size for the epoch walk')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (best is reported)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    prices = 100 + np.cumsum(rng.normal(0, 1, args.rows))
+    scaled = ((prices - prices.min()) / (prices.max() - prices.min())).reshape(-1, 1)
+    L = args.sequence_length
+
+    # Same windows either way
+    X_loop, y_loop = loop_windows(scaled[:1000], L)
+    X_view, y_view = supervised_windows(scaled[:1000], L)
+    assert np.allclose(X_loop, X_view, atol=1e-6) and np.allclose(y_loop, y_view, atol=1e-6)
+
+    def loop_epoch():
+        X, y = loop_windows(scaled, L)
+        X_train, _, y_train, _ = split_windows(X, y)
+        walk(X_train, y_train, args.batch_size)
+
+    def view_epoch():
+        X, y = supervised_windows(scaled, L)
+        X_train, _, y_train, _ = split_windows(X, y)
+        walk(X_train, y_train, args.batch_size)
+
+    cases = [
+        ("loop: build windows", lambda: loop_windows(scaled, L)),
+        ("view: build windows", lambda: supervised_windows(scaled, L)),
+        ("loop: build + batched epoch", loop_epoch),
+        ("view: build + batched epoch", view_epoch),
+    ]
+
+    print(f"\n{'='*72}")
+    print(f"Windowing benchmark: {args.rows:,} rows, sequence length {L}, batch size {args.batch_size}")
+    print(f"{'='*72}")
+    print(f"{'Case':<34}{'Best time (s)':>16}{'Peak memory (MB)':>20}")
+    print(f"{'-'*72}")
+    results = {}
+    for name, fn in cases:
+        seconds, peak_mb = measure(fn, args.repeat)
+        results[name] = (seconds, peak_mb)
+        print(f"{name:<34}{seconds:>16.4f}{peak_mb:>20.1f}")
+    print(f"{'-'*72}")
+    print(f"{'Ratio (loop / view)':<34}{'time':>16}{'memory':>20}")
+
+    for stage in ("build windows", "build + batched epoch"):
+        loop_s, loop_mb = results[f"loop: {stage}"]
+        view_s, view_mb = results[f"view: {stage}"]
+        print(f"{stage:<34}{loop_s / max(view_s, 1e-9):>15.1f}x{loop_mb / max(view_mb, 1e-3):>19.1f}x")
+    print(f"{'='*72}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import argparse
 
+from market_data_store import MarketDataStore
+
 # Add current directory to path for relative imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.join(script_dir, '..', '..')
@@ -56,6 +58,12 @@ def compare_ticker_models(ticker):
     # Create DataFrame
     df = pd.DataFrame(results)
 
+    # Show which market data the models can be retrained/evaluated on locally
+    coverage = MarketDataStore().manifest(ticker)
+    if coverage:
+        print(f"📅 Local market data: {coverage['first_bar']} to {coverage['last_bar']} "
+              f"({coverage['rows']} bars, updated {coverage['updated_at']})\n")
+
     # Display full comparison
     print("📊 PERFORMANCE METRICS:")
     print("-" * 80)
@@ -0,0 +1,152 @@
+"""
+Streaming tf.data Input Pipeline
+Training windows are gathered batch by batch from the underlying series
+(in memory or memory-mapped on disk) instead of being materialized as an
+(N, sequence_length, features) array. Train/validation splits are index
+ranges (or index sets, for stacked multi-ticker series) over the same series.
+"""
+import math
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from windowing import as_series
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def split_targets(sequence_length, train_windows, validation_split=0.1, first_window=0):
+    """Chronological (train, validation) target-row ranges for windows first_window .. train_windows - 1
+
+    Window i predicts row i + sequence_length; the validation range is the
+    tail of the training windows, exactly as Keras' validation_split picks it.
+    """
+    count = train_windows - first_window
+    split_at = int(math.ceil(count * (1.0 - validation_split)))
+    first = sequence_length + first_window
+    return (first, first + split_at), (first + split_at, first + count)
+
+
+def memmap_series(values, path):
+    """Write a float32 series to `path` (.npy) and reopen it memory-mapped, read-only"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, as_series(values))
+    return np.load(path, mmap_mode='r')
+
+
+def _gather_fn(series, sequence_length, target_column):
+    """Batch of target rows -> (windows, targets), reading only the rows it needs"""
+    features = series.shape[1]
+    offsets = np.arange(-sequence_length, 0, dtype=np.int64)
+
+    if isinstance(series, np.memmap):
+        # Larger-than-RAM series: fancy-index the memmap so only the touched pages are read
+        def read(rows):
+            return series[rows[:, None] + offsets].astype(np.float32), series[rows, target_column].astype(np.float32)
+
+        def gather(rows):
+            X, y = tf.numpy_function(read, [rows], (tf.float32, tf.float32))
+            X.set_shape([None, sequence_length, features])
+            y.set_shape([None])
+            return X, y
+        return gather
+
+    values = tf.constant(as_series(series))
+    targets = values[:, target_column]
+    window_offsets = tf.constant(offsets)
+
+    def gather(rows):
+        return tf.gather(values, rows[:, None] + window_offsets), tf.gather(targets, rows)
+    return gather
+
+
+def window_dataset(series, sequence_length, target_range, batch_size=32, shuffle=False,
+                   cache=None, target_column=0, seed=None):
+    """tf.data pipeline of (window, next value) batches for target rows in `target_range`
+
+    Args:
+        series: (n,) or (n, features) array, or a read-only np.memmap
+        sequence_length: window length
+        target_range: (first, stop) rows whose values are predicted
+        batch_size: windows per batch
+        shuffle: reshuffle the windows every epoch (training); validation keeps order
+        cache: for unshuffled datasets, None to cache in memory for in-memory
+            series and not at all for memmaps, False to never cache, or a file
+            path for an on-disk cache. Shuffled datasets are never cached:
+            they gather every batch from freshly shuffled row indices
+        target_column: column of `series` that is predicted
+        seed: shuffle seed
+    """
+    first, stop = target_range
+    first = max(first, sequence_length)
+    if stop <= first:
+        raise ValueError(f"Empty target range {target_range} for sequence length {sequence_length}")
+
+    if not isinstance(series, np.memmap):
+        series = as_series(series)
+    elif series.ndim == 1:
+        series = series.reshape(-1, 1)
+    if cache is None:
+        cache = not isinstance(series, np.memmap)
+
+    rows = tf.data.Dataset.range(first, stop)
+    gather = _gather_fn(series, sequence_length, target_column)
+
+    if shuffle or cache is False:
+        # Shuffle cheap row indices (per window, like Keras' shuffle), then gather each batch on the fly
+        if shuffle:
+            rows = rows.shuffle(stop - first, seed=seed, reshuffle_each_iteration=True)
+        dataset = rows.batch(batch_size).map(gather, num_parallel_calls=AUTOTUNE)
+    else:
+        # Fixed order: gather once, then replay from the cache
+        dataset = rows.batch(batch_size).map(gather, num_parallel_calls=AUTOTUNE)
+        dataset = dataset.cache() if cache is True else dataset.cache(cache)
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def rows_dataset(series, sequence_length, rows, batch_size=32, shuffle=False, target_column=0, seed=None,
+                 row_ids=None):
+    """Streaming pipeline of (window, next value) batches for an explicit set of target rows
+
+    For several series stacked end to end (e.g. one per ticker): `rows` holds
+    only targets whose whole window lies inside one of them, so shuffled batches
+    mix series without any window crossing a boundary. With `row_ids` (one
+    integer per series row, e.g. a ticker index) batches are ((windows, ids), targets).
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        raise ValueError("No target rows")
+
+    # Memmaps stay on disk: _gather_fn reads only the rows of each batch
+    if not isinstance(series, np.memmap):
+        series = as_series(series)
+    elif series.ndim == 1:
+        series = series.reshape(-1, 1)
+    gather = _gather_fn(series, sequence_length, target_column)
+    if row_ids is not None:
+        ids = tf.constant(np.asarray(row_ids, dtype=np.int32))
+        gather_windows = gather
+
+        def gather(batch_rows):
+            X, y = gather_windows(batch_rows)
+            return (X, tf.gather(ids, batch_rows)[:, None]), y
+
+    dataset = tf.data.Dataset.from_tensor_slices(rows)
+    if shuffle:
+        dataset = dataset.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(gather, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
+
+
+def training_datasets(series, sequence_length, train_windows, batch_size=32, validation_split=0.1,
+                      cache=None, seed=None, first_window=0):
+    """(train, validation) datasets over windows first_window .. train_windows - 1 of `series`"""
+    train_range, validation_range = split_targets(sequence_length, train_windows, validation_split, first_window)
+    # Only the fixed-order validation set is cached; training reshuffles its windows every epoch
+    validation_cache = f"{cache}.validation" if isinstance(cache, str) else cache
+    train = window_dataset(series, sequence_length, train_range, batch_size, shuffle=True, seed=seed)
+    validation = window_dataset(series, sequence_length, validation_range, batch_size, shuffle=False,
+                                cache=validation_cache)
+    return train, validation
@@ -0,0 +1,330 @@
+"""
+Local Market Data Store
+Persistent per-ticker OHLCV history in memory-mapped NumPy files, with a
+manifest of covered date ranges so only missing bars are fetched
+"""
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+try:
+    from yahooquery import Ticker
+    USE_YAHOOQUERY = True
+except ImportError:
+    import yfinance as yf
+    USE_YAHOOQUERY = False
+
+from market_calendar import is_trading_day, next_trading_day
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.getenv(
+    'MARKET_DATA_DIR',
+    os.path.abspath(os.path.join(script_dir, '..', '..', 'data', 'market'))
+)
+
+
+def _normalize_history(df):
+    """Convert a yahooquery/yfinance frame to a DatetimeIndex with OHLCV columns"""
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    if 'date' in df.index.names or 'symbol' in df.index.names:
+        # yahooquery returns a (symbol, date) MultiIndex
+        df = df.reset_index()
+        df.set_index('date', inplace=True)
+
+    df = df.rename(columns={
+        'open': 'Open', 'high': 'High', 'low': 'Low',
+        'close': 'Close', 'volume': 'Volume'
+    })
+    if 'Close' not in df.columns:
+        return pd.DataFrame(columns=COLUMNS)
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+
+    # Index may mix datetime.date and tz-aware timestamps: keep the calendar day
+    df.index = pd.to_datetime([str(d)[:10] for d in df.index])
+    df = df[COLUMNS].astype(np.float64)
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df.dropna(subset=['Close'])
+
+
+def download_history(ticker, start_date, end_date, max_retries=5, allow_empty=False):
+    """Download daily bars from Yahoo Finance with retry logic
+
+    Returns:
+        DataFrame with OHLCV columns, or None when the download failed
+    """
+    print(f"Using: {'yahooquery' if USE_YAHOOQUERY else 'yfinance'}")
+
+    for attempt in range(max_retries):
+        try:
+            # Add delay between attempts to avoid rate limiting
+            if attempt > 0:
+                wait_time = 5 * (2 ** (attempt - 1))  # Exponential backoff: 5, 10, 20, 40 seconds
+                print(f"⏳ Waiting {wait_time} seconds before retry (attempt {attempt + 1}/{max_retries})...")
+                time.sleep(wait_time)
+
+            print(f"🔄 Downloading {ticker} {start_date} → {end_date} (attempt {attempt + 1}/{max_retries})...")
+
+            if USE_YAHOOQUERY:
+                df = Ticker(ticker).history(start=start_date, end=end_date)
+            else:
+                df = yf.download(ticker, start=start_date, end=end_date, progress=False)
+
+            df = _normalize_history(df)
+            if df.empty and not allow_empty:
+                print(f"⚠️  No data returned for {ticker}")
+                if attempt < max_retries - 1:
+                    continue
+                print(f"❌ No data found for ticker {ticker} after {max_retries} attempts")
+                return None
+            return df
+
+        except requests.exceptions.HTTPError as e:
+            if '429' in str(e):
+                print(f"⚠️  Rate limit detected (429 error)")
+                if attempt < max_retries - 1:
+                    wait_time = 10 * (2 ** attempt)  # Longer wait for rate limits: 10, 20, 40, 80 seconds
+                    print(f"⏳ Rate limited. Waiting {wait_time} seconds...")
+                    time.sleep(wait_time)
+                    continue
+                print(f"❌ Rate limit persists after {max_retries} attempts")
+                print("💡 Suggestion: Wait 10-15 minutes before trying again")
+                return None
+            print(f"❌ HTTP Error: {str(e)}")
+            if attempt < max_retries - 1:
+                continue
+            return None
+
+        except Exception as e:
+            error_msg = str(e)
+            print(f"⚠️  Error on attempt {attempt + 1}: {error_msg}")
+
+            # Check for common errors
+            if 'delisted' in error_msg.lower():
+                print(f"❌ Ticker {ticker} may be delisted or invalid")
+                return None
+            elif 'no timezone found' in error_msg.lower():
+                print(f"❌ Ticker {ticker} data unavailable or invalid")
+                return None
+
+            if attempt < max_retries - 1:
+                print(f"🔄 Retrying...")
+                continue
+            print(f"❌ Failed after {max_retries} attempts: {error_msg}")
+            return None
+
+    return None
+
+
+def _has_trading_day(start, end):
+    """True if [start, end) contains at least one NYSE trading day"""
+    if end <= start:
+        return False
+    day = start.date()
+    return is_trading_day(day) or next_trading_day(day) < end.date()
+
+
+def _covered_through(df, fetched_through, end):
+    """Exclusive end of the range a download has really covered
+
+    Only bars that arrived count: an empty or short response (not published
+    yet, or a transient upstream failure) leaves the rest to be fetched again.
+    A remainder made only of weekends and exchange holidays has no bars to
+    wait for and counts as covered.
+    """
+    covered = fetched_through
+    if df is not None and not df.empty:
+        covered = max(fetched_through, min(end, df.index[-1].normalize() + timedelta(days=1)))
+    return covered if _has_trading_day(covered, end) else max(covered, end)
+
+
+def _replace_atomically(directory, name, write):
+    """Write through a unique temp file and rename so readers never see a partial file"""
+    # Unique per writer, so concurrent updates never rename each other's file
+    tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(tmp_path, 'xb') as f:
+            write(f)
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class MarketDataStore:
+    """Per-ticker OHLCV history on disk, read through memory mapping
+
+    Layout under the store directory:
+        {TICKER}/dates.npy      datetime64[D] bar dates, ascending
+        {TICKER}/ohlcv.npy      float64 (rows, 5) Open/High/Low/Close/Volume
+        {TICKER}/manifest.json  covered range: first/last bar and fetched_through
+        {TICKER}/.lock          held while a process updates the ticker
+
+    Updates of one ticker are serialized through the lock file, so parallel
+    training jobs for the same ticker neither download the same bars twice
+    nor overwrite each other's files.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, ticker.upper())
+
+    @contextmanager
+    def _locked(self, ticker):
+        """Exclusive per-ticker lock across processes"""
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        with open(os.path.join(ticker_dir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def manifest(self, ticker):
+        """Covered date range for a ticker, or None if nothing is stored"""
+        path = os.path.join(self._ticker_dir(ticker), 'manifest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def coverage(self):
+        """Manifests of every stored ticker"""
+        result = {}
+        for ticker in sorted(os.listdir(self.root)):
+            manifest = self.manifest(ticker)
+            if manifest:
+                result[ticker] = manifest
+        return result
+
+    def load(self, ticker):
+        """Memory-mapped (dates, ohlcv) arrays for a ticker"""
+        ticker_dir = self._ticker_dir(ticker)
+        dates = np.load(os.path.join(ticker_dir, 'dates.npy'), mmap_mode='r')
+        ohlcv = np.load(os.path.join(ticker_dir, 'ohlcv.npy'), mmap_mode='r')
+        return dates, ohlcv
+
+    def _write(self, ticker, df, fetched_from, fetched_through):
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+
+        dates = df.index.values.astype('datetime64[D]')
+        ohlcv = df[COLUMNS].values.astype(np.float64)
+        for name, array in (('dates.npy', dates), ('ohlcv.npy', ohlcv)):
+            _replace_atomically(ticker_dir, name, lambda f, array=array: np.save(f, array))
+
+        self._write_manifest(ticker, {
+            'ticker': ticker.upper(),
+            'rows': int(len(df)),
+            'first_bar': str(dates[0]) if len(dates) else None,
+            'last_bar': str(dates[-1]) if len(dates) else None,
+        }, fetched_from, fetched_through)
+
+    def _write_manifest(self, ticker, manifest, fetched_from, fetched_through):
+        manifest = dict(manifest, fetched_from=fetched_from, fetched_through=fetched_through,
+                        updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        _replace_atomically(self._ticker_dir(ticker), 'manifest.json',
+                            lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+    def _stored_frame(self, ticker):
+        dates, ohlcv = self.load(ticker)
+        return pd.DataFrame(np.asarray(ohlcv), index=pd.DatetimeIndex(np.asarray(dates)), columns=COLUMNS)
+
+    def update(self, ticker, start_date, end_date, max_retries=5):
+        """Fetch only the bars missing from [start_date, end_date)
+
+        Returns:
+            True if the store covers the range afterwards, False if a needed download failed
+        """
+        ticker = ticker.upper()
+        with self._locked(ticker):
+            return self._update(ticker, start_date, end_date, max_retries)
+
+    def _update(self, ticker, start_date, end_date, max_retries):
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        manifest = self.manifest(ticker)
+
+        if manifest is None:
+            df = download_history(ticker, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), max_retries)
+            if df is None:
+                return False
+            self._write(ticker, df, start.strftime('%Y-%m-%d'), _covered_through(df, start, end).strftime('%Y-%m-%d'))
+            return True
+
+        fetched_from = pd.Timestamp(manifest['fetched_from'])
+        fetched_through = pd.Timestamp(manifest['fetched_through'])
+        new_bars = []
+
+        # Missing head (older history than stored)
+        if start < fetched_from:
+            head = download_history(ticker, start.strftime('%Y-%m-%d'), fetched_from.strftime('%Y-%m-%d'),
+                                    max_retries, allow_empty=True)
+            if head is None:
+                return False
+            new_bars.append(head)
+            fetched_from = start
+
+        # Missing tail (new bars since the last fetch); skip gaps without trading days
+        if end > fetched_through:
+            tail = None
+            if _has_trading_day(fetched_through, end):
+                tail = download_history(ticker, fetched_through.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                                        max_retries, allow_empty=True)
+                if tail is None:
+                    return False
+                new_bars.append(tail)
+            fetched_through = _covered_through(tail, fetched_through, end)
+
+        if fetched_from == pd.Timestamp(manifest['fetched_from']) \
+                and fetched_through == pd.Timestamp(manifest['fetched_through']):
+            return True  # Fully covered: no network, no rewrite
+
+        new_bars = [df for df in new_bars if not df.empty]
+        if not new_bars:
+            # Only the covered range moved: keep the bar files as they are
+            self._write_manifest(ticker, manifest, fetched_from.strftime('%Y-%m-%d'),
+                                 fetched_through.strftime('%Y-%m-%d'))
+            return True
+
+        df = pd.concat([self._stored_frame(ticker)] + new_bars)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        self._write(ticker, df, fetched_from.strftime('%Y-%m-%d'), fetched_through.strftime('%Y-%m-%d'))
+        return True
+
+    def get(self, ticker, start_date, end_date=None, max_retries=5):
+        """OHLCV DataFrame for [start_date, end_date), fetching only what is missing
+
+        Returns:
+            DataFrame indexed by date, or None if the data could not be obtained
+        """
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        if not self.update(ticker, start_date, end_date, max_retries):
+            return None
+
+        dates, ohlcv = self.load(ticker)
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date).date(), 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date).date(), 'D'), side='left')
+        return pd.DataFrame(ohlcv[lo:hi], index=pd.DatetimeIndex(dates[lo:hi]), columns=COLUMNS)
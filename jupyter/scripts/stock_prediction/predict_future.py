@@ -2,7 +2,6 @@
 Future Stock Price Prediction Script
 Predict future prices with flexible time periods: day, week, month, year
 """
-import numpy as np
 import pandas as pd
 import pickle
 import os
@@ -12,27 +11,23 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 from tensorflow.keras.models import load_model
 
+from market_data_store import MarketDataStore
+from rollout import ROLLOUT_MODES, build_rollout_engine, forecast_prices, verify_incremental_rollout
+
 # Add current directory to path
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.join(script_dir, '..', '..')
 project_root = os.path.abspath(project_root)
 os.chdir(project_root)
 
-# Import data download function
-try:
-    from yahooquery import Ticker
-    USE_YAHOOQUERY = True
-except ImportError:
-    import yfinance as yf
-    USE_YAHOOQUERY = False
-
 
 class StockPredictor:
     """Predict future stock prices using trained models"""
 
-    def __init__(self, ticker, model_type='GRU'):
+    def __init__(self, ticker, model_type='GRU', rollout_mode='windowed'):
         self.ticker = ticker.upper()
         self.model_type = model_type.upper()
+        self.rollout_mode = rollout_mode
         self.model_dir = os.path.join('models', self.ticker)
 
         # Load model, scaler, and metrics
@@ -59,8 +54,9 @@ class StockPredictor:
         print(f"Loading {self.model_type} model for {self.ticker}")
         print(f"{'='*60}\n")
 
-        # Load model
-        self.model = load_model(model_path)
+        # Load model and compile its multi-step rollout once
+        self.model = load_model(model_path, compile=False)
+        self.rollout_engine = build_rollout_engine(self.model, mode=self.rollout_mode)
         print(f"✅ Model loaded: {model_name}")
 
         # Load scaler
@@ -80,46 +76,26 @@ class StockPredictor:
         print(f"   Trained: {self.metrics.get('train_date', 'Unknown')}")
 
     def download_recent_data(self, days=100):
-        """Download recent stock data for prediction"""
+        """Load recent stock data from the local market data store"""
         print(f"\n{'='*60}")
-        print(f"Downloading recent data for {self.ticker}")
+        print(f"Loading recent data for {self.ticker}")
         print(f"{'='*60}\n")
 
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
         try:
-            if USE_YAHOOQUERY:
-                ticker_obj = Ticker(self.ticker)
-                df = ticker_obj.history(start=start_date.strftime('%Y-%m-%d'),
-                                       end=end_date.strftime('%Y-%m-%d'))
-
-                if isinstance(df, pd.DataFrame) and not df.empty:
-                    df = df.reset_index()
-                    if 'date' in df.columns:
-                        df.set_index('date', inplace=True)
-                    column_mapping = {
-                        'open': 'Open', 'high': 'High', 'low': 'Low',
-                        'close': 'Close', 'volume': 'Volume', 'adjclose': 'Adj Close'
-                    }
-                    df.rename(columns=column_mapping, inplace=True)
-                    if 'Close' not in df.columns and 'close' in df.columns:
-                        df['Close'] = df['close']
-                else:
-                    df = pd.DataFrame()
-            else:
-                df = yf.download(self.ticker,
-                               start=start_date.strftime('%Y-%m-%d'),
-                               end=end_date.strftime('%Y-%m-%d'),
-                               progress=False)
-
-            if df.empty:
+            df = MarketDataStore().get(self.ticker,
+                                       start_date.strftime('%Y-%m-%d'),
+                                       end_date.strftime('%Y-%m-%d'))
+
+            if df is None or df.empty:
                 raise ValueError(f"No data downloaded for {self.ticker}")
 
             self.recent_data = df[['Close']].values
             self.recent_dates = df.index
 
-            print(f"✅ Downloaded {len(df)} data points")
+            print(f"✅ Loaded {len(df)} data points")
             print(f"📅 Latest date: {df.index[-1].strftime('%Y-%m-%d')}")
             print(f"💰 Latest price: ${df['Close'].iloc[-1]:.2f}")
 
@@ -168,30 +144,9 @@ class StockPredictor:
         if len(self.recent_data) < sequence_length:
             raise ValueError(f"Need at least {sequence_length} days of data. Got {len(self.recent_data)}")
 
-        # Scale data
-        scaled_data = self.scaler.transform(self.recent_data)
-
-        # Prepare for prediction
-        predictions = []
-        current_sequence = scaled_data[-sequence_length:].copy()
-
-        # Predict iteratively
+        # Predict iteratively inside one compiled rollout
         print("🔮 Generating predictions...")
-        for i in range(trading_days):
-            # Reshape for model input
-            X_pred = current_sequence.reshape(1, sequence_length, 1)
-
-            # Predict next day
-            pred_scaled = self.model.predict(X_pred, verbose=0)
-            pred_price = self.scaler.inverse_transform(pred_scaled)[0][0]
-
-            predictions.append(pred_price)
-
-            # Update sequence (rolling window)
-            current_sequence = np.append(current_sequence[1:], pred_scaled, axis=0)
-
-            if (i + 1) % 20 == 0:
-                print(f"   Predicted {i + 1}/{trading_days} days...")
+        predictions = forecast_prices(self.rollout_engine, self.scaler, self.recent_data, trading_days)
 
         print(f"✅ Prediction complete!\n")
 
@@ -208,6 +163,22 @@ class StockPredictor:
 
         return pred_df
 
+    def verify_rollout(self, horizon=30):
+        """Check the incremental rollout against the windowed rollout"""
+        window = self.scaler.transform(self.recent_data[-self.rollout_engine.sequence_length:])
+        result = verify_incremental_rollout(self.model, window, horizon=horizon)
+
+        print(f"\n{'='*60}")
+        print(f"ROLLOUT EQUIVALENCE CHECK ({horizon} steps)")
+        print(f"{'='*60}")
+        print(f"First step diff: {result['first_step_diff']:.2e}")
+        print(f"Max abs diff:    {result['max_abs_diff']:.2e}")
+        print(f"Mean abs diff:   {result['mean_abs_diff']:.2e}")
+        print(f"Result:          {'✅ PASSED' if result['passed'] else '❌ FAILED'}")
+        print(f"{'='*60}\n")
+
+        return result
+
     def plot_predictions(self, pred_df, show_history_days=60):
         """Plot historical data and predictions"""
         print("📊 Creating visualization...\n")
@@ -340,16 +311,25 @@ def main():
                        help='Period type: day, week, month, year (default: day)')
     parser.add_argument('--save-csv', type=str, default=None,
                        help='Save predictions to CSV file')
+    parser.add_argument('--rollout', type=str, default='windowed',
+                       choices=list(ROLLOUT_MODES),
+                       help='Rollout mode: windowed (exact) or incremental (O(1) per step for LSTM/GRU)')
+    parser.add_argument('--verify-rollout', action='store_true',
+                       help='Compare incremental and windowed rollouts before predicting')
 
     args = parser.parse_args()
 
     try:
         # Initialize predictor
-        predictor = StockPredictor(ticker=args.ticker, model_type=args.model)
+        predictor = StockPredictor(ticker=args.ticker, model_type=args.model,
+                                   rollout_mode=args.rollout)
 
         # Download recent data
         predictor.download_recent_data(days=100)
 
+        if args.verify_rollout and not predictor.verify_rollout()['passed']:
+            return 1
+
         # Predict future
         pred_df = predictor.predict_future(periods=args.periods,
                                           period_type=args.period_type)
@@ -0,0 +1,268 @@
+"""
+Compiled Autoregressive Rollout for Multi-Step Forecasts
+Shared by predict_future.py and the FastAPI /predict/future endpoint
+"""
+import numpy as np
+import tensorflow as tf
+
+
+class RolloutEngine:
+    """Run a one-step-ahead model autoregressively inside a single tf.function
+
+    The whole horizon loop is a tf.while_loop over a ring-buffer window, so a
+    365-day forecast is one graph execution instead of 365 Keras predict calls.
+    The input signature is fixed (any batch size, any horizon), so the function
+    is traced once by warmup() and reused for every request.
+
+    The rollout is exact: step k depends only on the sequence_length values
+    before it, so continuing from history plus a forecast prefix gives the same
+    steps as one longer rollout.
+    """
+
+    exact = True
+
+    def __init__(self, model, sequence_length=None):
+        self.model = model
+        self.sequence_length = sequence_length or model.input_shape[1]
+        self._rollout = tf.function(
+            self._rollout_graph,
+            input_signature=[
+                tf.TensorSpec([None, self.sequence_length, 1], tf.float32),
+                tf.TensorSpec([], tf.int32),
+            ]
+        )
+
+    def _step(self, window):
+        """One forward pass on an ordered (batch, sequence_length, 1) window"""
+        return tf.reshape(tf.cast(self.model(window, training=False), tf.float32), [-1])
+
+    def _rollout_graph(self, window, horizon):
+        sequence_length = self.sequence_length
+        predictions = tf.TensorArray(tf.float32, size=horizon, element_shape=[None])
+
+        def cond(step, buffer, head, predictions):
+            return step < horizon
+
+        def body(step, buffer, head, predictions):
+            # buffer[:, head] holds the oldest value; rotate it to the front
+            ordered = tf.roll(buffer, shift=-head, axis=1)
+            next_value = self._step(ordered)
+            predictions = predictions.write(step, next_value)
+
+            # Overwrite the oldest slot with the new prediction
+            slot = tf.reshape(tf.one_hot(head, sequence_length, dtype=tf.float32), [1, sequence_length, 1])
+            buffer = buffer * (1.0 - slot) + tf.reshape(next_value, [-1, 1, 1]) * slot
+            return step + 1, buffer, (head + 1) % sequence_length, predictions
+
+        _, _, _, predictions = tf.while_loop(
+            cond, body,
+            loop_vars=(tf.constant(0), window, tf.constant(0), predictions)
+        )
+        return tf.transpose(predictions.stack())
+
+    def warmup(self):
+        """Trace and run the compiled rollout once so requests never pay for tracing"""
+        self.rollout(np.zeros((self.sequence_length, 1), dtype=np.float32), 2)
+        return self
+
+    def rollout(self, window, horizon):
+        """Forecast `horizon` scaled values from scaled window(s)
+
+        Args:
+            window: (sequence_length, 1) or (batch, sequence_length, 1) scaled values
+            horizon: number of future steps
+
+        Returns:
+            (batch, horizon) float32 array of scaled predictions
+        """
+        window = np.asarray(window, dtype=np.float32)
+        if window.ndim == 2:
+            window = window[np.newaxis]
+        window = window[:, -self.sequence_length:, :]
+        if horizon <= 0:
+            return np.zeros((window.shape[0], 0), dtype=np.float32)
+        return self._rollout(tf.constant(window), tf.constant(horizon, dtype=tf.int32)).numpy()
+
+
+class IncrementalRecurrentEngine(RolloutEngine):
+    """O(1)-per-step rollout for stacked LSTM/GRU models
+
+    The trained weights are reused through each layer's cell: the hidden state is
+    primed once on the history window, then advanced by one timestep per
+    forecasted day instead of re-running the recurrent layers over the whole
+    window.
+
+    The first prediction is identical to the windowed rollout. Later steps
+    condition on the full generated trajectory rather than on the last
+    sequence_length values only, so they drift slightly from the windowed
+    result; use verify_incremental_rollout() to measure the gap for a model.
+    Because the state carries the whole trajectory, a continued rollout also
+    differs from a single longer one, so the engine is not exact.
+    """
+
+    exact = False
+
+    def __init__(self, model, sequence_length=None):
+        self.recurrent_layers, self.head_layers = self._split_layers(model)
+        super().__init__(model, sequence_length)
+
+    @staticmethod
+    def _split_layers(model):
+        """Split a Sequential recurrent model into recurrent layers and the dense head"""
+        recurrent_layers, head_layers = [], []
+        for layer in model.layers:
+            if isinstance(layer, (tf.keras.layers.InputLayer, tf.keras.layers.Dropout)):
+                continue  # identity at inference time
+            if isinstance(layer, (tf.keras.layers.LSTM, tf.keras.layers.GRU)):
+                if head_layers or layer.go_backwards or layer.stateful:
+                    raise ValueError(f"Unsupported recurrent layer for incremental inference: {layer.name}")
+                recurrent_layers.append(layer)
+            elif isinstance(layer, tf.keras.layers.Dense):
+                head_layers.append(layer)
+            else:
+                raise ValueError(f"Unsupported layer for incremental inference: {layer.name}")
+
+        if not recurrent_layers or not head_layers:
+            raise ValueError("Incremental inference needs recurrent layers followed by a dense head")
+        return recurrent_layers, head_layers
+
+    @classmethod
+    def supports(cls, model):
+        try:
+            cls._split_layers(model)
+            return True
+        except (ValueError, AttributeError):
+            return False
+
+    def _initial_states(self, batch):
+        return [
+            [tf.zeros([batch, size]) for size in tf.nest.flatten(layer.cell.state_size)]
+            for layer in self.recurrent_layers
+        ]
+
+    def _advance(self, x, states):
+        """Feed one (batch, 1) timestep through every recurrent cell"""
+        new_states = []
+        for layer, layer_states in zip(self.recurrent_layers, states):
+            x, layer_states = layer.cell(x, layer_states, training=False)
+            new_states.append(tf.nest.flatten(layer_states))
+        return x, new_states
+
+    def _head(self, h):
+        for layer in self.head_layers:
+            h = layer(h)
+        return tf.reshape(h, [-1])
+
+    def _rollout_graph(self, window, horizon):
+        batch = tf.shape(window)[0]
+        output_size = self.recurrent_layers[-1].cell.units
+
+        # Prime the hidden state once on the history window
+        def prime_cond(t, h, states):
+            return t < self.sequence_length
+
+        def prime_body(t, h, states):
+            h, states = self._advance(window[:, t, :], states)
+            return t + 1, h, states
+
+        _, h, states = tf.while_loop(
+            prime_cond, prime_body,
+            loop_vars=(tf.constant(0), tf.zeros([batch, output_size]), self._initial_states(batch))
+        )
+
+        predictions = tf.TensorArray(tf.float32, size=horizon, element_shape=[None])
+
+        def cond(step, h, states, predictions):
+            return step < horizon
+
+        def body(step, h, states, predictions):
+            next_value = self._head(h)
+            predictions = predictions.write(step, next_value)
+            h, states = self._advance(tf.reshape(next_value, [-1, 1]), states)
+            return step + 1, h, states, predictions
+
+        _, _, _, predictions = tf.while_loop(
+            cond, body,
+            loop_vars=(tf.constant(0), h, states, predictions)
+        )
+        return tf.transpose(predictions.stack())
+
+
+ROLLOUT_MODES = ('windowed', 'incremental')
+
+
+def build_rollout_engine(model, sequence_length=None, warmup=True, mode='windowed'):
+    """Create the rollout engine for a trained model
+
+    Args:
+        model: trained one-step-ahead Keras model
+        sequence_length: window length, defaults to the model input length
+        warmup: trace the compiled rollout immediately
+        mode: 'windowed' re-runs the model over the sliding window each step;
+              'incremental' uses the O(1) per-step path when the architecture
+              supports it and falls back to 'windowed' otherwise
+
+    Transformer models always use the windowed rollout. Every position attends
+    to the newest value, so a cached step would still redo softmax, the value
+    mix and the feed-forward block for the whole window.
+    """
+    if mode not in ROLLOUT_MODES:
+        raise ValueError(f"Invalid rollout mode: {mode}. Use: {', '.join(ROLLOUT_MODES)}")
+
+    if mode == 'incremental' and IncrementalRecurrentEngine.supports(model):
+        engine = IncrementalRecurrentEngine(model, sequence_length)
+    else:
+        engine = RolloutEngine(model, sequence_length)
+
+    if warmup:
+        engine.warmup()
+    return engine
+
+
+def verify_incremental_rollout(model, window, horizon=30, tolerance=1e-2):
+    """Compare the incremental rollout with the windowed rollout on one window
+
+    Args:
+        model: trained model supported by the incremental engine
+        window: (sequence_length, 1) scaled history
+        horizon: number of steps to compare
+        tolerance: maximum allowed absolute difference in scaled units
+
+    Returns:
+        dict with per-step differences and whether the check passed
+    """
+    if not IncrementalRecurrentEngine.supports(model):
+        raise ValueError("Model has no incremental rollout engine; it always uses the windowed rollout")
+
+    windowed = build_rollout_engine(model, mode='windowed').rollout(window, horizon)[0]
+    incremental = build_rollout_engine(model, mode='incremental').rollout(window, horizon)[0]
+    diff = np.abs(windowed.astype(np.float64) - incremental.astype(np.float64))
+
+    return {
+        'first_step_diff': float(diff[0]),
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+        # The first step runs the same computation and must match exactly
+        'passed': bool(diff[0] <= 1e-4 and diff.max() <= tolerance)
+    }
+
+
+def forecast_prices(engine, scaler, closes, horizon):
+    """Scale recent closes, roll the model forward and return prices
+
+    Args:
+        engine: rollout engine from build_rollout_engine()
+        scaler: fitted scaler used when the model was trained
+        closes: recent close prices, at least sequence_length values
+        horizon: number of future steps
+
+    Returns:
+        1-D float64 array of predicted prices
+    """
+    closes = np.asarray(closes, dtype=np.float64).reshape(-1, 1)
+    if len(closes) < engine.sequence_length:
+        raise ValueError(f"Need at least {engine.sequence_length} days of data. Got {len(closes)}")
+
+    scaled = scaler.transform(closes[-engine.sequence_length:])
+    predicted_scaled = engine.rollout(scaled, horizon)[0]
+    return scaler.inverse_transform(predicted_scaled.reshape(-1, 1).astype(np.float64)).ravel()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import their siblings directly (python train_multi_company.py ...)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
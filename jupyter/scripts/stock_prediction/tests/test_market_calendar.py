@@ -0,0 +1,47 @@
+"""NYSE holiday rules and trading-day stepping"""
+from datetime import date
+
+import pytest
+
+from market_calendar import holidays, is_trading_day, next_trading_day, trading_days_after
+
+
+def test_full_year_of_closures():
+    assert sorted(holidays(2024)) == [
+        date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+        date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25),
+    ]
+
+
+@pytest.mark.parametrize('closed', [
+    date(2025, 4, 18),    # Good Friday
+    date(2026, 7, 3),     # Independence Day on a Saturday, observed Friday
+    date(2022, 12, 26),   # Christmas on a Sunday, observed Monday
+    date(2022, 6, 20),    # First Juneteenth, on a Sunday
+])
+def test_moving_and_observed_holidays(closed):
+    assert closed in holidays(closed.year)
+    assert not is_trading_day(closed)
+
+
+def test_juneteenth_only_from_2022():
+    assert date(2021, 6, 18) not in holidays(2021)
+    assert is_trading_day(date(2021, 6, 18))
+
+
+def test_saturday_new_year_is_not_observed_in_the_previous_year():
+    # 2022-01-01 was a Saturday; the exchange stayed open on Friday 2021-12-31
+    assert is_trading_day(date(2021, 12, 31))
+    assert all(day.year == 2022 for day in holidays(2022))
+
+
+def test_weekends_are_not_trading_days():
+    assert not is_trading_day(date(2024, 6, 15))
+    assert not is_trading_day(date(2024, 6, 16))
+
+
+def test_stepping_skips_weekends_and_holidays():
+    assert next_trading_day(date(2024, 3, 28)) == date(2024, 4, 1)    # over Good Friday and the weekend
+    assert trading_days_after(date(2024, 12, 20), 3) == [date(2024, 12, 23), date(2024, 12, 24),
+                                                          date(2024, 12, 26)]
+    assert trading_days_after(date(2024, 12, 20), 0) == []
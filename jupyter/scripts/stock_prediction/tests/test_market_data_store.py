@@ -0,0 +1,123 @@
+"""Market data store: manifest coverage, incremental fetches and holiday gaps"""
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+market_data_store = pytest.importorskip('market_data_store')
+
+from market_calendar import is_trading_day  # noqa: E402
+from market_data_store import COLUMNS, MarketDataStore  # noqa: E402
+
+
+class FakeYahoo:
+    """download_history over a synthetic exchange; bars after published_through are not out yet"""
+
+    def __init__(self, published_through='2024-12-31'):
+        self.published_through = pd.Timestamp(published_through)
+        self.calls = []
+
+    def __call__(self, ticker, start_date, end_date, max_retries=5, allow_empty=False):
+        self.calls.append((start_date, end_date))
+        days = [day for day in pd.date_range(start_date, end_date, inclusive='left')
+                if is_trading_day(day.date()) and day <= self.published_through]
+        close = np.array([100.0 + day.dayofyear for day in days])
+        df = pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                           'Volume': np.full(len(days), 1000.0)}, index=pd.DatetimeIndex(days), columns=COLUMNS)
+        return df if allow_empty or not df.empty else None
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    fake = FakeYahoo()
+    monkeypatch.setattr(market_data_store, 'download_history', fake)
+    return fake
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MarketDataStore(root=str(tmp_path))
+
+
+def bar_files(store, ticker):
+    return [os.stat(os.path.join(store._ticker_dir(ticker), name)).st_ino for name in ('dates.npy', 'ohlcv.npy')]
+
+
+def test_first_fetch_records_the_covered_range(store, yahoo):
+    df = store.get('tsla', '2024-01-02', '2024-02-01')
+
+    manifest = store.manifest('TSLA')
+    assert yahoo.calls == [('2024-01-02', '2024-02-01')]
+    assert manifest['rows'] == len(df) == 21
+    assert (manifest['first_bar'], manifest['last_bar']) == ('2024-01-02', '2024-01-31')
+    assert (manifest['fetched_from'], manifest['fetched_through']) == ('2024-01-02', '2024-02-01')
+    assert list(store.coverage()) == ['TSLA']
+
+
+def test_covered_ranges_are_served_without_network(store, yahoo):
+    store.update('TSLA', '2024-01-02', '2024-03-01')
+    yahoo.calls.clear()
+
+    df = store.get('TSLA', '2024-01-10', '2024-02-01')
+
+    assert yahoo.calls == []
+    assert df.index[0] == pd.Timestamp('2024-01-10') and df.index[-1] == pd.Timestamp('2024-01-31')
+
+
+def test_only_the_missing_tail_and_head_are_fetched(store, yahoo):
+    store.update('TSLA', '2024-02-01', '2024-03-01')
+    stored = store.get('TSLA', '2024-02-01', '2024-03-01')
+    yahoo.calls.clear()
+
+    store.update('TSLA', '2024-01-02', '2024-03-15')
+
+    assert yahoo.calls == [('2024-01-02', '2024-02-01'), ('2024-03-01', '2024-03-15')]
+    dates, ohlcv = store.load('TSLA')
+    assert np.all(np.diff(dates.astype(np.int64)) > 0)
+    assert str(dates[0]) == '2024-01-02' and str(dates[-1]) == '2024-03-14'
+    pd.testing.assert_frame_equal(store.get('TSLA', '2024-02-01', '2024-03-01'), stored)
+    assert store.manifest('TSLA')['rows'] == len(dates)
+
+
+def test_holiday_only_gap_is_covered_without_rewriting_bars(store, yahoo):
+    store.update('TSLA', '2024-03-01', '2024-03-29')
+    files = bar_files(store, 'TSLA')
+    yahoo.calls.clear()
+
+    # Good Friday and the weekend: nothing to download
+    assert store.update('TSLA', '2024-03-01', '2024-04-01')
+
+    assert yahoo.calls == []
+    assert bar_files(store, 'TSLA') == files
+    assert store.manifest('TSLA')['fetched_through'] == '2024-04-01'
+
+
+def test_unpublished_bars_are_fetched_again_later(store, yahoo):
+    store.update('TSLA', '2024-03-01', '2024-03-15')
+    files = bar_files(store, 'TSLA')
+    yahoo.published_through = pd.Timestamp('2024-03-14')
+    yahoo.calls.clear()
+
+    assert store.update('TSLA', '2024-03-01', '2024-03-19')   # Friday's and Monday's bars are not out yet
+
+    assert yahoo.calls == [('2024-03-15', '2024-03-19')]
+    assert bar_files(store, 'TSLA') == files
+    assert store.manifest('TSLA')['fetched_through'] == '2024-03-15'
+
+    yahoo.published_through = pd.Timestamp('2024-12-31')
+    yahoo.calls.clear()
+    store.update('TSLA', '2024-03-01', '2024-03-19')
+
+    assert yahoo.calls == [('2024-03-15', '2024-03-19')]
+    assert store.manifest('TSLA')['last_bar'] == '2024-03-18'
+    assert store.manifest('TSLA')['fetched_through'] == '2024-03-19'
+
+
+def test_failed_download_leaves_the_store_untouched(store, yahoo, monkeypatch):
+    store.update('TSLA', '2024-03-01', '2024-03-15')
+    manifest = store.manifest('TSLA')
+    monkeypatch.setattr(market_data_store, 'download_history', lambda *args, **kwargs: None)
+
+    assert not store.update('TSLA', '2024-03-01', '2024-04-15')
+    assert store.manifest('TSLA') == manifest
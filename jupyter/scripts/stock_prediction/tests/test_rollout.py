@@ -0,0 +1,117 @@
+"""Rollout engines against a plain one-Keras-call-per-step loop"""
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+import numpy as np  # noqa: E402
+from rollout import (IncrementalRecurrentEngine, RolloutEngine, build_rollout_engine,  # noqa: E402
+                     verify_incremental_rollout)
+
+SEQUENCE_LENGTH = 12
+HORIZON = 24
+ATOL = 1e-5
+
+
+def recurrent_model(layer_type, seed=0):
+    """Same layout as StockModelTrainer's LSTM/GRU models, smaller"""
+    tf.keras.utils.set_random_seed(seed)
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(SEQUENCE_LENGTH, 1)),
+        layer_type(8, return_sequences=True),
+        tf.keras.layers.Dropout(0.2),
+        layer_type(8),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(4),
+        tf.keras.layers.Dense(1),
+    ])
+
+
+def forget_history(model):
+    """Make every recurrent layer depend on its current input only
+
+    No recurrent kernel and a closed forget (LSTM) or update (GRU) gate: the
+    output at the end of a window is then a function of its last value, so
+    carrying state and re-reading the window must give the same trajectory.
+    """
+    for layer in model.layers:
+        if not isinstance(layer, (tf.keras.layers.LSTM, tf.keras.layers.GRU)):
+            continue
+        kernel, recurrent_kernel, bias = layer.get_weights()
+        units = layer.units
+        if isinstance(layer, tf.keras.layers.LSTM):
+            bias[units:2 * units] = -30.0       # forget gate (gate order i, f, c, o)
+        else:
+            # Input bias row of the (2, 3 * units) reset_after bias, gate order z, r, h
+            bias.reshape(-1, 3 * units)[0, :units] = -30.0
+        layer.set_weights([kernel, np.zeros_like(recurrent_kernel), bias])
+    return model
+
+
+def reference_rollout(model, window, horizon):
+    """One Keras call per step on the sliding window"""
+    window = np.array(window, dtype=np.float32)
+    predictions = []
+    for _ in range(horizon):
+        value = float(np.asarray(model(window[np.newaxis], training=False)).reshape(-1)[0])
+        predictions.append(value)
+        window = np.concatenate([window[1:], [[value]]]).astype(np.float32)
+    return np.array(predictions, dtype=np.float32)
+
+
+@pytest.fixture
+def window():
+    return np.random.default_rng(1).random((SEQUENCE_LENGTH, 1)).astype(np.float32)
+
+
+@pytest.mark.parametrize('layer_type', [tf.keras.layers.LSTM, tf.keras.layers.GRU])
+def test_windowed_rollout_matches_step_by_step_loop(layer_type, window):
+    model = recurrent_model(layer_type)
+    engine = build_rollout_engine(model, mode='windowed')
+
+    np.testing.assert_allclose(engine.rollout(window, HORIZON)[0], reference_rollout(model, window, HORIZON),
+                               atol=ATOL)
+
+
+def test_windowed_rollout_continues_from_a_prefix(window):
+    # The forecast cache extends cached prefixes: that must equal one longer rollout
+    engine = build_rollout_engine(recurrent_model(tf.keras.layers.LSTM), mode='windowed')
+    full = engine.rollout(window, HORIZON)[0]
+    prefix = engine.rollout(window, HORIZON // 2)[0]
+    history = np.concatenate([window[:, 0], prefix])[-SEQUENCE_LENGTH:].reshape(-1, 1)
+    suffix = engine.rollout(history, HORIZON - HORIZON // 2)[0]
+
+    np.testing.assert_allclose(np.concatenate([prefix, suffix]), full, atol=ATOL)
+    assert engine.exact
+
+
+@pytest.mark.parametrize('layer_type', [tf.keras.layers.LSTM, tf.keras.layers.GRU])
+def test_incremental_rollout_matches_windowed_over_the_horizon(layer_type, window):
+    model = forget_history(recurrent_model(layer_type))
+    windowed = build_rollout_engine(model, mode='windowed')
+    incremental = build_rollout_engine(model, mode='incremental')
+
+    assert isinstance(incremental, IncrementalRecurrentEngine)
+    np.testing.assert_allclose(incremental.rollout(window, HORIZON)[0], windowed.rollout(window, HORIZON)[0],
+                               atol=ATOL)
+    np.testing.assert_allclose(incremental.rollout(window, HORIZON)[0], reference_rollout(model, window, HORIZON),
+                               atol=ATOL)
+
+
+@pytest.mark.parametrize('layer_type', [tf.keras.layers.LSTM, tf.keras.layers.GRU])
+def test_incremental_first_step_is_exact(layer_type, window):
+    result = verify_incremental_rollout(recurrent_model(layer_type), window, horizon=HORIZON)
+
+    assert result['first_step_diff'] <= ATOL
+    assert not IncrementalRecurrentEngine.exact
+
+
+def test_models_without_incremental_engine_are_rejected(window):
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(SEQUENCE_LENGTH, 1)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(1),
+    ])
+
+    assert type(build_rollout_engine(model, mode='incremental')) is RolloutEngine
+    with pytest.raises(ValueError):
+        verify_incremental_rollout(model, window)
@@ -0,0 +1,337 @@
+"""
+Global Cross-Ticker Model Training Script
+Trains one shared LSTM, GRU or Transformer per architecture across many
+tickers instead of one model per ticker. Each ticker keeps its own MinMax
+scaler, batches mix windows from every ticker, and an optional ticker
+embedding lets the shared weights specialize per ticker.
+
+Artifacts (served by the API for every ticker in the universe):
+    models/_global/{model}_global_model.h5
+    models/_global/{model}_global_scalers.pkl   per-ticker scalers and embedding index
+    models/_global/{model}_global_metrics.pkl   per-ticker test metrics
+"""
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.metrics import mean_squared_error, mean_absolute_error, mean_absolute_percentage_error
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import (LSTM, GRU, Concatenate, Dense, Dropout, Embedding, Flatten,
+                                     GlobalAveragePooling1D, Input, LayerNormalization,
+                                     MultiHeadAttention, RepeatVector)
+from tensorflow.keras.callbacks import EarlyStopping
+import pickle
+import os
+import sys
+import argparse
+import time
+from datetime import datetime
+
+from market_data_store import MarketDataStore
+from windowing import predict_windows, split_windows, supervised_windows
+from data_pipeline import rows_dataset, split_targets
+
+MODEL_TYPES = ['LSTM', 'GRU', 'TRANSFORMER']
+
+
+def build_global_model(model_type, sequence_length, num_tickers=None, embedding_dim=8):
+    """Same layers as the per-ticker models; with num_tickers, a ticker embedding is fed alongside every step
+
+    Inputs are [window] or [window, ticker id]; the window always comes first.
+    """
+    window = Input(shape=(sequence_length, 1), name='window')
+    inputs = [window]
+    x = window
+    if num_tickers:
+        ticker_id = Input(shape=(1,), dtype='int32', name='ticker')
+        inputs.append(ticker_id)
+        embedded = Flatten()(Embedding(num_tickers, embedding_dim)(ticker_id))
+        x = Concatenate()([window, RepeatVector(sequence_length)(embedded)])
+
+    if model_type in ('LSTM', 'GRU'):
+        recurrent = LSTM if model_type == 'LSTM' else GRU
+        x = recurrent(units=50, return_sequences=True)(x)
+        x = Dropout(0.2)(x)
+        x = recurrent(units=50, return_sequences=False)(x)
+        x = Dropout(0.2)(x)
+        x = Dense(25)(x)
+        outputs = Dense(1)(x)
+    elif model_type == 'TRANSFORMER':
+        attention = MultiHeadAttention(num_heads=4, key_dim=16)(x, x)
+        attention = Dropout(0.2)(attention)
+        attention = LayerNormalization()(x + attention)
+
+        ffn = Dense(64, activation='relu')(attention)
+        ffn = Dropout(0.2)(ffn)
+        ffn = Dense(x.shape[-1])(ffn)
+        ffn = LayerNormalization()(attention + ffn)
+
+        outputs = Dense(1)(GlobalAveragePooling1D()(ffn))
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    model = Model(inputs=inputs if num_tickers else window, outputs=outputs)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+class GlobalModelTrainer:
+    """Trainer for one model shared by every ticker of a universe"""
+
+    def __init__(self, tickers, model_type, start_date='2018-01-01', end_date=None, sequence_length=60,
+                 embedding=False, embedding_dim=8, store=None, output_dir=None):
+        self.tickers = sorted({ticker.upper() for ticker in tickers})
+        self.model_type = model_type.upper()
+        self.start_date = start_date
+        self.end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        self.sequence_length = sequence_length
+        self.embedding = embedding
+        self.embedding_dim = embedding_dim
+        self.store = store or MarketDataStore()
+        self.model = None
+        self.history = None
+
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+        self.output_dir = output_dir or os.path.join(project_root, 'models', '_global')
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def download_data(self, max_retries=5):
+        """Load every ticker from the local market data store; tickers without enough data are dropped"""
+        print(f"\n{'='*60}")
+        print(f"Loading {len(self.tickers)} tickers: {self.start_date} to {self.end_date}")
+        print(f"{'='*60}\n")
+
+        self.frames = {}
+        for ticker in self.tickers:
+            df = self.store.get(ticker, self.start_date, self.end_date, max_retries=max_retries)
+            # Need enough windows for a train, validation and test part
+            if df is None or len(df) < self.sequence_length * 2:
+                print(f"❌ Not enough data for {ticker}, leaving it out of the global model")
+                continue
+            self.frames[ticker] = df
+        self.tickers = sorted(self.frames)
+        print(f"✅ Loaded {sum(len(df) for df in self.frames.values())} bars for {len(self.tickers)} tickers")
+        return bool(self.tickers)
+
+    def prepare_data(self):
+        """Scale each ticker separately and stack the series end to end
+
+        Target rows are collected per ticker so no window crosses into another
+        ticker's bars; each ticker is split 80/20 exactly like the per-ticker
+        models, with validation on the last 10% of its training windows.
+        """
+        print("\nPreparing data...")
+        L = self.sequence_length
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.scalers = {}
+        self.test_windows = {}
+        parts, ids, train_rows, validation_rows = [], [], [], []
+        offset = 0
+        for ticker in self.tickers:
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            scaled = scaler.fit_transform(self.frames[ticker][['Close']].values).astype(np.float32)
+            self.scalers[ticker] = scaler
+
+            X, y = supervised_windows(scaled, L)
+            _, X_test, _, y_test = split_windows(X, y, 0.8)
+            self.test_windows[ticker] = (X_test, y_test)
+
+            (train_first, train_stop), (val_first, val_stop) = split_targets(L, int(len(X) * 0.8), 0.1)
+            train_rows.append(np.arange(offset + train_first, offset + train_stop))
+            validation_rows.append(np.arange(offset + val_first, offset + val_stop))
+            parts.append(scaled)
+            ids.append(np.full(len(scaled), self.ticker_index[ticker], dtype=np.int32))
+            offset += len(scaled)
+
+        self.series = np.concatenate(parts)
+        self.row_ids = np.concatenate(ids)
+        self.train_rows = np.concatenate(train_rows)
+        self.validation_rows = np.concatenate(validation_rows)
+        print(f"Training windows: {len(self.train_rows)}, Validation windows: {len(self.validation_rows)}, "
+              f"Test windows: {sum(len(X) for X, _ in self.test_windows.values())}")
+
+    def build_model(self):
+        """Build the shared model"""
+        print(f"\nBuilding global {self.model_type} model{' with ticker embedding' if self.embedding else ''}...")
+        self.model = build_global_model(
+            self.model_type, self.sequence_length,
+            num_tickers=len(self.tickers) if self.embedding else None,
+            embedding_dim=self.embedding_dim
+        )
+        print(f"Global {self.model_type} model built: {self.model.count_params():,} parameters")
+
+    def train_model(self, epochs=20, batch_size=512, callbacks=None):
+        """Train on large batches that mix windows of every ticker"""
+        print(f"\n{'='*60}")
+        print(f"Training global {self.model_type} model on {len(self.tickers)} tickers...")
+        print(f"{'='*60}\n")
+
+        early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+        row_ids = self.row_ids if self.embedding else None
+        train_data = rows_dataset(self.series, self.sequence_length, self.train_rows, batch_size,
+                                  shuffle=True, row_ids=row_ids)
+        validation_data = rows_dataset(self.series, self.sequence_length, self.validation_rows, batch_size,
+                                       row_ids=row_ids)
+
+        self.history = self.model.fit(
+            train_data,
+            epochs=epochs,
+            validation_data=validation_data,
+            verbose=1,
+            callbacks=[early_stop] + list(callbacks or [])
+        )
+
+    def predict_fn(self, ticker):
+        """Batch predictor for one ticker's windows"""
+        if not self.embedding:
+            return self.model.predict_on_batch
+        index = self.ticker_index[ticker]
+        return lambda X: self.model.predict_on_batch([X, np.full((len(X), 1), index, dtype=np.int32)])
+
+    def evaluate_model(self):
+        """Per-ticker test metrics on the same test windows the per-ticker models use"""
+        print("\nEvaluating model...")
+        self.metrics = {}
+        for ticker in self.tickers:
+            X_test, y_test = self.test_windows[ticker]
+            scaler = self.scalers[ticker]
+            predicted = scaler.inverse_transform(predict_windows(self.predict_fn(ticker), X_test))
+            actual = scaler.inverse_transform(y_test.reshape(-1, 1))
+            df = self.frames[ticker]
+            self.metrics[ticker] = {
+                'ticker': ticker,
+                'model': self.model_type,
+                'rmse': float(np.sqrt(mean_squared_error(actual, predicted))),
+                'mae': float(mean_absolute_error(actual, predicted)),
+                'mape': float(mean_absolute_percentage_error(actual, predicted) * 100),
+                'train_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'data_period': f"{self.start_date} to {self.end_date}",
+                'last_bar': df.index[-1].strftime('%Y-%m-%d'),
+                'strategy': 'global',
+            }
+
+        print(f"\n{'='*60}")
+        print(f"Global {self.model_type} Model Performance")
+        print(f"{'='*60}")
+        for ticker, metrics in self.metrics.items():
+            print(f"{ticker:<8} RMSE: ${metrics['rmse']:.2f}  MAE: ${metrics['mae']:.2f}  MAPE: {metrics['mape']:.2f}%")
+        print(f"Mean MAPE: {np.mean([m['mape'] for m in self.metrics.values()]):.2f}%")
+        print(f"{'='*60}\n")
+        return self.metrics
+
+    def artifact_path(self, kind):
+        """Path of the model / scalers / metrics artifact of this architecture"""
+        extension = 'h5' if kind == 'model' else 'pkl'
+        return os.path.join(self.output_dir, f"{self.model_type.lower()}_global_{kind}.{extension}")
+
+    def save_model(self, training_seconds=None):
+        """Save model, per-ticker scalers and metrics"""
+        # Scalers are written after the model: the API reloads once both are newer
+        model_path = self.artifact_path('model')
+        self.model.save(model_path)
+        print(f"Model saved to {model_path}")
+
+        scalers_path = self.artifact_path('scalers')
+        with open(scalers_path, 'wb') as f:
+            pickle.dump({
+                'scalers': self.scalers,
+                'ticker_index': self.ticker_index if self.embedding else None,
+                'sequence_length': self.sequence_length,
+            }, f)
+        print(f"Scalers saved to {scalers_path}")
+
+        metrics_path = self.artifact_path('metrics')
+        with open(metrics_path, 'wb') as f:
+            pickle.dump({
+                'model': self.model_type,
+                'strategy': 'global',
+                'embedding': self.embedding,
+                'parameters': int(self.model.count_params()),
+                'training_seconds': training_seconds,
+                'samples': {'train': len(self.train_rows), 'validation': len(self.validation_rows)},
+                'tickers': self.metrics,
+            }, f)
+        print(f"Metrics saved to {metrics_path}")
+
+    def run(self, epochs=20, batch_size=512, callbacks=None):
+        """Run complete training pipeline"""
+        try:
+            if not self.download_data():
+                return False
+
+            start_time = time.time()
+            self.prepare_data()
+            self.build_model()
+            self.train_model(epochs=epochs, batch_size=batch_size, callbacks=callbacks)
+            self.evaluate_model()
+            self.training_seconds = round(time.time() - start_time, 1)
+            self.save_model(self.training_seconds)
+
+            print(f"\n{'='*60}")
+            print(f"SUCCESS: global {self.model_type} model for {len(self.tickers)} tickers "
+                  f"completed in {self.training_seconds}s")
+            print(f"{'='*60}\n")
+            return True
+
+        except Exception as e:
+            print(f"\n{'='*60}")
+            print(f"ERROR: Global training failed - {self.model_type}")
+            print(f"Error: {str(e)}")
+            print(f"{'='*60}\n")
+            return False
+
+
+def main():
+    """Main function to handle CLI arguments"""
+    parser = argparse.ArgumentParser(description='Train one stock prediction model shared by many tickers')
+    parser.add_argument('--tickers', type=str, nargs='+', default=None,
+                        help='Stock ticker symbols (default: every ticker in the local market data store)')
+    parser.add_argument('--models', type=str, nargs='+', default=['ALL'],
+                        choices=MODEL_TYPES + ['ALL'], help='Model types to train')
+    parser.add_argument('--start', type=str, default='2018-01-01', help='Start date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='End date (YYYY-MM-DD), defaults to today')
+    parser.add_argument('--epochs', type=int, default=20, help='Number of training epochs')
+    parser.add_argument('--batch-size', type=int, default=512, help='Mixed-ticker batch size for training')
+    parser.add_argument('--sequence-length', type=int, default=60, help='Sequence length for time series')
+    parser.add_argument('--embedding', action='store_true', help='Learn a per-ticker embedding')
+    parser.add_argument('--embedding-dim', type=int, default=8, help='Size of the ticker embedding')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Artifact directory (default: models/_global)')
+
+    args = parser.parse_args()
+
+    store = MarketDataStore()
+    tickers = args.tickers or sorted(store.coverage())
+    if not tickers:
+        print("No tickers given and the market data store is empty")
+        sys.exit(1)
+    models = MODEL_TYPES if 'ALL' in args.models else args.models
+
+    results = {}
+    for model_type in models:
+        trainer = GlobalModelTrainer(
+            tickers=tickers,
+            model_type=model_type,
+            start_date=args.start,
+            end_date=args.end,
+            sequence_length=args.sequence_length,
+            embedding=args.embedding,
+            embedding_dim=args.embedding_dim,
+            store=store,
+            output_dir=args.output_dir
+        )
+        results[model_type] = trainer.run(epochs=args.epochs, batch_size=args.batch_size)
+
+    # Print summary
+    print(f"\n{'#'*60}")
+    print(f"GLOBAL TRAINING SUMMARY ({len(tickers)} tickers)")
+    print(f"{'#'*60}")
+    for model_type, success in results.items():
+        print(f"{model_type}: {'SUCCESS' if success else 'FAILED'}")
+    print(f"{'#'*60}\n")
+
+    if not all(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,31 +4,66 @@ Supports LSTM, GRU, and Transformer models for multiple companies
 """
 import numpy as np
 import pandas as pd
-try:
-    from yahooquery import Ticker
-    USE_YAHOOQUERY = True
-except ImportError:
-    import yfinance as yf
-    USE_YAHOOQUERY = False
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error, mean_absolute_error, mean_absolute_percentage_error
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.models import Sequential, load_model
+from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.layers import LSTM, GRU, Dense, Dropout, MultiHeadAttention, LayerNormalization
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+import json
 import pickle
 import os
 import sys
 import argparse
-from datetime import datetime
 import time
-import requests
+from datetime import datetime
+
+from market_data_store import MarketDataStore
+from windowing import predict_windows, split_windows, supervised_windows
+from data_pipeline import memmap_series, training_datasets
+
+
+class ProgressFile(Callback):
+    """Write per-epoch training progress to a JSON file (read by the API's job endpoints)"""
+
+    def __init__(self, path, ticker, model_type, model_index, model_count):
+        super().__init__()
+        self.path = path
+        self.state = {
+            'ticker': ticker,
+            'model': model_type,
+            'model_index': model_index,
+            'model_count': model_count,
+        }
+
+    def write(self, **fields):
+        self.state.update(fields, updated_at=time.time())
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def on_train_begin(self, logs=None):
+        self.write(stage='training', epoch=0, epochs=self.params.get('epochs'))
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        self.write(
+            epoch=epoch + 1,
+            loss=float(logs['loss']) if 'loss' in logs else None,
+            val_loss=float(logs['val_loss']) if 'val_loss' in logs else None,
+        )
+
+    def on_train_end(self, logs=None):
+        self.write(stage='trained')
 
 
 class StockModelTrainer:
     """Universal trainer for stock prediction models"""
 
-    def __init__(self, ticker, model_type, start_date='2018-01-01', end_date=None, sequence_length=60):
+    def __init__(self, ticker, model_type, start_date='2018-01-01', end_date=None, sequence_length=60,
+                 store=None, memmap_dir=None):
         self.ticker = ticker.upper()
         self.model_type = model_type.upper()
         self.start_date = start_date
@@ -37,6 +72,8 @@ class StockModelTrainer:
         self.scaler = MinMaxScaler(feature_range=(0, 1))
         self.model = None
         self.history = None
+        self.store = store or MarketDataStore()
+        self.memmap_dir = memmap_dir
 
         # Determine project root (works both locally and in Docker)
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -48,138 +85,51 @@ class StockModelTrainer:
         os.makedirs(self.model_dir, exist_ok=True)
 
     def download_data(self, max_retries=5):
-        """Download stock data from Yahoo Finance with retry logic"""
+        """Load stock data from the local market data store, fetching only missing bars"""
         print(f"\n{'='*60}")
-        print(f"Downloading {self.ticker} stock data...")
+        print(f"Loading {self.ticker} stock data...")
         print(f"Period: {self.start_date} to {self.end_date}")
-        print(f"Using: {'yahooquery' if USE_YAHOOQUERY else 'yfinance'}")
         print(f"{'='*60}\n")
 
-        for attempt in range(max_retries):
-            try:
-                # Add delay between attempts to avoid rate limiting
-                if attempt > 0:
-                    wait_time = 5 * (2 ** (attempt - 1))  # Exponential backoff: 5, 10, 20, 40 seconds
-                    print(f"⏳ Waiting {wait_time} seconds before retry (attempt {attempt + 1}/{max_retries})...")
-                    time.sleep(wait_time)
-
-                print(f"🔄 Attempting to download data (attempt {attempt + 1}/{max_retries})...")
-
-                # Use yahooquery (better) or yfinance (fallback)
-                if USE_YAHOOQUERY:
-                    # yahooquery - more reliable
-                    ticker_obj = Ticker(self.ticker)
-                    df = ticker_obj.history(start=self.start_date, end=self.end_date)
-
-                    # yahooquery returns MultiIndex, need to process
-                    if isinstance(df, pd.DataFrame) and not df.empty:
-                        # Reset index to get symbol and date as columns
-                        df = df.reset_index()
-
-                        # Set date as index
-                        if 'date' in df.columns:
-                            df.set_index('date', inplace=True)
-
-                        # Rename columns to match yfinance format (lowercase to Title case)
-                        column_mapping = {
-                            'open': 'Open',
-                            'high': 'High',
-                            'low': 'Low',
-                            'close': 'Close',
-                            'volume': 'Volume',
-                            'adjclose': 'Adj Close'
-                        }
-                        df.rename(columns=column_mapping, inplace=True)
-
-                        # Ensure we have Close column
-                        if 'Close' not in df.columns and 'close' in df.columns:
-                            df['Close'] = df['close']
-                    else:
-                        df = pd.DataFrame()  # Empty DataFrame
-                else:
-                    # yfinance - fallback
-                    df = yf.download(
-                        self.ticker,
-                        start=self.start_date,
-                        end=self.end_date,
-                        progress=False,
-                        show_errors=False
-                    )
-
-                if df.empty:
-                    print(f"⚠️  No data returned for {self.ticker}")
-                    if attempt < max_retries - 1:
-                        continue
-                    raise ValueError(f"No data found for ticker {self.ticker} after {max_retries} attempts")
-
-                self.df = df
-                self.data = df[['Close']].values
-                print(f"✅ Downloaded {len(df)} data points successfully!")
-                # Handle both datetime and date objects
-                start_str = df.index[0].strftime('%Y-%m-%d') if hasattr(df.index[0], 'strftime') else str(df.index[0])
-                end_str = df.index[-1].strftime('%Y-%m-%d') if hasattr(df.index[-1], 'strftime') else str(df.index[-1])
-                print(f"📅 Date range: {start_str} to {end_str}")
-                return True
-
-            except requests.exceptions.HTTPError as e:
-                if '429' in str(e):
-                    print(f"⚠️  Rate limit detected (429 error)")
-                    if attempt < max_retries - 1:
-                        wait_time = 10 * (2 ** attempt)  # Longer wait for rate limits: 10, 20, 40, 80 seconds
-                        print(f"⏳ Rate limited. Waiting {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"❌ Rate limit persists after {max_retries} attempts")
-                        print("💡 Suggestion: Wait 10-15 minutes before trying again")
-                        return False
-                else:
-                    print(f"❌ HTTP Error: {str(e)}")
-                    if attempt < max_retries - 1:
-                        continue
-                    return False
-
-            except Exception as e:
-                error_msg = str(e)
-                print(f"⚠️  Error on attempt {attempt + 1}: {error_msg}")
-
-                # Check for common errors
-                if 'delisted' in error_msg.lower():
-                    print(f"❌ Ticker {self.ticker} may be delisted or invalid")
-                    return False
-                elif 'no timezone found' in error_msg.lower():
-                    print(f"❌ Ticker {self.ticker} data unavailable or invalid")
-                    return False
-
-                if attempt < max_retries - 1:
-                    print(f"🔄 Retrying...")
-                    continue
-                else:
-                    print(f"❌ Failed after {max_retries} attempts: {error_msg}")
-                    return False
-
-        return False
-
-    def prepare_data(self):
-        """Prepare and scale data for training"""
-        print("\nPreparing data...")
+        df = self.store.get(self.ticker, self.start_date, self.end_date, max_retries=max_retries)
+        if df is None or df.empty:
+            print(f"❌ No data available for {self.ticker}")
+            return False
 
-        # Scale data
-        self.scaled_data = self.scaler.fit_transform(self.data)
+        self.df = df
+        self.data = df[['Close']].values
+        print(f"✅ Loaded {len(df)} data points successfully!")
+        print(f"📅 Date range: {df.index[0].strftime('%Y-%m-%d')} to {df.index[-1].strftime('%Y-%m-%d')}")
+        return True
 
-        # Create sequences
-        X, y = [], []
-        for i in range(self.sequence_length, len(self.scaled_data)):
-            X.append(self.scaled_data[i-self.sequence_length:i, 0])
-            y.append(self.scaled_data[i, 0])
+    def prepare_data(self, fit_scaler=True, test_windows=None):
+        """Prepare and scale data for training
 
-        X, y = np.array(X), np.array(y)
-        X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+        Args:
+            fit_scaler: refit the scaler; False keeps a loaded artifact's scaling
+            test_windows: hold out this many newest windows instead of the last 20%
+        """
+        print("\nPreparing data...")
 
-        # Split into train and test sets (80/20)
-        train_size = int(len(X) * 0.8)
-        self.X_train, self.X_test = X[:train_size], X[train_size:]
-        self.y_train, self.y_test = y[:train_size], y[train_size:]
+        # Scale data
+        if fit_scaler:
+            self.scaled_data = self.scaler.fit_transform(self.data).astype(np.float32)
+        else:
+            self.scaled_data = self.scaler.transform(self.data).astype(np.float32)
+        if self.memmap_dir:
+            # Windows are then read from disk page by page during training
+            memmap_path = os.path.join(self.memmap_dir, f"{self.ticker.lower()}_scaled.npy")
+            self.scaled_data = memmap_series(self.scaled_data, memmap_path)
+
+        # Create sequences: strided float32 views, no per-window copies
+        X, y = supervised_windows(self.scaled_data, self.sequence_length)
+
+        # Split into train and test sets (80/20, or a fixed number of newest windows)
+        if test_windows:
+            split = max(0, len(X) - test_windows)
+            self.X_train, self.X_test, self.y_train, self.y_test = X[:split], X[split:], y[:split], y[split:]
+        else:
+            self.X_train, self.X_test, self.y_train, self.y_test = split_windows(X, y, 0.8)
 
         print(f"Training samples: {len(self.X_train)}, Test samples: {len(self.X_test)}")
 
@@ -248,7 +198,56 @@ class StockModelTrainer:
 
         print(f"{self.model_type} model built successfully")
 
-    def train_model(self, epochs=20, batch_size=32):
+    def artifact_path(self, kind):
+        """Path of the model / scaler / metrics artifact for this ticker and model type"""
+        extension = 'h5' if kind == 'model' else 'pkl'
+        return os.path.join(self.model_dir, f"{self.model_type.lower()}_{self.ticker.lower()}_{kind}.{extension}")
+
+    def load_artifacts(self):
+        """Load the saved model, scaler and metrics; returns the metrics or None if any is missing"""
+        paths = {kind: self.artifact_path(kind) for kind in ('model', 'scaler', 'metrics')}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+
+        self.model = load_model(paths['model'], compile=False)
+        with open(paths['scaler'], 'rb') as f:
+            self.scaler = pickle.load(f)
+        with open(paths['metrics'], 'rb') as f:
+            return pickle.load(f)
+
+    def new_bars_since(self, previous_metrics):
+        """Bars in the loaded data newer than the data the previous artifact was trained on"""
+        last_bar = previous_metrics.get('last_bar') or previous_metrics.get('data_period', '').split(' to ')[-1]
+        try:
+            return int((self.df.index > pd.Timestamp(last_bar)).sum())
+        except ValueError:
+            return len(self.df)
+
+    def fine_tune(self, epochs=3, batch_size=32, learning_rate=1e-4, recent_windows=250, callbacks=None):
+        """Continue training the loaded model on the training windows that end at the newest bars"""
+        print(f"\n{'='*60}")
+        print(f"Fine-tuning {self.model_type} model for {self.ticker} ({epochs} epochs)...")
+        print(f"{'='*60}\n")
+
+        # Small learning rate: adapt to the new bars without forgetting the old regime
+        self.model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mean_squared_error')
+        early_stop = EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)
+
+        train_data, validation_data = training_datasets(
+            self.scaled_data, self.sequence_length, len(self.X_train),
+            batch_size=batch_size, validation_split=0.1,
+            first_window=max(0, len(self.X_train) - recent_windows)
+        )
+
+        self.history = self.model.fit(
+            train_data,
+            epochs=epochs,
+            validation_data=validation_data,
+            verbose=1,
+            callbacks=[early_stop] + list(callbacks or [])
+        )
+
+    def train_model(self, epochs=20, batch_size=32, callbacks=None):
         """Train the model"""
         print(f"\n{'='*60}")
         print(f"Training {self.model_type} model for {self.ticker}...")
@@ -257,14 +256,18 @@ class StockModelTrainer:
         # Early stopping callback
         early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
 
+        # Windows are gathered per batch from the series; validation is the last 10% of the training windows
+        train_data, validation_data = training_datasets(
+            self.scaled_data, self.sequence_length, len(self.X_train),
+            batch_size=batch_size, validation_split=0.1
+        )
+
         self.history = self.model.fit(
-            self.X_train,
-            self.y_train,
+            train_data,
             epochs=epochs,
-            batch_size=batch_size,
-            validation_split=0.1,
+            validation_data=validation_data,
             verbose=1,
-            callbacks=[early_stop]
+            callbacks=[early_stop] + list(callbacks or [])
         )
 
     def evaluate_model(self):
@@ -272,7 +275,7 @@ class StockModelTrainer:
         print("\nEvaluating model...")
 
         # Predict on test set
-        predicted_test = self.model.predict(self.X_test)
+        predicted_test = predict_windows(self.model.predict_on_batch, self.X_test)
         self.predicted_prices_test = self.scaler.inverse_transform(predicted_test)
         self.actual_prices_test = self.scaler.inverse_transform(self.y_test.reshape(-1, 1))
 
@@ -297,6 +300,8 @@ class StockModelTrainer:
             'mape': float(mape),
             'train_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'data_period': f"{self.start_date} to {self.end_date}",
+            'last_bar': self.df.index[-1].strftime('%Y-%m-%d'),
+            'strategy': 'full',
             'samples': {
                 'train': len(self.X_train),
                 'test': len(self.X_test)
@@ -307,23 +312,19 @@ class StockModelTrainer:
 
     def save_model(self):
         """Save model, scaler, and metrics"""
-        model_name = f"{self.model_type.lower()}_{self.ticker.lower()}_model.h5"
-        scaler_name = f"{self.model_type.lower()}_{self.ticker.lower()}_scaler.pkl"
-        metrics_name = f"{self.model_type.lower()}_{self.ticker.lower()}_metrics.pkl"
-
         # Save model
-        model_path = os.path.join(self.model_dir, model_name)
+        model_path = self.artifact_path('model')
         self.model.save(model_path)
         print(f"Model saved to {model_path}")
 
         # Save scaler
-        scaler_path = os.path.join(self.model_dir, scaler_name)
+        scaler_path = self.artifact_path('scaler')
         with open(scaler_path, 'wb') as f:
             pickle.dump(self.scaler, f)
         print(f"Scaler saved to {scaler_path}")
 
         # Save metrics
-        metrics_path = os.path.join(self.model_dir, metrics_name)
+        metrics_path = self.artifact_path('metrics')
         with open(metrics_path, 'wb') as f:
             pickle.dump(self.metrics, f)
         print(f"Metrics saved to {metrics_path}")
@@ -335,7 +336,7 @@ class StockModelTrainer:
         plt.figure(figsize=(14, 6))
 
         # Predict on train set
-        predicted_train = self.model.predict(self.X_train)
+        predicted_train = predict_windows(self.model.predict_on_batch, self.X_train)
         predicted_prices_train = self.scaler.inverse_transform(predicted_train)
         actual_prices_train = self.scaler.inverse_transform(self.y_train.reshape(-1, 1))
 
@@ -370,16 +371,84 @@ class StockModelTrainer:
         print(f"Plot saved to {plot_path}")
         plt.close()
 
-    def run(self, epochs=20, batch_size=32):
-        """Run complete training pipeline"""
+    def run_incremental(self, fine_tune_epochs=3, max_degradation=0.10, batch_size=32, callbacks=None,
+                        holdout_windows=50):
+        """Warm-start from the saved artifact and fine-tune on the newly arrived bars
+
+        The newest `holdout_windows` windows are held out. The saved model and
+        the fine-tuned one are both scored on them, after fine-tuning on the
+        recent windows before them. The saved artifact is exactly the model
+        that was scored: the held-out bars are only trained on by a later run,
+        once newer bars have taken their place in the holdout.
+
+        Returns False when a full retrain is needed instead: no artifact to
+        start from, or MAPE after fine-tuning is more than `max_degradation`
+        (relative) worse than the saved model's on the same windows.
+        """
+        previous = self.load_artifacts()
+        if previous is None:
+            print(f"No saved {self.model_type} model for {self.ticker}: running a full retrain")
+            self.fallback_reason = 'no_artifact'
+            return False
+
+        new_bars = self.new_bars_since(previous)
+        if new_bars == 0:
+            print(f"✅ {self.model_type} model for {self.ticker} is up to date: nothing to retrain")
+            self.up_to_date = True
+            return True
+        print(f"📈 {new_bars} new bars since {previous.get('train_date', 'the last training')}")
+
+        self.prepare_data(fit_scaler=False, test_windows=holdout_windows)
+        # Saved model on the newest windows: the baseline the fine-tuned model has to match
+        previous_mape = self.evaluate_model()['mape']
+        self.fine_tune(epochs=fine_tune_epochs, batch_size=batch_size, callbacks=callbacks)
+        self.evaluate_model()
+
+        if self.metrics['mape'] > previous_mape * (1 + max_degradation):
+            print(f"⚠️  MAPE degraded from {previous_mape:.2f}% to {self.metrics['mape']:.2f}%: "
+                  f"falling back to a full retrain")
+            self.fallback_reason = f"mape {previous_mape:.2f}% -> {self.metrics['mape']:.2f}%"
+            return False
+
+        epochs_run = len(self.history.history.get('loss', []))
+        self.metrics.update({
+            'strategy': 'incremental',
+            'fine_tune_epochs': epochs_run,
+            'holdout_windows': len(self.X_test),
+            'new_bars': new_bars,
+            'base_train_date': previous.get('train_date'),
+            'previous_mape': previous_mape,
+        })
+        return True
+
+    def run(self, epochs=20, batch_size=32, callbacks=None, incremental=False, fine_tune_epochs=3,
+            max_degradation=0.10):
+        """Run complete training pipeline
+
+        With incremental=True the saved model is fine-tuned first, and a full
+        retrain only happens when that is not possible or not good enough.
+        """
         try:
             if not self.download_data():
                 return False
 
-            self.prepare_data()
-            self.build_model()
-            self.train_model(epochs=epochs, batch_size=batch_size)
-            self.evaluate_model()
+            start_time = time.time()
+            self.fallback_reason = None
+            self.up_to_date = False
+            fine_tuned = incremental and self.run_incremental(fine_tune_epochs, max_degradation, batch_size, callbacks)
+            if self.up_to_date:
+                return True
+            if not fine_tuned:
+                self.scaler = MinMaxScaler(feature_range=(0, 1))
+                self.prepare_data()
+                self.build_model()
+                self.train_model(epochs=epochs, batch_size=batch_size, callbacks=callbacks)
+                self.evaluate_model()
+                if self.fallback_reason:
+                    self.metrics['fallback_reason'] = self.fallback_reason
+            self.metrics['training_seconds'] = round(time.time() - start_time, 1)
+            print(f"Retraining strategy: {self.metrics['strategy']} ({self.metrics['training_seconds']}s)")
+
             self.save_model()
             self.plot_predictions()
 
@@ -407,6 +476,15 @@ def main():
     parser.add_argument('--epochs', type=int, default=20, help='Number of training epochs')
     parser.add_argument('--batch-size', type=int, default=32, help='Batch size for training')
     parser.add_argument('--sequence-length', type=int, default=60, help='Sequence length for time series')
+    parser.add_argument('--progress-file', type=str, default=None,
+                       help='Write per-epoch progress as JSON to this path')
+    parser.add_argument('--memmap-dir', type=str, default=None,
+                       help='Stream training windows from a memory-mapped copy of the series in this directory')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Fine-tune the saved model on new bars; full retrain if it is missing or degrades')
+    parser.add_argument('--fine-tune-epochs', type=int, default=3, help='Epochs for incremental fine-tuning')
+    parser.add_argument('--max-degradation', type=float, default=0.10,
+                       help='Relative test MAPE increase that triggers a full retrain (0.10 = 10%%)')
 
     args = parser.parse_args()
 
@@ -424,22 +502,30 @@ def main():
     print(f"Period: {args.start} to {args.end or 'today'}")
     print(f"{'#'*60}\n")
 
+    # All models read the same local copy: only the first one can hit the network
+    store = MarketDataStore()
+
     results = {}
-    for i, model_type in enumerate(models):
-        # Add delay between models to avoid rate limiting (only if not first model)
-        if i > 0:
-            print(f"\n⏳ Waiting 3 seconds before training next model to avoid rate limiting...")
-            time.sleep(3)
+    for index, model_type in enumerate(models):
+        callbacks = []
+        if args.progress_file:
+            callbacks.append(ProgressFile(args.progress_file, args.ticker.upper(), model_type, index + 1, len(models)))
 
         trainer = StockModelTrainer(
             ticker=args.ticker,
             model_type=model_type,
             start_date=args.start,
             end_date=args.end,
-            sequence_length=args.sequence_length
+            sequence_length=args.sequence_length,
+            store=store,
+            memmap_dir=args.memmap_dir
         )
 
-        success = trainer.run(epochs=args.epochs, batch_size=args.batch_size)
+        success = trainer.run(
+            epochs=args.epochs, batch_size=args.batch_size, callbacks=callbacks,
+            incremental=args.incremental, fine_tune_epochs=args.fine_tune_epochs,
+            max_degradation=args.max_degradation
+        )
         results[model_type] = success
 
     # Print summary
@@ -451,6 +537,10 @@ def main():
         print(f"{model_type}: {status}")
     print(f"{'#'*60}\n")
 
+    # Non-zero exit lets the job queue report failed trainings
+    if not all(results.values()):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,209 @@
+"""
+Parallel Multi-Ticker Training Runner
+Schedules (ticker, model) training jobs across a process pool sized to the
+available cores. Each worker pins TensorFlow's intra-/inter-op thread pools
+so workers do not oversubscribe the CPU, and every ticker's data is fetched
+once into the local market data store and read from there by its model jobs.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from market_data_store import MarketDataStore
+
+MODEL_TYPES = ['LSTM', 'GRU', 'TRANSFORMER']
+
+
+def available_cores():
+    """CPUs this process may run on (respects container CPU sets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pool_layout(workers=None, threads_per_worker=None):
+    """(workers, threads per worker) that together fill the available cores"""
+    cores = available_cores()
+    if workers is None:
+        threads_per_worker = threads_per_worker or 2
+        workers = max(1, cores // threads_per_worker)
+    threads_per_worker = threads_per_worker or max(1, cores // workers)
+    return workers, threads_per_worker
+
+
+def _init_worker(threads):
+    """Pin TensorFlow thread pools before the trainer (and TensorFlow) is imported"""
+    threads = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = threads
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['OMP_NUM_THREADS'] = threads
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(int(threads))
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _train_job(ticker, model_type, options):
+    """Train one (ticker, model) pair in a worker; data comes from the local store"""
+    from train_multi_company import StockModelTrainer
+
+    start_time = time.time()
+    trainer = StockModelTrainer(
+        ticker=ticker,
+        model_type=model_type,
+        start_date=options['start'],
+        end_date=options['end'],
+        sequence_length=options['sequence_length'],
+        store=MarketDataStore()
+    )
+    if options.get('output_dir'):
+        trainer.model_dir = os.path.join(options['output_dir'], ticker)
+        os.makedirs(trainer.model_dir, exist_ok=True)
+    success = trainer.run(epochs=options['epochs'], batch_size=options['batch_size'],
+                          incremental=options['incremental'])
+    return {
+        'ticker': ticker,
+        'model': model_type,
+        'success': success,
+        'seconds': time.time() - start_time,
+        'pid': os.getpid(),
+    }
+
+
+def prefetch_data(tickers, start, end, store=None):
+    """Fetch each ticker's bars once so model jobs only read the local store
+
+    Returns the tickers whose data is available.
+    """
+    store = store or MarketDataStore()
+    ready = []
+    for ticker in tickers:
+        if store.update(ticker, start, end):
+            ready.append(ticker)
+        else:
+            print(f"❌ No data available for {ticker}, skipping its models")
+    return ready
+
+
+def run_jobs(jobs, options, workers, threads_per_worker):
+    """Run (ticker, model) jobs on a process pool; returns (results, wall seconds)"""
+    results = []
+    start_time = time.time()
+    # spawn: workers start without any TensorFlow state from the parent
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {pool.submit(_train_job, ticker, model_type, options): (ticker, model_type)
+                   for ticker, model_type in jobs}
+        for future in as_completed(futures):
+            ticker, model_type = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'ticker': ticker, 'model': model_type, 'success': False, 'seconds': 0.0,
+                          'error': str(e)}
+            results.append(result)
+            status = "SUCCESS" if result['success'] else "FAILED"
+            print(f"[{len(results)}/{len(jobs)}] {ticker} {model_type}: {status} ({result['seconds']:.1f}s)")
+    return results, time.time() - start_time
+
+
+def main():
+    """Main function to handle CLI arguments"""
+    parser = argparse.ArgumentParser(description='Train stock prediction models for many companies in parallel')
+    parser.add_argument('--tickers', type=str, nargs='+', required=True, help='Stock ticker symbols (e.g., TSLA AAPL)')
+    parser.add_argument('--models', type=str, nargs='+', default=['ALL'],
+                        choices=MODEL_TYPES + ['ALL'], help='Model types to train')
+    parser.add_argument('--start', type=str, default='2018-01-01', help='Start date (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='End date (YYYY-MM-DD), defaults to today')
+    parser.add_argument('--epochs', type=int, default=20, help='Number of training epochs')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size for training')
+    parser.add_argument('--sequence-length', type=int, default=60, help='Sequence length for time series')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Training processes (default: cores / threads per worker)')
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help='TensorFlow intra-op threads per process (default: 2, or cores / workers)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Fine-tune saved models on new bars; full retrain if missing or degraded')
+    parser.add_argument('--compare-sequential', action='store_true',
+                        help='Benchmark only: fully train the jobs in parallel and then one at a time with all '
+                             'cores in a scratch directory, and report the measured speedup')
+
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    models = MODEL_TYPES if 'ALL' in args.models else args.models
+    # One end date for every job, so all of them read the same stored range
+    end = args.end or datetime.now().strftime('%Y-%m-%d')
+    options = {
+        'start': args.start,
+        'end': end,
+        'epochs': args.epochs,
+        'batch_size': args.batch_size,
+        'sequence_length': args.sequence_length,
+        'incremental': args.incremental,
+    }
+    workers, threads_per_worker = pool_layout(args.workers, args.threads_per_worker)
+
+    print(f"\n{'#'*60}")
+    print(f"PARALLEL MULTI-COMPANY TRAINING")
+    print(f"{'#'*60}")
+    print(f"Tickers: {', '.join(tickers)}")
+    print(f"Models: {', '.join(models)}")
+    print(f"Period: {args.start} to {end}")
+    print(f"Cores: {available_cores()} -> {workers} workers x {threads_per_worker} threads")
+    print(f"{'#'*60}\n")
+
+    tickers = prefetch_data(tickers, args.start, end)
+    jobs = [(ticker, model_type) for ticker in tickers for model_type in models]
+    if not jobs:
+        print("Nothing to train")
+        sys.exit(1)
+
+    sequential_seconds = None
+    if args.compare_sequential:
+        # Both passes fully train into a scratch directory: the saved models are left alone
+        # and an incremental pass cannot skip work the other one already did
+        if args.incremental:
+            print("--compare-sequential trains from scratch; --incremental is ignored")
+        scratch_dir = tempfile.mkdtemp(prefix='parallel-benchmark-')
+        try:
+            parallel_options = {**options, 'incremental': False, 'output_dir': os.path.join(scratch_dir, 'parallel')}
+            results, parallel_seconds = run_jobs(jobs, parallel_options, workers, threads_per_worker)
+            print(f"\nRe-running {len(jobs)} jobs sequentially for comparison...\n")
+            sequential_options = {**parallel_options, 'output_dir': os.path.join(scratch_dir, 'sequential')}
+            _, sequential_seconds = run_jobs(jobs, sequential_options, 1, available_cores())
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    else:
+        results, parallel_seconds = run_jobs(jobs, options, workers, threads_per_worker)
+
+    # Print summary
+    job_seconds = sum(result['seconds'] for result in results)
+    print(f"\n{'#'*60}")
+    print(f"PARALLEL TRAINING SUMMARY")
+    print(f"{'#'*60}")
+    for result in sorted(results, key=lambda r: (r['ticker'], r['model'])):
+        status = "SUCCESS" if result['success'] else f"FAILED {result.get('error', '')}".rstrip()
+        print(f"{result['ticker']:<8}{result['model']:<13}{result['seconds']:>9.1f}s  {status}")
+    print(f"{'-'*60}")
+    print(f"Wall clock ({workers} workers): {parallel_seconds:.1f}s")
+    print(f"Sum of job times: {job_seconds:.1f}s ({job_seconds / parallel_seconds:.2f}x concurrency)")
+    if sequential_seconds is not None:
+        print(f"Sequential wall clock: {sequential_seconds:.1f}s")
+        print(f"Speedup: {sequential_seconds / parallel_seconds:.2f}x")
+    print(f"{'#'*60}\n")
+
+    if not all(result['success'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ from tensorflow.keras import layers, Model
 import pickle
 import os
 
+from windowing import predict_windows, split_windows, supervised_windows
+
 # Determine project root (works both locally and in Docker)
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.join(script_dir, '..', '..')  # Go up from scripts/stock_prediction to jupyter root
@@ -26,16 +28,10 @@ data_scaled = scaler.fit_transform(data)
 
 # Sequence creation
 seq_len = 60
-X, y = [], []
-for i in range(seq_len, len(data_scaled)):
-    X.append(data_scaled[i-seq_len:i])
-    y.append(data_scaled[i])
-X, y = np.array(X), np.array(y)
+X, y = supervised_windows(data_scaled, seq_len)
 
 # Split into train and test sets (80/20)
-train_size = int(len(X) * 0.8)
-X_train, X_test = X[:train_size], X[train_size:]
-y_train, y_test = y[:train_size], y[train_size:]
+X_train, X_test, y_train, y_test = split_windows(X, y, 0.8)
 
 print(f"Training samples: {len(X_train)}, Test samples: {len(X_test)}")
 
@@ -80,9 +76,9 @@ history = model.fit(X_train, y_train, epochs=10, batch_size=32, validation_split
 
 # Predict on test set
 print("\nMaking predictions on test set...")
-predicted_test = model.predict(X_test)
+predicted_test = predict_windows(model.predict_on_batch, X_test)
 predicted_prices_test = scaler.inverse_transform(predicted_test)
-actual_prices_test = scaler.inverse_transform(y_test)
+actual_prices_test = scaler.inverse_transform(y_test.reshape(-1, 1))
 
 # Calculate metrics
 rmse = np.sqrt(mean_squared_error(actual_prices_test, predicted_prices_test))
@@ -117,9 +113,9 @@ plt.figure(figsize=(14, 6))
 
 # Plot full data
 plt.subplot(1, 2, 1)
-predicted_train = model.predict(X_train)
+predicted_train = predict_windows(model.predict_on_batch, X_train)
 predicted_prices_train = scaler.inverse_transform(predicted_train)
-actual_prices_train = scaler.inverse_transform(y_train)
+actual_prices_train = scaler.inverse_transform(y_train.reshape(-1, 1))
 
 train_dates = df.index[seq_len:seq_len+len(actual_prices_train)]
 test_dates = df.index[seq_len+len(actual_prices_train):seq_len+len(actual_prices_train)+len(actual_prices_test)]
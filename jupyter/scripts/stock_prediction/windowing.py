@@ -0,0 +1,75 @@
+"""
+Zero-Copy Sequence Windowing
+Strided float32 views over a price series for training, evaluation and
+backtesting. Windows are never copied up front; batches are materialized
+one at a time when a consumer asks for them.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_series(values):
+    """(n, features) float32 array; copies only when the input is not already float32"""
+    values = np.asarray(values, dtype=np.float32)
+    return values.reshape(-1, 1) if values.ndim == 1 else values
+
+
+def sliding_windows(values, sequence_length):
+    """Every window of `sequence_length` consecutive rows as a read-only view
+
+    Returns shape (n - sequence_length + 1, sequence_length, features); window
+    i covers rows i .. i + sequence_length - 1. Used for inference and
+    walk-forward backtests, where the last window is needed too.
+    """
+    values = as_series(values)
+    if len(values) < sequence_length:
+        return np.empty((0, sequence_length, values.shape[1]), dtype=np.float32)
+    # sliding_window_view puts the window axis last: (n', features, L) -> (n', L, features)
+    return sliding_window_view(values, sequence_length, axis=0).transpose(0, 2, 1)
+
+
+def supervised_windows(values, sequence_length, target_column=0):
+    """(X, y) for one-step-ahead training, both views of the same buffer
+
+    X[i] is rows i .. i + sequence_length - 1 and y[i] is row i + sequence_length
+    of `target_column`, matching the windows the training loop used to build.
+    """
+    values = as_series(values)
+    X = sliding_windows(values, sequence_length)[:-1]
+    y = values[sequence_length:, target_column]
+    return X, y
+
+
+def split_windows(X, y, train_fraction=0.8):
+    """Chronological train/test split; the parts are views, not copies"""
+    train_size = int(len(X) * train_fraction)
+    return X[:train_size], X[train_size:], y[:train_size], y[train_size:]
+
+
+def iter_batches(X, y=None, batch_size=256, indices=None):
+    """Yield contiguous float32 batches, materializing only one batch at a time
+
+    `indices` selects (and orders) the windows, e.g. a shuffled permutation.
+    """
+    count = len(X) if indices is None else len(indices)
+    for start in range(0, count, batch_size):
+        if indices is None:
+            selection = slice(start, start + batch_size)
+        else:
+            selection = indices[start:start + batch_size]
+        X_batch = np.ascontiguousarray(X[selection])
+        if y is None:
+            yield X_batch
+        else:
+            yield X_batch, np.ascontiguousarray(y[selection])
+
+
+def predict_windows(predict_fn, X, batch_size=256):
+    """Run `predict_fn` (e.g. model.predict_on_batch) over windows batch by batch
+
+    Returns a (len(X), outputs) array without ever copying all windows at once.
+    """
+    outputs = [np.asarray(predict_fn(X_batch)) for X_batch in iter_batches(X, batch_size=batch_size)]
+    if not outputs:
+        return np.empty((0, 1), dtype=np.float32)
+    return np.concatenate(outputs).reshape(len(X), -1)